@@ -0,0 +1,332 @@
+"""
+B1 信号历史回测 - 全市场、逐日、多进程
+
+每只股票的每一根历史K线都按"截至当天"的口径判定七种买入信号，统计信号出现后
+持有 N 根K线的收益、胜率与持有期内的最大回撤。
+
+做法:
+  - 从本地行情仓库 (common/history_store.py) 读取前复权K线，按K线序号右对齐拼成面板
+  - 指标与公式在全量历史上一次算完：指标都是因果的，第 t 行只依赖第 t 行及之前的K线；
+    StockSignals 按最后一根K线判定的 振幅区间/放宽系数/OK棒 改为逐行判定 (panel_signals.bar_constants)，
+    所以第 t 行的信号与把K线截到第 t 行再调用 StockSignals 的结果逐位相同
+  - 面板放进共享内存，按股票分片交给进程池；worker 直接挂载只读数组，不复制、不 pickle 行情
+
+统计区间: 本地仓库默认只存约300个交易日（日线选股够用），--years 超过实际覆盖的年数时
+回测按实际区间统计、输出文件以实际年数命名并给出警告；run(backfill=True) 先把仓库补足到所需深度。
+
+收益口径: 信号当日收盘买入，第 N 根K线收盘卖出；回撤为持有期内最低价相对买入价的跌幅（没有跌破记 0），均为百分比。
+"""
+import multiprocessing as mp
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .config import BACKTEST_PROCESSES
+from .history_store import HistoryStore, get_history_store
+from .indicators import first_valid_rows, llv_2d
+from .panel_indicators import PANEL_FIELDS, build_panel, calculate_panel_indicators
+from .panel_signals import bar_constants
+from .resample import daily_bars_needed, timeframe_suffix
+from .signals import ARRAY_OPS, SIGNAL_NAMES, b1_formula
+
+BACKTEST_DIR = "results/backtest"
+DEFAULT_HORIZONS = (1, 3, 5, 10, 20)
+# 与 b1_selection.evaluate_stock 一致：不足120根K线不参与选股
+MIN_BARS = 120
+# 每个分片的股票数：越小负载越均衡，越大向量化越充分
+SHARD_SIZE = 200
+# 每年的K线根数（估算 --backfill 需要的历史深度）
+_BARS_PER_YEAR = {'D': 250, 'W': 52, 'M': 12}
+# 汇总表中的信号：七种买入信号 + XG（任一成立）；事件表 flags 的第 i 位对应 SIGNAL_NAMES[i]
+REPORT_SIGNALS = SIGNAL_NAMES + ['XG']
+
+
+def load_history(store: HistoryStore = None, codes: Iterable[str] = None,
+                 adjust: str = 'qfq', timeframe: str = 'D') -> Dict[str, pd.DataFrame]:
+    """读取本地仓库的复权K线（timeframe 为 'W'/'M' 时由日线合成周线/月线），不足 MIN_BARS 根的股票跳过"""
+    store = store or get_history_store()
+    frames = {}
+    for code in (store.codes() if codes is None else codes):
+        df = store.load_adjusted(code, adjust, timeframe)
+        if df is not None and len(df) >= MIN_BARS:
+            frames[code] = df
+    return frames
+
+
+def panel_arrays(frames: Dict[str, pd.DataFrame]) -> Dict[str, np.ndarray]:
+    """逐只K线 -> 按K线序号右对齐的 K线 x 股票 数组；date 为 int64 纳秒（上市前为 NaT 的最小值）"""
+    panel = build_panel(frames, align='bars')
+    arrays = {field: panel[field].to_numpy(dtype='float64') for field in PANEL_FIELDS}
+    arrays['date'] = panel['date'].to_numpy(dtype='datetime64[ns]').view('int64')
+    return arrays
+
+
+def signal_start(arrays: Dict[str, np.ndarray], since: int = None):
+    """
+    实际可统计信号的起点（int64 纳秒）：半数股票已满 MIN_BARS 根K线的日期，不早于 since
+
+    仓库深度不够时这一日期会晚于 since，实际回测区间短于 --years。没有股票满 MIN_BARS 根时返回 None
+    """
+    close = arrays['close']
+    ready = first_valid_rows(close) + MIN_BARS - 1
+    cols = np.flatnonzero(ready < len(close))
+    if not cols.size:
+        return None
+    dates = np.sort(arrays['date'][ready[cols], cols])
+    start = int(dates[len(dates) // 2])
+    return start if since is None else max(start, since)
+
+
+def evaluate_shard(arrays: Dict[str, np.ndarray], codes: Sequence[str],
+                   horizons: Sequence[int] = DEFAULT_HORIZONS, since: int = None) -> pd.DataFrame:
+    """
+    一个分片（面板数组的若干列）逐日跑B1信号并计算持有期收益
+
+    Args:
+        arrays: panel_arrays 的返回值（或其列切片）
+        codes: 与列对应的股票代码
+        horizons: 持有的K线根数
+        since: 只统计该日期（int64 纳秒）及之后的信号，None 为全部
+
+    Returns:
+        信号事件表: code, date, flags（七种信号的位掩码）, return_N, drawdown_N；
+        持有期超出数据末尾的收益/回撤为 NaN
+    """
+    o, h, l, c, v = (arrays[field] for field in PANEL_FIELDS)
+    panel = {field: pd.DataFrame(arrays[field]) for field in ('high', 'low', 'close')}
+    ind = {name: df.to_numpy(dtype='float64') for name, df in calculate_panel_indicators(panel).items()}
+    start = first_valid_rows(c)
+    rows = len(c)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        振幅区间, 放宽系数, OK棒 = bar_constants(o, c, v, codes, start)
+        result = b1_formula(o, h, l, c, v, ind, 振幅区间, 放宽系数, OK棒, ARRAY_OPS)
+
+    flags = np.zeros(c.shape, dtype=np.uint8)
+    for bit, name in enumerate(SIGNAL_NAMES):
+        flags |= result[name].astype(np.uint8) << bit
+    eligible = np.arange(rows).reshape(-1, 1) - start + 1 >= MIN_BARS
+    if since is not None:
+        eligible &= arrays['date'] >= since
+    row, col = np.nonzero((flags > 0) & eligible)
+
+    events = {
+        'code': np.asarray(codes, dtype=object)[col],
+        'date': arrays['date'][row, col].view('datetime64[ns]'),
+        'flags': flags[row, col],
+    }
+    entry = c[row, col]
+    for n in horizons:
+        returns = np.full(len(row), np.nan)
+        drawdowns = np.full(len(row), np.nan)
+        exit_row = row + n
+        done = exit_row < rows
+        exit_row, exit_col = exit_row[done], col[done]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns[done] = (c[exit_row, exit_col] / entry[done] - 1) * 100
+            # 持有期 (t, t+n] 内的最低价 = 第 t+n 行的 LLV(L, n)
+            lowest = llv_2d(l, n)[exit_row, exit_col]
+            drawdowns[done] = np.minimum(lowest / entry[done] - 1, 0) * 100
+        events[f'return_{n}'] = returns
+        events[f'drawdown_{n}'] = drawdowns
+    return pd.DataFrame(events)
+
+
+class SharedArrays:
+    """
+    把面板数组放进共享内存，worker 按 spec 挂载只读视图
+
+    用法:
+        with SharedArrays(arrays) as shared:
+            ... 把 shared.spec 传给 worker 的 initializer ...
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self.spec = {}
+        try:
+            for name, values in arrays.items():
+                block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+                self._blocks.append(block)
+                np.ndarray(values.shape, values.dtype, buffer=block.buf)[...] = values
+                self.spec[name] = (block.name, values.shape, values.dtype.str)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# worker 进程内挂载的共享数组与回测参数（由 _attach_shared 设置）
+_worker_state = {}
+
+
+def _attach_shared(spec: dict, codes: list, horizons: tuple, since):
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        values = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        values.flags.writeable = False
+        blocks.append(block)
+        arrays[name] = values
+    # blocks 需要和数组一起保留，否则共享内存映射会被提前关闭
+    _worker_state.update(blocks=blocks, arrays=arrays, codes=codes, horizons=horizons, since=since)
+
+
+def _run_shard(bounds: tuple) -> pd.DataFrame:
+    lo, hi = bounds
+    arrays = {name: values[:, lo:hi] for name, values in _worker_state['arrays'].items()}
+    return evaluate_shard(arrays, _worker_state['codes'][lo:hi], _worker_state['horizons'], _worker_state['since'])
+
+
+def run_backtest(frames: Dict[str, pd.DataFrame] = None, years: float = 5,
+                 horizons: Sequence[int] = DEFAULT_HORIZONS, processes: int = None,
+                 shard_size: int = SHARD_SIZE) -> pd.DataFrame:
+    """
+    全市场B1信号回测
+
+    Args:
+        frames: {股票代码: 复权K线}，默认读取本地行情仓库
+        years: 统计最近多少年的信号（更早的K线只用于指标预热），None 为全部
+        horizons: 持有的K线根数
+        processes: 进程数，默认 config.BACKTEST_PROCESSES；1 时在当前进程内计算
+        shard_size: 每个分片的股票数
+
+    Returns:
+        信号事件表（见 evaluate_shard），按 date, code 排序；
+        attrs['span_years'] 为实际统计的年数（见 signal_start，没有可统计的K线时为 None）
+    """
+    frames = load_history() if frames is None else frames
+    codes = list(frames)
+    horizons = tuple(int(n) for n in horizons)
+    arrays = panel_arrays(frames)
+
+    since = None
+    if years and arrays['date'].size:
+        last = pd.Timestamp(arrays['date'].max())
+        since = (last - pd.DateOffset(months=round(years * 12))).value
+
+    span_years = None
+    start = signal_start(arrays, since)
+    if start is not None:
+        first, last = pd.Timestamp(start), pd.Timestamp(arrays['date'].max())
+        span_years = (last - first).days / 365.25
+        print(f"📅 统计区间 {first:%Y-%m-%d} ~ {last:%Y-%m-%d}，约 {span_years:.1f} 年")
+        if years and round(span_years, 1) < years:
+            print(f"⚠️ 本地仓库只够回测约 {span_years:.1f} 年（要求 {years:g} 年），"
+                  f"结果按实际区间统计；加 --backfill 先补足历史")
+
+    bounds = [(lo, min(lo + shard_size, len(codes))) for lo in range(0, len(codes), shard_size)]
+    processes = max(1, min(int(processes or BACKTEST_PROCESSES), len(bounds)))
+    print(f"📊 回测 {len(codes)} 只股票 x {len(arrays['close'])} 根K线，{len(bounds)} 个分片，{processes} 个进程")
+
+    started = time.time()
+    if processes == 1:
+        parts = [evaluate_shard({name: values[:, lo:hi] for name, values in arrays.items()},
+                                codes[lo:hi], horizons, since) for lo, hi in bounds]
+    else:
+        with SharedArrays(arrays) as shared:
+            with ProcessPoolExecutor(processes, mp_context=mp.get_context('spawn'), initializer=_attach_shared,
+                                     initargs=(shared.spec, codes, horizons, since)) as pool:
+                parts = list(pool.map(_run_shard, bounds))
+    print(f"✅ 回测完成，耗时 {time.time() - started:.1f}s")
+
+    if not parts:
+        events = evaluate_shard({name: values[:, :0] for name, values in arrays.items()}, [], horizons, since)
+    else:
+        events = pd.concat(parts, ignore_index=True)
+        events = events.sort_values(['date', 'code'], kind='stable').reset_index(drop=True)
+    events.attrs['span_years'] = span_years
+    return events
+
+
+def summarize(events: pd.DataFrame, horizons: Sequence[int] = DEFAULT_HORIZONS) -> pd.DataFrame:
+    """
+    按 信号 x 持有期 汇总
+
+    Returns:
+        DataFrame[signal, horizon, trades, hit_rate, avg_return, median_return, avg_drawdown, max_drawdown]，
+        trades 只计持有期已走完的信号，其余均为百分比
+    """
+    records = []
+    for bit, name in enumerate(REPORT_SIGNALS):
+        if name == 'XG':
+            selected = events['flags'] > 0
+        else:
+            selected = (events['flags'] & (1 << bit)) > 0
+        for n in horizons:
+            returns = events.loc[selected, f'return_{n}'].dropna()
+            drawdowns = events.loc[selected, f'drawdown_{n}'].dropna()
+            records.append({
+                'signal': name,
+                'horizon': n,
+                'trades': len(returns),
+                'hit_rate': (returns > 0).mean() * 100 if len(returns) else np.nan,
+                'avg_return': returns.mean(),
+                'median_return': returns.median(),
+                'avg_drawdown': drawdowns.mean(),
+                'max_drawdown': drawdowns.min(),
+            })
+    return pd.DataFrame(records)
+
+
+def backfill_days(years: float, timeframe: str = 'D') -> int:
+    """回测 years 年需要的日线深度：统计区间 + MIN_BARS 根预热K线（周线/月线按所需日线根数换算）"""
+    bars = math.ceil(years * _BARS_PER_YEAR[timeframe]) + MIN_BARS
+    return daily_bars_needed(bars, timeframe)
+
+
+def run(years: float = 5, horizons: Sequence[int] = DEFAULT_HORIZONS, processes: int = None,
+        output_dir: str = BACKTEST_DIR, timeframe: str = 'D', backfill: bool = False) -> pd.DataFrame:
+    """
+    读取本地仓库跑全市场回测，保存事件表与汇总表，返回汇总表
+    timeframe 为 'W'/'M' 时在由日线合成的周线/月线上回测，horizons 按周线/月线根数计；
+    backfill=True 时先把仓库补足到 years 年（需要网络，见 data_fetcher.deepen_history_store）。
+    输出文件以实际统计的年数命名（仓库不够 years 年时短于 years）。
+    """
+    if backfill and years:
+        from .config import MIN_MARKET_CAP
+        from .data_fetcher import deepen_history_store, get_all_stock_list
+
+        store = get_history_store()
+        codes = store.codes()
+        if not codes:
+            stock_list = get_all_stock_list(min_market_cap=MIN_MARKET_CAP, exclude_st=True)
+            codes = [] if stock_list is None or stock_list.empty else stock_list['code'].tolist()
+        deepen_history_store(codes, backfill_days(years, timeframe))
+
+    frames = load_history(timeframe=timeframe)
+    if not frames:
+        print("⚠️ 本地行情仓库为空，先运行一次选股以下载历史K线")
+        return pd.DataFrame()
+
+    events = run_backtest(frames, years, horizons, processes)
+    summary = summarize(events, horizons)
+
+    os.makedirs(output_dir, exist_ok=True)
+    span_years = events.attrs.get('span_years')
+    span = 'all' if span_years is None else f"{round(span_years, 1):g}y"
+    tag = f"b1{timeframe_suffix(timeframe)}_{span}_{pd.Timestamp.now():%Y%m%d}"
+    events.to_parquet(os.path.join(output_dir, f"{tag}_events.parquet"), index=False)
+    summary_path = os.path.join(output_dir, f"{tag}_summary.csv")
+    summary.to_csv(summary_path, index=False)
+
+    print(summary.round(2).to_string(index=False))
+    print(f"💾 汇总已保存: {summary_path}")
+    return summary
@@ -1,8 +1,40 @@
 # 配置参数
+import os
 
 # 并发选股线程数
 # MAX_WORKERS = 8
 MAX_WORKERS = 1  # Reduced to 1 to prevent akshare/mini_racer crashes on macOS
 
+# 抓取进程数：每个进程独立的解释器和 mini_racer 运行时，崩溃互不影响 (见 common/fetch_pool.py)
+FETCH_PROCESSES = min(8, os.cpu_count() or 1)
+
+# 全量选股流水线 (见 common/stage_pipeline.py)：抓取与指标/信号在 FETCH_PROCESSES 个进程中进行
+# （CPU 计算跟着进程数扩展，只把结果记录传回主进程），序列化与写文件在主进程的线程中进行；
+# 队列容量即各阶段之间最多积压的股票数
+PIPELINE_QUEUE_SIZE = 64
+# 每个 worker 任务的股票数：一批拼成面板一次跑完信号 (common/panel_signals.py)
+# 太小摊不开面板的固定开销；太大则 worker 崩溃时重跑的股票多、各进程负载不均
+SCAN_BATCH_SIZE = 64
+
+# 回测进程数：纯计算，按CPU核数 (见 common/backtest.py)
+BACKTEST_PROCESSES = os.cpu_count() or 1
+
+# 各数据源限流 (见 common/rate_limiter.py)：rate 每秒请求数，burst 允许的突发请求数
+# 多个抓取进程共用同一组令牌桶，这里是全局上限
+RATE_LIMITS = {
+    'eastmoney': {'rate': 10, 'burst': 10},
+    'sina': {'rate': 5, 'burst': 5},
+    'ths': {'rate': 3, 'burst': 3},
+    'tushare': {'rate': 8, 'burst': 8},  # 日线接口 500次/分钟
+}
+
+# 落盘缓存 results/cache (见 common/disk_cache.py)
+# 总大小上限，超过后按最近访问时间淘汰
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+# 各 key 的过期秒数；未列出的 key 在同一 date 内一直有效（收盘数据）
+CACHE_TTLS = {
+    'spot_snapshot': 60,  # 盘中快照（B1 盘中重筛）
+}
+
 # 最小市值筛选 (单位: 亿元)
 MIN_MARKET_CAP = 100 
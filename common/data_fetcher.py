@@ -8,12 +8,13 @@ from tqdm import tqdm
 from typing import List, Optional, Callable, Any
 import time
 import os
-import pickle
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from .tushare_manager import TushareManager
-
-CACHE_DIR = "results/cache"
-os.makedirs(CACHE_DIR, exist_ok=True)
+from .disk_cache import get_disk_cache
+from .history_store import (
+    get_history_store, normalize_bars, adjust_bars, rebase_factors, MARKET_CLOSE_TIME
+)
+from .trade_calendar import get_trade_calendar, is_trade_day
 
 def fetch_data_with_cache(
     func: Callable,
@@ -21,6 +22,7 @@ def fetch_data_with_cache(
     date_str: str = None,
     cache_type: str = 'pickle',
     refresh: bool = False,
+    ttl: float = None,
     **kwargs
 ) -> Any:
     """
@@ -30,8 +32,9 @@ def fetch_data_with_cache(
         func: The data fetching function to execute
         cache_key: Unique identifier for the cache file
         date_str: Date string for versioning (default: today)
-        cache_type: 'pickle', 'csv', or 'parquet'
+        cache_type: 'pickle', 'csv', 'parquet' or 'feather' (memory-mapped, DataFrame only)
         refresh: Force refresh data ignoring cache
+        ttl: Expiry in seconds (default: config.CACHE_TTLS, otherwise valid for the whole date)
         **kwargs: Arguments to pass to func
 
     Returns:
@@ -40,45 +43,19 @@ def fetch_data_with_cache(
     if date_str is None:
         date_str = datetime.now().strftime("%Y%m%d")
 
-    # Create specific cache directory based on type/category if needed
-    # For now, put everything in results/cache
-
-    filename = f"{cache_key}_{date_str}.{cache_type}"
-    file_path = os.path.join(CACHE_DIR, filename)
-
-    if not refresh and os.path.exists(file_path):
-        try:
-            # print(f"Loading cached data: {file_path}")
-            if cache_type == 'pickle':
-                with open(file_path, 'rb') as f:
-                    return pickle.load(f)
-            elif cache_type == 'csv':
-                return pd.read_csv(file_path, dtype={'code': str})
-            elif cache_type == 'parquet':
-                return pd.read_parquet(file_path)
-        except Exception as e:
-            print(f"Error loading cache {file_path}: {e}")
-            # Fallthrough to fetch
+    cache = get_disk_cache()
+    if not refresh:
+        hit, data = cache.get(cache_key, date_str, cache_type, ttl=ttl)
+        if hit:
+            return data
 
     # Fetch data
     try:
         data = func(**kwargs)
 
-        # Save cache if data is valid
-        if data is not None:
-            if isinstance(data, pd.DataFrame) and data.empty:
-                return data # Don't cache empty dataframe? Or maybe do?
-
-            try:
-                if cache_type == 'pickle':
-                    with open(file_path, 'wb') as f:
-                        pickle.dump(data, f)
-                elif cache_type == 'csv' and isinstance(data, pd.DataFrame):
-                    data.to_csv(file_path, index=False)
-                elif cache_type == 'parquet' and isinstance(data, pd.DataFrame):
-                    data.to_parquet(file_path)
-            except Exception as e:
-                print(f"Error saving cache {file_path}: {e}")
+        # Save cache if data is valid (empty DataFrame is not cached)
+        if data is not None and not (isinstance(data, pd.DataFrame) and data.empty):
+            cache.put(cache_key, date_str, data, cache_type)
 
         return data
     except Exception as e:
@@ -301,7 +278,6 @@ def _fetch_industries_for_stocks(df: pd.DataFrame, sample_size: int = 200) -> pd
                 industry = industry_row.iloc[0]['value']
                 industry_map[code] = industry
                 success_count += 1
-            time.sleep(0.05)  # 避免请求过快
         except Exception as e:
             fail_count += 1
             if fail_count <= 3:  # 只打印前3个错误
@@ -399,15 +375,38 @@ def _add_market_prefix(code: str) -> str:
         return f"bj{code}"
     return code
 
-def get_stock_data(code: str, days: int = 300) -> Optional[pd.DataFrame]:
+def _factors_from_prev_close(close: pd.Series, prev_close: pd.Series) -> pd.Series:
     """
-    获取单只股票的日线数据 (Prioritize Tushare -> Sina -> Fallback to EastMoney)
+    由收盘价与交易所昨收（除权日为除权参考价）推算后复权因子
+    f_t = f_{t-1} * close_{t-1} / prev_close_t，首根K线因子为1
     """
+    ratio = close.shift(1) / prev_close
+    ratio = ratio.where((close.shift(1) - prev_close).abs() >= 0.005, 1.0).fillna(1.0)
+    return ratio.cumprod()
+
+
+def _fetch_stock_history(code: str, days: int = 300, start_date: str = None) -> Optional[pd.DataFrame]:
+    """
+    从数据源拉取单只股票的不复权日线 + 复权因子 (Prioritize Tushare -> Sina -> Fallback to EastMoney)
+
+    Args:
+        code: 股票代码
+        days: 未指定 start_date 时拉取的交易日数
+        start_date: YYYYMMDD，只拉取该日期之后的K线（增量尾部）
+
+    Returns:
+        DataFrame[date, open, high, low, close, volume, adj_factor]
+        成交量统一为"手"（新浪接口返回的是"股"，这里除以100）
+    """
+    if start_date is None:
+        start_date = (datetime.now() - timedelta(days=days*2)).strftime('%Y%m%d')
+    end_date = datetime.now().strftime('%Y%m%d')
+
     # 0. Try Tushare (Primary if configured)
     ts_manager = TushareManager()
     if ts_manager.is_ready:
         try:
-            df = ts_manager.get_daily_data(code, days)
+            df = ts_manager.get_raw_daily_data(code, days, start_date=start_date)
             if df is not None and not df.empty:
                 return df
         except Exception as e:
@@ -416,7 +415,7 @@ def get_stock_data(code: str, days: int = 300) -> Optional[pd.DataFrame]:
     # 1. Try Sina (Primary now due to EM blocking)
     try:
         sina_code = _add_market_prefix(code)
-        df = ak.stock_zh_a_daily(symbol=sina_code, adjust="qfq")
+        df = ak.stock_zh_a_daily(symbol=sina_code, start_date=start_date, end_date=end_date, adjust="")
         
         if df is not None and not df.empty:
             # Standardize columns
@@ -427,7 +426,16 @@ def get_stock_data(code: str, days: int = 300) -> Optional[pd.DataFrame]:
             if all(col in df.columns for col in required_cols):
                 df = df[required_cols].copy()
                 df['date'] = pd.to_datetime(df['date'])
+                df['volume'] = df['volume'] / 100
                 df = df.sort_values('date').reset_index(drop=True)
+
+                # 后复权因子（阶梯序列，只在除权日变化）
+                factors = ak.stock_zh_a_daily(symbol=sina_code, adjust="hfq-factor")
+                factors = factors.rename(columns={'hfq_factor': 'adj_factor'})[['date', 'adj_factor']]
+                factors['date'] = pd.to_datetime(factors['date'])
+                factors['adj_factor'] = pd.to_numeric(factors['adj_factor'], errors='coerce')
+                df = pd.merge_asof(df, factors.sort_values('date'), on='date', direction='backward')
+
                 if len(df) > days:
                     df = df.tail(days).reset_index(drop=True)
                 return df
@@ -442,9 +450,9 @@ def get_stock_data(code: str, days: int = 300) -> Optional[pd.DataFrame]:
                 df = ak.stock_zh_a_hist(
                     symbol=code,
                     period="daily",
-                    start_date=(datetime.now() - timedelta(days=days*2)).strftime('%Y%m%d'),
-                    end_date=datetime.now().strftime('%Y%m%d'),
-                    adjust="qfq"
+                    start_date=start_date,
+                    end_date=end_date,
+                    adjust=""
                 )
                 if df is not None and not df.empty:
                     break
@@ -452,10 +460,12 @@ def get_stock_data(code: str, days: int = 300) -> Optional[pd.DataFrame]:
                 time.sleep(0.5)
         
         if df is not None and not df.empty:
-             df = df.rename(columns={'日期': 'date', '开盘': 'open', '最高': 'high', '最低': 'low', '收盘': 'close', '成交量': 'volume'})
-             df = df[['date', 'open', 'high', 'low', 'close', 'volume']].copy()
+             df = df.rename(columns={'日期': 'date', '开盘': 'open', '最高': 'high', '最低': 'low', '收盘': 'close', '成交量': 'volume', '涨跌额': 'change'})
+             df = df[['date', 'open', 'high', 'low', 'close', 'volume', 'change']].copy()
              df['date'] = pd.to_datetime(df['date'])
              df = df.sort_values('date').reset_index(drop=True)
+             df['adj_factor'] = _factors_from_prev_close(df['close'], df['close'] - df['change'])
+             df = df.drop(columns=['change'])
              if len(df) > days:
                  df = df.tail(days).reset_index(drop=True)
              return df
@@ -465,14 +475,195 @@ def get_stock_data(code: str, days: int = 300) -> Optional[pd.DataFrame]:
     return None
 
 
-def batch_fetch_data(codes: List[str], days: int = 300, delay: float = 0.1) -> dict:
+def get_stock_data(code: str, days: int = 300) -> Optional[pd.DataFrame]:
+    """
+    获取单只股票的前复权日线数据 (本地仓库 + 增量尾部拉取)
+
+    1. 本地仓库已包含最近收盘交易日 -> 直接返回，不走网络
+    2. 否则只拉取 [本地最后一天, 今天] 的尾部并合并落盘
+       (以重叠的那根K线为锚点换算复权因子；原始价格对不上说明数据源异常，整段重拉)
+    3. 本地没有数据或深度不足 -> 全量拉取
+
+    本地存的是不复权价格 + 复权因子，前复权价格在读取时计算，除权除息不会让缓存失效。
+    """
+    store = get_history_store()
+    cached = store.load(code)
+    if cached is not None and len(cached) < days and store.depth(code) < days:
+        cached = None  # 本地深度不足，重新全量拉取
+
+    if cached is not None and not cached.empty:
+        if store.is_fresh(cached):
+            return adjust_bars(cached, 'qfq').tail(days).reset_index(drop=True)
+
+        last_bar = cached.iloc[-1]
+        tail = _fetch_stock_history(code, days, start_date=last_bar['date'].strftime('%Y%m%d'))
+        if tail is None or tail.empty:
+            return adjust_bars(cached, 'qfq').tail(days).reset_index(drop=True)
+
+        overlap = tail[tail['date'] == last_bar['date']]
+        if not overlap.empty and abs(float(overlap['close'].iloc[0]) - float(last_bar['close'])) < 0.011:
+            tail = rebase_factors(tail, last_bar['date'], float(last_bar['adj_factor']))
+            merged = normalize_bars(pd.concat([cached, tail], ignore_index=True))
+            store.save(code, store.closed_bars(merged))
+            return adjust_bars(merged, 'qfq').tail(days).reset_index(drop=True)
+        print(f"ℹ️ {code} 增量K线与本地数据对不上，重新拉取完整历史")
+
+    df = _fetch_stock_history(code, days)
+    if df is None or df.empty:
+        return None
+    df = normalize_bars(df)
+    store.save(code, store.closed_bars(df), depth=days)
+    return adjust_bars(df, 'qfq').tail(days).reset_index(drop=True)
+
+
+def get_spot_snapshot() -> Optional[pd.DataFrame]:
+    """
+    全市场A股实时行情快照（一次请求）
+
+    返回: DataFrame 包含 code, name, open, high, low, close, volume(手), prev_close 列
+    """
+    try:
+        spot = ak.stock_zh_a_spot_em()
+    except Exception as e:
+        print(f"获取全市场行情快照失败: {e}")
+        return None
+    if spot is None or spot.empty:
+        return None
+
+    snapshot = spot.rename(columns={
+        '代码': 'code', '名称': 'name', '今开': 'open', '最高': 'high',
+        '最低': 'low', '最新价': 'close', '成交量': 'volume', '昨收': 'prev_close'
+    })[['code', 'name', 'open', 'high', 'low', 'close', 'volume', 'prev_close']].copy()
+    snapshot['code'] = snapshot['code'].astype(str)
+    for col in ['open', 'high', 'low', 'close', 'volume', 'prev_close']:
+        snapshot[col] = pd.to_numeric(snapshot[col], errors='coerce')
+    return snapshot
+
+
+def get_intraday_snapshot(refresh: bool = False) -> Optional[pd.DataFrame]:
+    """
+    盘中全市场快照，落盘缓存按 config.CACHE_TTLS['spot_snapshot'] 过期
+
+    同一时段内多次重筛/多个模块共用一次请求。
+    """
+    return fetch_data_with_cache(
+        get_spot_snapshot, 'spot_snapshot', datetime.now().strftime('%Y%m%d'),
+        cache_type='feather', refresh=refresh
+    )
+
+
+def ingest_spot_snapshot(snapshot: pd.DataFrame = None) -> Optional[dict]:
+    """
+    收盘后用一张全市场快照把今日K线写入本地仓库
+
+    之后 get_stock_data 发现本地已是最新，不再逐只请求网络；
+    只有新股、缺K线或除权的股票才会走单只拉取。
+    盘中调用直接返回 None（快照不是收盘价，不能落盘）。
+    非交易日（按交易日历）或日历不可用时也返回 None：节假日的快照仍是上一交易日的K线，
+    昨收与本地收盘价一致时会被当成新K线以节假日日期写进仓库。
+    """
+    now = datetime.now()
+    if now.time() < MARKET_CLOSE_TIME:
+        return None
+    calendar = get_trade_calendar()
+    if calendar is None:
+        print("⚠️ 交易日历不可用，跳过快照入库（改为逐只增量拉取）")
+        return None
+    if not is_trade_day(now.date(), calendar):
+        return None
+
+    if snapshot is None:
+        ts_manager = TushareManager()
+        if ts_manager.is_ready:
+            snapshot = ts_manager.get_daily_by_date(now.strftime('%Y%m%d'))
+    if snapshot is None:
+        snapshot = fetch_data_with_cache(get_spot_snapshot, 'spot_snapshot_close', now.strftime('%Y%m%d'), cache_type='feather')
+    if snapshot is None or snapshot.empty:
+        return None
+
+    stats = get_history_store().ingest_daily_bars(snapshot, now.date())
+    print(f"📥 快照入库: 追加 {stats['appended']} | 已是最新 {stats['up_to_date']} | "
+          f"待单独拉取 {stats['missing'] + stats['mismatch']} (新股 {stats['missing']}, 缺口/除权 {stats['mismatch']})")
+    return stats
+
+
+def backfill_history_store(codes: List[str], days: int = 300, min_missing: int = 200) -> int:
     """
-    批量获取股票数据
+    本地仓库大面积缺失时（首次运行/换机器），用 Tushare 按交易日批量回填
+
+    每个交易日 daily + adj_factor 两次调用覆盖全市场，300天约600次调用，
+    而逐只 pro_bar 需要约2000次。缺失数量少于 min_missing 时交给逐只增量拉取。
+
+    Returns:
+        回填的股票数量
+    """
+    ts_manager = TushareManager()
+    if not ts_manager.is_ready:
+        return 0
+
+    store = get_history_store()
+    missing = [code for code in codes if not store.exists(code) or store.depth(code) < days]
+    if len(missing) < min_missing:
+        return 0
+
+    print(f"📦 本地仓库缺失 {len(missing)} 只股票，使用 Tushare 按交易日批量回填 {days} 天...")
+    frames = ts_manager.get_bulk_daily_data(days, adjust=None)
+    missing_set = set(missing)
+    filled = 0
+    for code, df in frames.items():
+        if code in missing_set and not df.empty:
+            store.save(code, store.closed_bars(df), depth=days)
+            filled += 1
+    print(f"✅ 批量回填完成: {filled} 只")
+    return filled
+
+
+def _deepen_stock(args: tuple) -> bool:
+    """FetchPool 任务：按 days 重新拉取单只股票的完整历史"""
+    code, days = args
+    return get_stock_data(code, days) is not None
+
+
+def deepen_history_store(codes: List[str], days: int, processes: int = None) -> int:
+    """
+    把本地仓库中覆盖不足 days 个交易日的股票补足历史
+
+    日线选股只需要约300天；多年回测、周线/月线选股需要更长的历史。
+    先用 Tushare 按交易日批量回填，仍不足的逐只全量拉取（FetchPool 多进程）。
+
+    Returns:
+        补足后仍不足 days 的股票数量（数据源失败）
+    """
+    store = get_history_store()
+    shallow = [code for code in codes if not store.covers(code, days)]
+    if not shallow:
+        return 0
+
+    print(f"📦 {len(shallow)} 只股票本地历史不足 {days} 个交易日，开始补足...")
+    backfill_history_store(shallow, days=days)
+    shallow = [code for code in shallow if not store.covers(code, days)]
+    if shallow:
+        from .fetch_pool import FetchPool
+        with FetchPool(processes=processes) as pool:
+            tasks = pool.imap_unordered(_deepen_stock, [(code, days) for code in shallow])
+            for _ in tqdm(tasks, total=len(shallow), desc="补足历史"):
+                pass
+        shallow = [code for code in shallow if not store.covers(code, days)]
+
+    if shallow:
+        print(f"⚠️ {len(shallow)} 只股票历史仍不足 {days} 个交易日（数据源失败）")
+    else:
+        print(f"✅ 本地历史已覆盖 {days} 个交易日")
+    return len(shallow)
+
+
+def batch_fetch_data(codes: List[str], days: int = 300) -> dict:
+    """
+    批量获取股票数据（请求速率由 common/rate_limiter 按数据源控制）
     
     Args:
         codes: 股票代码列表
         days: 获取天数
-        delay: 每次请求间隔（秒），避免被限流
     
     Returns:
         dict: {code: DataFrame}
@@ -483,8 +674,6 @@ def batch_fetch_data(codes: List[str], days: int = 300, delay: float = 0.1) -> d
         df = get_stock_data(code, days)
         if df is not None and len(df) >= 60:  # 至少需要60天数据
             result[code] = df
-        
-        time.sleep(delay)
     
     return result
 
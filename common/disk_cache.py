@@ -0,0 +1,172 @@
+"""
+落盘缓存 - fetch_data_with_cache 的存储层
+
+文件: results/cache/{key}_{date}.{pickle|csv|parquet|feather}
+  - 按 key 配置 TTL：盘中数据几分钟过期，收盘数据当天有效（date 变了自然换文件）
+  - 总大小超过上限时按最近访问时间 (LRU) 淘汰
+  - 先写临时文件再 rename，崩溃不会留下半个文件；读到损坏文件时删除并重新拉取
+  - DataFrame 可用 Feather (Arrow IPC, 不压缩) 存储，读取时内存映射，热加载基本零拷贝
+
+TTL 以文件修改时间 (mtime) 计算，LRU 以访问时间 (atime) 计算；
+命中时显式更新 atime，不依赖文件系统的 atime 挂载选项。
+淘汰时不碰其他进程/线程正在写的 *.tmp，只清理超过 TMP_MAX_AGE 的残留（写入中途崩溃留下的）。
+"""
+import os
+import pickle
+import threading
+import time
+from typing import Any, Optional
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from .config import CACHE_MAX_BYTES, CACHE_TTLS
+
+CACHE_DIR = "results/cache"
+CACHE_TYPES = ('pickle', 'csv', 'parquet', 'feather')
+TMP_SUFFIX = '.tmp'
+# 临时文件超过这个时间（秒）还没被 rename，视为崩溃残留
+TMP_MAX_AGE = 600
+
+
+class DiskCache:
+    """带 TTL 与 LRU 容量上限的文件缓存"""
+
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES, ttls: dict = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttls = CACHE_TTLS if ttls is None else ttls
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key: str, date_str: str, cache_type: str) -> str:
+        if cache_type not in CACHE_TYPES:
+            raise ValueError(f"unknown cache_type: {cache_type}")
+        return os.path.join(self.root, f"{key}_{date_str}.{cache_type}")
+
+    def ttl_for(self, key: str) -> Optional[float]:
+        """key 的过期秒数，None 表示当天内一直有效"""
+        return self.ttls.get(key)
+
+    def get(self, key: str, date_str: str, cache_type: str = 'pickle', ttl: float = None):
+        """
+        读取缓存，未命中/过期/损坏时返回 (False, None)
+
+        Returns:
+            (hit, data)
+        """
+        path = self.path(key, date_str, cache_type)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False, None
+
+        ttl = self.ttl_for(key) if ttl is None else ttl
+        if ttl is not None and time.time() - stat.st_mtime > ttl:
+            return False, None
+
+        try:
+            data = self._read(path, cache_type)
+        except Exception as e:
+            print(f"Error loading cache {path}: {e}")
+            self._remove(path)
+            return False, None
+
+        # 记录访问时间供 LRU 淘汰，保留 mtime 供 TTL 判断
+        try:
+            os.utime(path, (time.time(), stat.st_mtime))
+        except OSError:
+            pass
+        return True, data
+
+    def put(self, key: str, date_str: str, data: Any, cache_type: str = 'pickle'):
+        """原子写入后按容量上限淘汰"""
+        if cache_type in ('csv', 'parquet', 'feather') and not isinstance(data, pd.DataFrame):
+            return
+        path = self.path(key, date_str, cache_type)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}{TMP_SUFFIX}"
+        try:
+            self._write(tmp_path, data, cache_type)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error saving cache {path}: {e}")
+            self._remove(tmp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        """总大小超过上限时，从最久未访问的文件开始删除（正在写入的临时文件不计入也不删除）"""
+        with self._lock:
+            entries = []
+            total = 0
+            now = time.time()
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if not os.path.isfile(path):
+                    continue
+                if name.endswith(TMP_SUFFIX):
+                    # 其他 FetchPool 进程可能正在写；只清理早已过期的崩溃残留
+                    if now - stat.st_mtime > TMP_MAX_AGE:
+                        self._remove(path)
+                    continue
+                entries.append((stat.st_atime, stat.st_size, path))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _read(path: str, cache_type: str):
+        if cache_type == 'pickle':
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        if cache_type == 'csv':
+            return pd.read_csv(path, dtype={'code': str})
+        if cache_type == 'parquet':
+            return pd.read_parquet(path)
+        # 内存映射读取；split_blocks 避免合并 block 时的额外拷贝
+        table = feather.read_table(path, memory_map=True)
+        return table.to_pandas(split_blocks=True)
+
+    @staticmethod
+    def _write(path: str, data, cache_type: str):
+        if cache_type == 'pickle':
+            with open(path, 'wb') as f:
+                pickle.dump(data, f)
+        elif cache_type == 'csv':
+            data.to_csv(path, index=False)
+        elif cache_type == 'parquet':
+            data.to_parquet(path)
+        else:
+            # 不压缩才能内存映射零拷贝读取
+            feather.write_feather(data, path, compression='uncompressed')
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_disk_cache() -> DiskCache:
+    """进程内共享的默认缓存实例"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = DiskCache()
+        return _default_cache
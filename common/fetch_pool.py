@@ -0,0 +1,183 @@
+"""
+进程隔离的抓取池 - 每个 worker 是独立的解释器（以及独立的 mini_racer JS 运行时）
+
+akshare 部分接口依赖 libmini_racer，同一进程内并发调用会直接段错误把整个进程带走，
+所以之前只能 MAX_WORKERS = 1 串行抓取。这里改为多进程：
+  - 每个 worker 进程一次只处理一个任务，进程之间互不影响
+  - worker 崩溃（段错误 / os._exit）或单个任务超时时，父进程自动拉起新的 worker，
+    并把进行中的任务重新排队（最多 max_retries 次）
+  - 业务函数抛出的普通异常不会重试，按失败返回 None，交给调用方原有的重试逻辑
+  - 所有 worker 共用父进程的限流令牌桶 (common/rate_limiter.py)
+
+任务函数必须是模块级函数（spawn 方式需要能被 pickle），参数和返回值同样需要可 pickle。
+"""
+import multiprocessing as mp
+import pickle
+import queue
+import time
+from collections import deque
+
+from . import network
+from .config import FETCH_PROCESSES
+from .rate_limiter import get_rate_limiter
+
+# 父进程轮询结果队列的间隔（秒），同时也是检查 worker 存活状态的周期
+_POLL_INTERVAL = 0.5
+
+
+def _worker_main(worker_id, inbox, outbox, limiter_state, patch_network, initializer, initargs):
+    """worker 进程主循环: 取任务 -> 执行 -> 回传结果，收到 None 退出"""
+    # 与父进程共用限流令牌桶；父进程打过网络补丁的，子进程同样打上
+    get_rate_limiter().install_shared_state(limiter_state)
+    if patch_network:
+        network.apply_patch()
+    if initializer is not None:
+        initializer(*initargs)
+    while True:
+        task = inbox.get()
+        if task is None:
+            break
+        task_id, func, item = task
+        try:
+            # 在 worker 内先序列化，避免 Queue 后台线程 pickle 失败时结果被静默丢弃
+            payload = pickle.dumps(func(item))
+            ok = True
+        except Exception as e:
+            payload = f"{type(e).__name__}: {e}"
+            ok = False
+        outbox.put((worker_id, task_id, ok, payload))
+
+
+class FetchPool:
+    """
+    受监管的多进程抓取池
+
+    用法:
+        with FetchPool(processes=4) as pool:
+            for item, result in pool.imap_unordered(process_single_stock, args_list):
+                ...
+    """
+
+    def __init__(self, processes: int = None, max_retries: int = 2, task_timeout: float = None,
+                 initializer=None, initargs=()):
+        """
+        Args:
+            processes: worker 进程数，默认取 config.FETCH_PROCESSES
+            max_retries: worker 崩溃/超时后同一任务的最大重新排队次数
+            task_timeout: 单个任务的超时秒数（None 不限制），超时的 worker 会被强制结束
+            initializer: worker 启动时调用的初始化函数
+        """
+        self.processes = max(1, int(processes or FETCH_PROCESSES))
+        self.max_retries = max_retries
+        self.task_timeout = task_timeout
+        self._initializer = initializer
+        self._initargs = tuple(initargs)
+        self._ctx = mp.get_context('spawn')
+        self._limiter_state = get_rate_limiter().shared_state()
+        self._patch_network = network.is_patched()
+        self._outbox = self._ctx.Queue()
+        self._workers = {}  # worker_id -> (process, inbox)
+        self.restarts = 0
+        for worker_id in range(self.processes):
+            self._spawn(worker_id)
+
+    def _spawn(self, worker_id):
+        inbox = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, inbox, self._outbox, self._limiter_state, self._patch_network,
+                  self._initializer, self._initargs),
+            daemon=True,
+        )
+        process.start()
+        self._workers[worker_id] = (process, inbox)
+
+    def _restart(self, worker_id):
+        process, _ = self._workers[worker_id]
+        if process.is_alive():
+            process.terminate()
+        process.join(timeout=5)
+        self.restarts += 1
+        self._spawn(worker_id)
+
+    def imap_unordered(self, func, items):
+        """
+        按完成顺序产出 (item, result)
+
+        任务在重试次数用尽后仍崩溃，或函数本身抛异常时，result 为 None。
+        """
+        pending = deque(enumerate(items))
+        attempts = {}
+        in_flight = {}  # worker_id -> (task_id, item, started_at)
+        idle = deque(self._workers)
+
+        while pending or in_flight:
+            while idle and pending:
+                worker_id = idle.popleft()
+                task_id, item = pending.popleft()
+                self._workers[worker_id][1].put((task_id, func, item))
+                in_flight[worker_id] = (task_id, item, time.monotonic())
+
+            try:
+                worker_id, task_id, ok, payload = self._outbox.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                pass
+            else:
+                current = in_flight.get(worker_id)
+                # 已被判定崩溃/超时并重新排队的任务，迟到的结果直接丢弃
+                if current is not None and current[0] == task_id:
+                    del in_flight[worker_id]
+                    idle.append(worker_id)
+                    if ok:
+                        yield current[1], pickle.loads(payload)
+                    else:
+                        print(f"⚠️ 抓取任务失败: {current[1]} ({payload})")
+                        yield current[1], None
+
+            now = time.monotonic()
+            for worker_id, (task_id, item, started_at) in list(in_flight.items()):
+                process = self._workers[worker_id][0]
+                timed_out = self.task_timeout is not None and now - started_at > self.task_timeout
+                if process.is_alive() and not timed_out:
+                    continue
+
+                reason = "超时" if timed_out else f"进程退出(exitcode={process.exitcode})"
+                del in_flight[worker_id]
+                self._restart(worker_id)
+                idle.append(worker_id)
+
+                attempts[task_id] = attempts.get(task_id, 0) + 1
+                if attempts[task_id] <= self.max_retries:
+                    print(f"⚠️ worker {worker_id} {reason}，任务重新排队: {item}")
+                    pending.append((task_id, item))
+                else:
+                    print(f"❌ worker {worker_id} {reason}，重试 {self.max_retries} 次仍失败: {item}")
+                    yield item, None
+
+            # 空闲时意外退出的 worker 也补上，避免下一个任务派发给死进程
+            for worker_id in list(idle):
+                if not self._workers[worker_id][0].is_alive():
+                    self._restart(worker_id)
+
+    def close(self):
+        """通知所有 worker 退出，超时未退出的强制结束"""
+        for process, inbox in self._workers.values():
+            if process.is_alive():
+                try:
+                    inbox.put(None)
+                except Exception:
+                    pass
+        deadline = time.monotonic() + 5
+        for process, _ in self._workers.values():
+            process.join(timeout=max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout=1)
+        self._workers.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
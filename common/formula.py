@@ -0,0 +1,426 @@
+"""
+选股公式编译器 - 通达信/东财风格的公式文本 -> 去重后的向量化计算图
+
+语法（与东财公式编辑器一致的子集）:
+  名称:=表达式;   中间变量
+  名称:表达式;    输出（evaluate 默认返回全部输出）
+  {注释}  // 注释
+  运算符: + - * /   > < >= <= = <>   AND OR   负号
+          优先级 OR < AND < 比较 < 加减 < 乘除 < 负号，同级从左到右
+  函数:   REF MA EMA SMA HHV LLV COUNT EVERY EXIST BARSLAST CROSS ABS NOT
+  行情:   O/OPEN H/HIGH L/LOW C/CLOSE V/VOL/VOLUME，对应输入 open/high/low/close/volume
+  其余未定义的名称都是外部输入（指标列、逐只常量、周期参数等），求值时由 inputs 提供
+  英文名称不区分大小写（统一转成大写）。
+
+编译时对子表达式做哈希去重：`HHV(V,50)/3`、`REF(C,1)` 无论在公式里出现多少次都只算一次；
+求值时只计算所需输出用得到的节点，中间结果在最后一次被引用后立即释放。
+
+运算与 common.indicators 的函数一一对应，运算顺序与手写的 pandas 代码相同时结果逐位相同；
+除以 0 按 numpy/pandas 的语义得到 inf/NaN（不是通达信的 0）。
+
+求值后端 (ops):
+  SERIES_OPS           pandas Series，逐只计算
+  ARRAY_OPS            二维数组 (行=日期, 列=股票)；上市时间不同的面板用 array_ops(start)
+  lookback.LOOKBACK_OPS 推导回看长度；lookback.tail_ops 只算最后一根
+"""
+import operator
+import os
+import re
+import time
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+
+from .indicators import (
+    ref, ma, ema, sma, hhv, llv, count, every, exist, barslast, cross,
+    ref_2d, ma_2d, ema_2d, sma_2d, hhv_2d, llv_2d, count_2d, every_2d, exist_2d, barslast_2d, cross_2d,
+)
+
+FORMULA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'formulas')
+
+# 公式用到的序列函数：Series 版本与二维数组版本
+SERIES_OPS = SimpleNamespace(ref=ref, ma=ma, ema=ema, sma=sma, hhv=hhv, llv=llv, count=count, every=every,
+                             exist=exist, barslast=barslast, cross=cross)
+
+
+def array_ops(start: Optional[np.ndarray] = None) -> SimpleNamespace:
+    """
+    二维数组版本的函数集
+
+    start 为每列首根K线的行号（面板里上市时间不同的股票），只影响 SMA 的起算行；
+    默认每列都从第一行起算，与对单列调用 sma 一致。
+    """
+    def sma_cols(values, n, m):
+        first = np.zeros(np.shape(values)[1], dtype=np.int64) if start is None else start
+        return sma_2d(values, n, m, first)
+
+    return SimpleNamespace(ref=ref_2d, ma=ma_2d, ema=ema_2d, sma=sma_cols, hhv=hhv_2d, llv=llv_2d, count=count_2d,
+                           every=every_2d, exist=exist_2d, barslast=barslast_2d, cross=cross_2d)
+
+
+ARRAY_OPS = array_ops()
+
+# 行情别名 -> 输入名
+PRICE_ALIASES = {
+    'O': 'open', 'OPEN': 'open',
+    'H': 'high', 'HIGH': 'high',
+    'L': 'low', 'LOW': 'low',
+    'C': 'close', 'CLOSE': 'close',
+    'V': 'volume', 'VOL': 'volume', 'VOLUME': 'volume',
+}
+
+# 函数名 -> (序列参数个数, 周期参数个数)
+FUNCTIONS = {
+    'REF': (1, 1), 'MA': (1, 1), 'EMA': (1, 1), 'SMA': (1, 2),
+    'HHV': (1, 1), 'LLV': (1, 1), 'COUNT': (1, 1), 'EVERY': (1, 1), 'EXIST': (1, 1),
+    'BARSLAST': (1, 0), 'CROSS': (2, 0), 'ABS': (1, 0), 'NOT': (1, 0),
+}
+
+_BINARY = {
+    '+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv,
+    '>': operator.gt, '<': operator.lt, '>=': operator.ge, '<=': operator.le,
+    '=': operator.eq, '<>': operator.ne,
+    'AND': operator.and_, 'OR': operator.or_,
+}
+_PRICE_NAMES = {'open': 'O', 'high': 'H', 'low': 'L', 'close': 'C', 'volume': 'V'}
+_ALIASES = {'==': '=', '!=': '<>', '&&': 'AND', '||': 'OR'}
+_COMPARISONS = ('>', '<', '>=', '<=', '=', '<>')
+_PRECEDENCE = {'OR': 1, 'AND': 2, **{op: 3 for op in _COMPARISONS}, '+': 4, '-': 4, '*': 5, '/': 5, 'neg': 6}
+
+_TOKEN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>\{[^}]*\}|//[^\n]*)
+  | (?P<number>\d+\.\d*|\.\d+|\d+)
+  | (?P<name>[A-Za-z_\u4e00-\u9fff][A-Za-z0-9_\u4e00-\u9fff]*)
+  | (?P<op>:=|>=|<=|<>|!=|==|&&|\|\||[-+*/()<>=:;,])
+""", re.VERBOSE)
+
+
+class FormulaError(ValueError):
+    """公式语法错误或引用了不存在的名称"""
+
+
+def _tokenize(text: str) -> List[tuple]:
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if match is None:
+            raise FormulaError(f"无法识别的字符 {text[pos]!r} (位置 {pos})")
+        kind = match.lastgroup
+        value = match.group()
+        if kind == 'name':
+            value = value.upper()
+            if value in ('AND', 'OR'):
+                kind = 'op'
+        elif kind == 'op':
+            value = _ALIASES.get(value, value)
+        if kind not in ('space', 'comment'):
+            tokens.append((kind, value, pos))
+        pos = match.end()
+    tokens.append(('end', '', pos))
+    return tokens
+
+
+def _children(node: tuple) -> tuple:
+    if node[0] in ('const', 'input'):
+        return ()
+    return node[2:] if node[0] == 'call' else node[1:]
+
+
+class Formula:
+    """
+    编译后的公式
+
+    nodes 按拓扑顺序存放去重后的计算节点:
+      ('const', 值) / ('input', 名称) / ('neg', x) / (运算符, a, b) / ('call', 函数名, 序列参数..., 周期参数...)
+    其中 x/a/b/序列参数/周期参数 都是节点编号。
+    """
+
+    def __init__(self, text: str, name: str = None):
+        self.name = name
+        self.nodes: List[tuple] = []
+        self.variables: Dict[str, int] = {}
+        self.outputs: List[str] = []
+        self.references = 0  # 去重前的节点引用次数，用于观察去重效果
+        self.owners: List[str] = []  # 每个节点首次出现在哪条语句（按变量名），性能剖析按此归集耗时
+        self._ids: Dict[tuple, int] = {}
+        self._plans: Dict[tuple, List[int]] = {}
+        self._compile(text)
+
+    # ---------- 编译 ----------
+
+    def _node(self, key: tuple) -> int:
+        self.references += 1
+        node_id = self._ids.get(key)
+        if node_id is None:
+            node_id = self._ids[key] = len(self.nodes)
+            self.nodes.append(key)
+            self.owners.append(self._statement)
+        return node_id
+
+    def _compile(self, text: str):
+        self._tokens = _tokenize(text)
+        self._pos = 0
+        while self._peek()[0] != 'end':
+            kind, target, _ = self._next()
+            if kind != 'name' or self._peek()[1] not in (':=', ':'):
+                raise FormulaError(f"{self._where()} 语句应为 名称:=表达式; 或 名称:表达式;")
+            self._statement = target
+            assign = self._next()[1]
+            self.variables[target] = self._expression()
+            if assign == ':' and target not in self.outputs:
+                self.outputs.append(target)
+            self._expect(';')
+        del self._tokens, self._statement
+
+    def _peek(self):
+        return self._tokens[self._pos]
+
+    def _next(self):
+        token = self._tokens[self._pos]
+        self._pos += 1
+        return token
+
+    def _expect(self, value: str):
+        token = self._next()
+        if token[1] != value:
+            raise FormulaError(f"{self._where(token)} 缺少 {value!r}")
+
+    def _where(self, token=None) -> str:
+        token = token or self._tokens[max(self._pos - 1, 0)]
+        return f"{self.name or '公式'} 位置 {token[2]} ({token[1]!r}):"
+
+    def _binary_level(self, operators, operand) -> int:
+        left = operand()
+        while self._peek()[0] == 'op' and self._peek()[1] in operators:
+            op = self._next()[1]
+            left = self._node((op, left, operand()))
+        return left
+
+    def _expression(self) -> int:
+        return self._binary_level(('OR',), self._and)
+
+    def _and(self) -> int:
+        return self._binary_level(('AND',), self._comparison)
+
+    def _comparison(self) -> int:
+        return self._binary_level(_COMPARISONS, self._additive)
+
+    def _additive(self) -> int:
+        return self._binary_level(('+', '-'), self._term)
+
+    def _term(self) -> int:
+        return self._binary_level(('*', '/'), self._unary)
+
+    def _unary(self) -> int:
+        if self._peek()[1] == '-':
+            self._next()
+            operand = self._unary()
+            node = self.nodes[operand]
+            if node[0] == 'const':
+                # 负数常量直接折叠
+                return self._node(('const', -node[1]))
+            return self._node(('neg', operand))
+        if self._peek()[1] == '+':
+            self._next()
+            return self._unary()
+        return self._primary()
+
+    def _primary(self) -> int:
+        kind, value, _ = self._next()
+        if kind == 'number':
+            number = float(value) if ('.' in value) else int(value)
+            return self._node(('const', number))
+        if value == '(':
+            node = self._expression()
+            self._expect(')')
+            return node
+        if kind != 'name':
+            raise FormulaError(f"{self._where()} 缺少表达式")
+
+        if self._peek()[1] == '(':
+            return self._call(value)
+        if value in self.variables:
+            self.references += 1
+            return self.variables[value]
+        return self._node(('input', PRICE_ALIASES.get(value, value)))
+
+    def _call(self, function: str) -> int:
+        if function not in FUNCTIONS:
+            raise FormulaError(f"{self._where()} 不支持的函数 {function}")
+        self._expect('(')
+        args = []
+        if self._peek()[1] != ')':
+            args.append(self._expression())
+            while self._peek()[1] == ',':
+                self._next()
+                args.append(self._expression())
+        self._expect(')')
+
+        series_count, period_count = FUNCTIONS[function]
+        if len(args) != series_count + period_count:
+            raise FormulaError(f"{self._where()} {function} 需要 {series_count + period_count} 个参数，实际 {len(args)} 个")
+        for arg in args[series_count:]:
+            if self.nodes[arg][0] not in ('const', 'input'):
+                raise FormulaError(f"{self._where()} {function} 的周期参数必须是数字或外部输入")
+        return self._node(('call', function, *args))
+
+    # ---------- 结构 ----------
+
+    def describe(self, node_id: int, top: bool = True) -> str:
+        """节点的公式文本；已命名的子表达式用变量名表示"""
+        node = self.nodes[node_id]
+        if not top:
+            for name, variable in self.variables.items():
+                if variable == node_id:
+                    return name
+        kind = node[0]
+        if kind == 'const':
+            return repr(node[1])
+        if kind == 'input':
+            return _PRICE_NAMES.get(node[1], node[1])
+        if kind == 'neg':
+            return f"-{self._operand(node[1], kind, right=True)}"
+        if kind == 'call':
+            return f"{node[1]}({','.join(self.describe(arg, top=False) for arg in node[2:])})"
+        separator = f" {kind} " if kind in ('AND', 'OR') else kind
+        return f"{self._operand(node[1], kind)}{separator}{self._operand(node[2], kind, right=True)}"
+
+    def _operand(self, node_id: int, parent: str, right: bool = False) -> str:
+        text = self.describe(node_id, top=False)
+        kind = self.nodes[node_id][0]
+        if kind not in _PRECEDENCE or text in self.variables:
+            return text
+        # 比较放在 AND/OR 里照公式习惯加括号；其余按优先级，同级只有左结合的一侧可以省略
+        if kind in _COMPARISONS and parent in ('AND', 'OR'):
+            return f"({text})"
+        if _PRECEDENCE[kind] > _PRECEDENCE[parent] or (_PRECEDENCE[kind] == _PRECEDENCE[parent] and not right):
+            return text
+        return f"({text})"
+
+    def conjuncts(self, name: str) -> List[int]:
+        """变量按顶层 AND 拆开的各个条件（节点编号，按公式中的顺序；已命名的子条件不再展开）"""
+        root = self.variables[name.upper()]
+        named = set(self.variables.values())
+
+        def flatten(node_id):
+            node = self.nodes[node_id]
+            if node[0] == 'AND' and (node_id == root or node_id not in named):
+                return flatten(node[1]) + flatten(node[2])
+            return [node_id]
+
+        return flatten(root)
+
+    # ---------- 求值 ----------
+
+    def stats(self) -> dict:
+        """去重统计: 去重前的节点引用次数 / 实际节点数"""
+        return {'references': self.references, 'nodes': len(self.nodes)}
+
+    def inputs(self) -> List[str]:
+        """公式需要的外部输入名称"""
+        return [node[1] for node in self.nodes if node[0] == 'input']
+
+    def _plan(self, targets: tuple) -> List[tuple]:
+        """
+        目标输出可达的节点（按拓扑顺序）
+
+        Returns:
+            [(节点编号, 算完该节点后可以释放的中间结果编号)]，长历史的面板只保留仍会用到的中间量
+        """
+        plan = self._plans.get(targets)
+        if plan is None:
+            needed = set()
+            stack = [self.variables[name] for name in targets]
+            while stack:
+                node_id = stack.pop()
+                if node_id in needed:
+                    continue
+                needed.add(node_id)
+                node = self.nodes[node_id]
+                stack.extend(_children(node))
+            order = sorted(needed)
+            last_use = {}
+            for node_id in order:
+                for child in _children(self.nodes[node_id]):
+                    last_use[child] = node_id
+            keep = {self.variables[name] for name in targets}
+            release = {node_id: [] for node_id in order}
+            for child, node_id in last_use.items():
+                if child not in keep:
+                    release[node_id].append(child)
+            plan = self._plans[targets] = [(node_id, tuple(release[node_id])) for node_id in order]
+        return plan
+
+    def evaluate(self, inputs: Mapping, ops: SimpleNamespace = SERIES_OPS,
+                 outputs: Optional[Iterable[str]] = None, profile=None) -> dict:
+        """
+        求值
+
+        Args:
+            inputs: 外部输入，按名称取值（dict 或 DataFrame 均可）
+            ops: 求值后端 (SERIES_OPS / ARRAY_OPS / array_ops(start) / LOOKBACK_OPS / tail_ops(...))
+            outputs: 需要的变量名，默认为全部输出
+            profile: signal_profile.SignalProfile，记录每条语句的耗时与最后一根K线的命中情况
+
+        Returns:
+            {变量名: 结果}
+        """
+        targets = tuple(self.outputs if outputs is None else (name.upper() for name in outputs))
+        missing = [name for name in targets if name not in self.variables]
+        if missing:
+            raise FormulaError(f"{self.name or '公式'} 中没有变量: {', '.join(missing)}")
+
+        values = {}
+        if profile is not None:
+            # 剖析时保留全部中间结果，求值结束后统计各条件的命中与淘汰
+            for node_id, _ in self._plan(targets):
+                started = time.perf_counter()
+                values[node_id] = self._evaluate_node(self.nodes[node_id], values, inputs, ops)
+                profile.add_time(self.owners[node_id], time.perf_counter() - started)
+            profile.record(self, values, targets)
+        else:
+            for node_id, release in self._plan(targets):
+                values[node_id] = self._evaluate_node(self.nodes[node_id], values, inputs, ops)
+                for done in release:
+                    del values[done]
+        return {name: values[self.variables[name]] for name in targets}
+
+    def _evaluate_node(self, node: tuple, values: dict, inputs: Mapping, ops):
+        kind = node[0]
+        if kind == 'const':
+            return node[1]
+        if kind == 'input':
+            try:
+                return inputs[node[1]]
+            except KeyError:
+                raise FormulaError(f"{self.name or '公式'} 缺少输入: {node[1]}") from None
+        if kind == 'neg':
+            return -values[node[1]]
+        if kind == 'call':
+            function = node[1]
+            series_count = FUNCTIONS[function][0]
+            args = [values[arg] for arg in node[2:2 + series_count]]
+            periods = [int(values[arg]) for arg in node[2 + series_count:]]
+            if function == 'ABS':
+                return abs(args[0])
+            if function == 'NOT':
+                return ~args[0]
+            return getattr(ops, function.lower())(*args, *periods)
+        return _BINARY[kind](values[node[1]], values[node[2]])
+
+
+def compile_formula(text: str, name: str = None) -> Formula:
+    """编译公式文本"""
+    return Formula(text, name)
+
+
+@lru_cache(maxsize=None)
+def load_formula(name: str) -> Formula:
+    """按名称加载并编译 config/formulas/{name}.txt（进程内缓存，编译一次）"""
+    path = os.path.join(FORMULA_DIR, f"{name}.txt")
+    with open(path, encoding='utf-8') as f:
+        return Formula(f.read(), name)
@@ -0,0 +1,329 @@
+"""
+本地日线行情仓库 - 按股票分区的列式存储 (Parquet)
+
+每只股票一个文件: results/history/{code}.parquet
+列: date, open, high, low, close, volume, adj_factor
+  - 价格为不复权原始价格，成交量统一为"手"
+  - adj_factor 为后复权因子（同一只股票内只有相对比值有意义）
+
+读取时按因子向量化计算前复权/后复权价格，除权除息只需要更新因子序列，
+已落盘的K线不会因为复权而失效。
+
+get_stock_data 先读本地仓库，只向数据源请求缺失的尾部K线，
+避免每次全市场选股都重复下载300天历史。
+"""
+import os
+import threading
+from datetime import datetime, time as dt_time, timedelta
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .resample import resample_bars
+from .trade_calendar import is_trade_day
+
+HISTORY_DIR = "results/history"
+BAR_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume']
+STORE_COLUMNS = BAR_COLUMNS + ['adj_factor']
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+# A股收盘时间，之前拿到的当日K线是盘中数据，不落盘
+MARKET_CLOSE_TIME = dt_time(15, 0)
+
+# Parquet schema metadata: 首次拉取时请求的历史深度（交易日数）
+_DEPTH_KEY = b'history_depth'
+
+
+def expected_last_trade_date(now: datetime = None, trade_dates=None) -> pd.Timestamp:
+    """
+    当前时刻应当已经收盘的最近一个交易日（按交易日历跳过周末和节假日，日历不可用时只跳过周末）
+
+    trade_dates: 交易日列表，缺省用 common/trade_calendar 的日历
+    """
+    now = now or datetime.now()
+    day = now.date()
+    if now.time() < MARKET_CLOSE_TIME:
+        day -= timedelta(days=1)
+    while not is_trade_day(day, trade_dates):
+        day -= timedelta(days=1)
+    return pd.Timestamp(day)
+
+
+def normalize_bars(df: pd.DataFrame) -> pd.DataFrame:
+    """统一列、类型与排序，按日期去重（保留最新写入的一条）；缺失的复权因子沿用前值"""
+    df = df.copy()
+    if 'adj_factor' not in df.columns:
+        df['adj_factor'] = 1.0
+    df = df[STORE_COLUMNS]
+    df['date'] = pd.to_datetime(df['date'])
+    for col in STORE_COLUMNS[1:]:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    df = df.drop_duplicates(subset='date', keep='last')
+    df = df.sort_values('date').reset_index(drop=True)
+    df['adj_factor'] = df['adj_factor'].ffill().bfill().fillna(1.0)
+    return df
+
+
+def adjust_bars(df: pd.DataFrame, adjust: Optional[str] = 'qfq') -> pd.DataFrame:
+    """
+    由原始K线 + 复权因子计算复权价格
+
+    Args:
+        adjust: 'qfq' 前复权（以最后一根K线为基准）/ 'hfq' 后复权 / None 不复权
+
+    Returns:
+        DataFrame[date, open, high, low, close, volume]，价格保留2位小数（与数据源口径一致）
+    """
+    out = df[BAR_COLUMNS].copy()
+    if adjust is None or df.empty:
+        return out.reset_index(drop=True)
+
+    factor = df['adj_factor'].to_numpy()
+    if adjust == 'qfq':
+        ratio = factor / factor[-1]
+    elif adjust == 'hfq':
+        ratio = factor
+    else:
+        raise ValueError(f"unknown adjust: {adjust}")
+
+    for col in PRICE_COLUMNS:
+        out[col] = (df[col].to_numpy() * ratio).round(2)
+    return out.reset_index(drop=True)
+
+
+def rebase_factors(tail: pd.DataFrame, anchor_date, anchor_factor: float) -> pd.DataFrame:
+    """
+    把另一数据源拉取的尾部K线的复权因子换算到本地序列的尺度
+
+    不同数据源的因子基准不同，只有比值有意义：以重叠那根K线为锚点整体缩放。
+    """
+    overlap = tail[tail['date'] == anchor_date]
+    if overlap.empty:
+        return tail
+    scale = anchor_factor / float(overlap['adj_factor'].iloc[0])
+    tail = tail.copy()
+    tail['adj_factor'] = tail['adj_factor'] * scale
+    return tail
+
+
+def next_bar_factor(last_bar, prev_close: float, trade_date) -> Optional[float]:
+    """
+    由交易所公布的昨收推算下一根K线的复权因子
+
+      - 昨收与本地最后收盘价一致: 沿用最后一个复权因子
+      - 不一致且两根K线紧邻: 除权除息，按定义推算 f_new = f_last * last_close / prev_close
+      - 否则（可能缺K线）返回 None
+    """
+    if pd.isna(prev_close) or prev_close <= 0:
+        return None
+    last_close = float(last_bar['close'])
+    factor = float(last_bar['adj_factor'])
+    if abs(last_close - float(prev_close)) < 0.011:
+        return factor
+    if last_bar['date'] + pd.offsets.BDay(1) != pd.Timestamp(trade_date).normalize():
+        return None
+    return factor * last_close / float(prev_close)
+
+
+def append_live_bar(raw: pd.DataFrame, bar, trade_date) -> Optional[pd.DataFrame]:
+    """
+    把盘中实时K线接到本地原始K线之后（只在内存中，不落盘）
+
+    bar 需包含 open, high, low, close, volume, prev_close；
+    本地已有 trade_date 当天或之后的K线时先去掉，以实时数据为准。
+    复权因子对不上（缺K线）时返回 None。
+    """
+    trade_date = pd.Timestamp(trade_date).normalize()
+    history = raw[raw['date'] < trade_date]
+    if history.empty:
+        return None
+    factor = next_bar_factor(history.iloc[-1], bar['prev_close'], trade_date)
+    if factor is None:
+        return None
+    live = pd.DataFrame([{
+        'date': trade_date,
+        'open': float(bar['open']),
+        'high': float(bar['high']),
+        'low': float(bar['low']),
+        'close': float(bar['close']),
+        'volume': float(bar['volume']),
+        'adj_factor': factor,
+    }])
+    return pd.concat([history, live], ignore_index=True)
+
+
+class HistoryStore:
+    """按股票分区的本地日线仓库"""
+
+    def __init__(self, root: str = HISTORY_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, code: str) -> str:
+        return os.path.join(self.root, f"{code}.parquet")
+
+    def codes(self) -> list:
+        """本地仓库中的全部股票代码（按代码排序）"""
+        return sorted(name[:-len('.parquet')] for name in os.listdir(self.root) if name.endswith('.parquet'))
+
+    def exists(self, code: str) -> bool:
+        """本地是否有可用（新格式）的K线文件"""
+        path = self._path(code)
+        if not os.path.exists(path):
+            return False
+        try:
+            return 'adj_factor' in pq.read_schema(path).names
+        except Exception:
+            return False
+
+    def load(self, code: str) -> Optional[pd.DataFrame]:
+        """
+        读取单只股票的全部本地K线（原始价格 + 复权因子）
+        不存在、损坏或为旧版前复权格式（无 adj_factor 列）时返回 None
+        """
+        path = self._path(code)
+        if not os.path.exists(path):
+            return None
+        try:
+            df = pq.read_table(path).to_pandas()
+        except Exception as e:
+            print(f"⚠️ 本地行情文件损坏，忽略: {path} ({e})")
+            return None
+        if 'adj_factor' not in df.columns:
+            return None
+        return df
+
+    def load_adjusted(self, code: str, adjust: Optional[str] = 'qfq', timeframe: str = 'D') -> Optional[pd.DataFrame]:
+        """读取复权后的K线；timeframe 为 'W'/'M' 时由日线合成周线/月线 (common/resample.py)"""
+        df = self.load(code)
+        if df is None:
+            return None
+        return resample_bars(adjust_bars(df, adjust), timeframe)
+
+    def depth(self, code: str) -> int:
+        """首次拉取时请求的历史深度，用于判断本地数据是否已覆盖所需天数"""
+        path = self._path(code)
+        if not os.path.exists(path):
+            return 0
+        try:
+            metadata = pq.read_schema(path).metadata or {}
+            return int(metadata.get(_DEPTH_KEY, b'0'))
+        except Exception:
+            return 0
+
+    def covers(self, code: str, days: int) -> bool:
+        """本地数据是否已覆盖 days 个交易日：首次拉取深度够（上市不足 days 天的也算），或K线根数够"""
+        if self.depth(code) >= days:
+            return True
+        try:
+            return pq.read_metadata(self._path(code)).num_rows >= days
+        except Exception:
+            return False
+
+    def save(self, code: str, df: pd.DataFrame, depth: int = None):
+        """原子写入（先写临时文件再 rename），崩溃时不会留下半个文件"""
+        df = normalize_bars(df)
+        if depth is None:
+            depth = self.depth(code)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[_DEPTH_KEY] = str(int(depth)).encode()
+        table = table.replace_schema_metadata(metadata)
+
+        path = self._path(code)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+
+    def append(self, code: str, bars: pd.DataFrame) -> pd.DataFrame:
+        """把新K线合并进本地仓库（同日期以新数据为准），返回合并后的全部K线"""
+        existing = self.load(code)
+        if existing is not None and not existing.empty:
+            merged = pd.concat([existing, bars], ignore_index=True)
+        else:
+            merged = bars
+        merged = normalize_bars(merged)
+        self.save(code, merged)
+        return merged
+
+    def last_date(self, code: str) -> Optional[pd.Timestamp]:
+        df = self.load(code)
+        if df is None or df.empty:
+            return None
+        return df['date'].iloc[-1]
+
+    def ingest_daily_bars(self, bars: pd.DataFrame, trade_date) -> dict:
+        """
+        把全市场当日K线（一张快照表）追加到每只股票的本地仓库
+
+        bars 需包含: code, open, high, low, close, volume, prev_close
+        (prev_close 为交易所公布的昨收，除权日即除权参考价)
+
+        复权因子按 next_bar_factor 推算；对不上（可能缺K线）的留给逐只增量拉取处理，
+        本地没有历史的新股同样跳过。
+        """
+        trade_date = pd.Timestamp(trade_date).normalize()
+        stats = {'appended': 0, 'up_to_date': 0, 'missing': 0, 'mismatch': 0, 'adjusted': 0}
+
+        valid = bars[(bars['close'] > 0) & (bars['volume'] > 0)]
+        for row in valid.itertuples(index=False):
+            code = str(row.code)
+            existing = self.load(code)
+            if existing is None or existing.empty:
+                stats['missing'] += 1
+                continue
+
+            last_bar = existing.iloc[-1]
+            if last_bar['date'] >= trade_date:
+                stats['up_to_date'] += 1
+                continue
+            new_factor = next_bar_factor(last_bar, row.prev_close, trade_date)
+            if new_factor is None:
+                stats['mismatch'] += 1
+                continue
+            if new_factor != float(last_bar['adj_factor']):
+                stats['adjusted'] += 1
+
+            new_bar = pd.DataFrame([{
+                'date': trade_date,
+                'open': row.open,
+                'high': row.high,
+                'low': row.low,
+                'close': row.close,
+                'volume': row.volume,
+                'adj_factor': new_factor,
+            }])
+            self.save(code, pd.concat([existing, new_bar], ignore_index=True))
+            stats['appended'] += 1
+
+        return stats
+
+    @staticmethod
+    def is_fresh(df: Optional[pd.DataFrame], now: datetime = None, trade_dates=None) -> bool:
+        """本地数据是否已包含最近一个收盘交易日"""
+        if df is None or df.empty:
+            return False
+        return df['date'].iloc[-1] >= expected_last_trade_date(now, trade_dates)
+
+    @staticmethod
+    def closed_bars(df: pd.DataFrame, now: datetime = None) -> pd.DataFrame:
+        """去掉尚未收盘的当日K线（盘中数据不落盘）"""
+        now = now or datetime.now()
+        if now.time() >= MARKET_CLOSE_TIME:
+            return df
+        return df[df['date'] < pd.Timestamp(now.date())]
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_history_store() -> HistoryStore:
+    """进程内共享的默认仓库实例"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = HistoryStore()
+        return _default_store
@@ -4,6 +4,8 @@
 """
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from pandas.api.indexers import BaseIndexer
 from typing import Union
 
 Series = pd.Series
@@ -30,19 +32,58 @@ def sma(series: Series, n: int, m: int) -> Series:
     SMA: 东财公式的加权移动平均
     公式: SMA(X,N,M) = (M*X + (N-M)*REF(SMA,1)) / N
     注意: 这与 TA-Lib 的 SMA 不同
+
+    首个值为 NaN 时以 0 起算，之后遇到 NaN 沿用上一个值。
+    递推在原始数组上进行（逐元素运算与原实现完全一致，结果逐位相同）。
     """
-    result = np.zeros(len(series))
-    result[0] = series.iloc[0] if not np.isnan(series.iloc[0]) else 0
-    
-    for i in range(1, len(series)):
-        if np.isnan(series.iloc[i]):
-            result[i] = result[i-1]
-        else:
-            result[i] = (m * series.iloc[i] + (n - m) * result[i-1]) / n
-    
+    values = series.to_numpy(dtype='float64').tolist()
+    result = np.empty(len(values))
+    if not values:
+        return pd.Series(result, index=series.index)
+
+    prev = values[0] if values[0] == values[0] else 0.0
+    result[0] = prev
+    for i in range(1, len(values)):
+        x = values[i]
+        if x == x:  # 非 NaN
+            prev = (m * x + (n - m) * prev) / n
+        result[i] = prev
+
     return pd.Series(result, index=series.index)
 
 
+def first_valid_rows(values: np.ndarray) -> np.ndarray:
+    """二维数组每列第一个非 NaN 的行号（全为 NaN 的列返回行数）"""
+    valid = ~np.isnan(values)
+    return np.where(valid.any(axis=0), valid.argmax(axis=0), values.shape[0])
+
+
+def sma_2d(values: np.ndarray, n: int, m: int, start: np.ndarray = None) -> np.ndarray:
+    """
+    SMA 的多品种版本: values 为 日期 x 品种 矩阵，按行递推、各列同时计算
+
+    start 为每列的首根K线行号（默认取每列第一个非 NaN 的行），之前的行输出 NaN；
+    首根K线为 NaN 时以 0 起算。每列结果与对该列从 start 开始调用 sma 逐位相同。
+    """
+    values = np.asarray(values, dtype='float64')
+    if start is None:
+        start = first_valid_rows(values)
+    start = np.asarray(start)
+
+    result = np.empty_like(values)
+    prev = np.zeros(values.shape[1])
+    for i in range(values.shape[0]):
+        x = values[i]
+        missing = np.isnan(x)
+        cur = np.where(missing, prev, (m * x + (n - m) * prev) / n)
+        cur = np.where(start == i, np.where(missing, 0.0, x), cur)
+        result[i] = cur
+        prev = cur
+
+    result[np.arange(values.shape[0])[:, None] < start] = np.nan
+    return result
+
+
 def hhv(series: Series, n: int) -> Series:
     """HHV: N周期内最高值"""
     return series.rolling(window=n, min_periods=1).max()
@@ -53,13 +94,139 @@ def llv(series: Series, n: int) -> Series:
     return series.rolling(window=n, min_periods=1).min()
 
 
+def _hhvbars_kernel(values: np.ndarray, n: int, start: np.ndarray) -> np.ndarray:
+    """
+    HHVBARS 的二维实现 (行=日期, 列=品种)，start 之前的行视为尚未上市
+
+    每个窗口取 argmax（并列取最早的一个，NaN 视为最大，与 np.argmax 一致），
+    前面不足 n 根时用 -inf 补齐，再截断到该列已有的K线数。
+    """
+    rows = np.arange(values.shape[0])[:, None]
+    before = rows < start
+    padded = np.concatenate([np.full((n - 1, values.shape[1]), -np.inf), np.where(before, -np.inf, values)])
+    windows = sliding_window_view(padded, n, axis=0)
+    bars = (n - 1 - windows.argmax(axis=-1)).astype('float64')
+    bars = np.minimum(bars, rows - start)
+
+    # 窗口内一个有效值都没有时为 NaN (rolling min_periods=1)
+    valid_count = np.cumsum(~np.isnan(values) & ~before, axis=0)
+    valid_count[n:] = valid_count[n:] - valid_count[:-n]
+    bars[(valid_count == 0) | before] = np.nan
+    return bars
+
+
 def hhvbars(series: Series, n: int) -> Series:
     """HHVBARS: N周期内最高值到当前的周期数"""
-    def bars_since_max(x):
-        if len(x) == 0:
-            return 0
-        return len(x) - 1 - np.argmax(x.values)
-    return series.rolling(window=n, min_periods=1).apply(bars_since_max, raw=False)
+    values = series.to_numpy(dtype='float64').reshape(-1, 1)
+    bars = _hhvbars_kernel(values, n, np.zeros(1, dtype=int))
+    return pd.Series(bars[:, 0], index=series.index)
+
+
+def hhvbars_2d(values: np.ndarray, n: int, start: np.ndarray = None) -> np.ndarray:
+    """
+    HHVBARS 的多品种版本: values 为 日期 x 品种 矩阵
+
+    start 为每列的首根K线行号，默认取每列第一个非 NaN 的行（之前的行视为未上市，输出 NaN）；
+    每列结果与对该列去掉前导 NaN 后调用 hhvbars 一致。
+    """
+    values = np.asarray(values, dtype='float64')
+    if start is None:
+        start = first_valid_rows(values)
+    return _hhvbars_kernel(values, n, np.asarray(start))
+
+
+# ============ 二维版本 (行=日期, 列=品种) ============
+# 与上面的 Series 版本一一对应，逐列结果逐位相同；上市前的行为 NaN，比较结果为 False
+
+def ref_2d(values: np.ndarray, n: int = 1) -> np.ndarray:
+    """REF 的二维版本"""
+    values = np.asarray(values, dtype='float64')
+    result = np.full_like(values, np.nan)
+    if n < len(values):
+        result[n:] = values[:len(values) - n]
+    return result
+
+
+class _ColumnWindowIndexer(BaseIndexer):
+    """二维数组按列展开成一维后的滚动窗口：窗口不跨越列边界（相当于每列独立 rolling(n, min_periods=1)）"""
+
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        positions = np.arange(num_values, dtype=np.int64)
+        row = positions % self.rows
+        end = positions + 1
+        start = positions - np.minimum(row, self.window_size - 1)
+        return start, end
+
+
+def ma_2d(values: np.ndarray, n: int) -> np.ndarray:
+    """
+    MA 的二维版本
+
+    pandas 的滚动均值带补偿累加，结果依赖此前全部数据的累加顺序；
+    这里把各列首尾相接交给同一个滚动内核，窗口在列边界截断，逐列结果与 ma 逐位相同。
+    """
+    values = np.asarray(values, dtype='float64')
+    rows, cols = values.shape
+    if rows == 0 or cols == 0:
+        return values.copy()
+    flat = values.T.ravel()
+    result = pd.Series(flat).rolling(_ColumnWindowIndexer(window_size=n, rows=rows), min_periods=1).mean()
+    return result.to_numpy().reshape(cols, rows).T
+
+
+def ema_2d(values: np.ndarray, n: int) -> np.ndarray:
+    """EMA 的二维版本（DataFrame.ewm 按列计算，前导 NaN 不影响之后的结果）"""
+    return pd.DataFrame(values, dtype='float64').ewm(span=n, adjust=False).mean().to_numpy()
+
+
+def _rolling_extreme_2d(values: np.ndarray, n: int, reduce) -> np.ndarray:
+    # 最值没有舍入误差：滑动窗口视图上 fmax/fmin 归约，忽略 NaN，全为 NaN 时为 NaN
+    values = np.asarray(values, dtype='float64')
+    padded = np.concatenate([np.full((n - 1, values.shape[1]), np.nan), values])
+    return reduce.reduce(sliding_window_view(padded, n, axis=0), axis=-1)
+
+
+def hhv_2d(values: np.ndarray, n: int) -> np.ndarray:
+    """HHV 的二维版本"""
+    return _rolling_extreme_2d(values, n, np.fmax)
+
+
+def llv_2d(values: np.ndarray, n: int) -> np.ndarray:
+    """LLV 的二维版本"""
+    return _rolling_extreme_2d(values, n, np.fmin)
+
+
+def count_2d(condition: np.ndarray, n: int) -> np.ndarray:
+    """COUNT 的二维版本"""
+    total = np.cumsum(np.asarray(condition, dtype=bool), axis=0, dtype=np.int64)
+    total[n:] = total[n:] - total[:-n]
+    return total.astype('float64')
+
+
+def every_2d(condition: np.ndarray, n: int) -> np.ndarray:
+    """EVERY 的二维版本"""
+    return count_2d(condition, n) == n
+
+
+def exist_2d(condition: np.ndarray, n: int) -> np.ndarray:
+    """EXIST 的二维版本"""
+    return count_2d(condition, n) > 0
+
+
+def barslast_2d(condition: np.ndarray) -> np.ndarray:
+    """BARSLAST 的二维版本"""
+    condition = np.asarray(condition, dtype=bool)
+    positions = np.arange(len(condition))[:, None]
+    last_true = np.maximum.accumulate(np.where(condition, positions, -1), axis=0)
+    result = (positions - last_true).astype('float64')
+    result[last_true < 0] = np.nan
+    return result
+
+
+def cross_2d(values1: np.ndarray, values2) -> np.ndarray:
+    """CROSS 的二维版本"""
+    values2 = np.broadcast_to(np.asarray(values2, dtype='float64'), np.shape(values1))
+    return (ref_2d(values1) <= ref_2d(values2)) & (np.asarray(values1) > values2)
 
 
 def count(condition: Series, n: int) -> Series:
@@ -78,18 +245,17 @@ def exist(condition: Series, n: int) -> Series:
 
 
 def barslast(condition: Series) -> Series:
-    """BARSLAST: 上一次条件成立到当前的周期数"""
-    result = np.zeros(len(condition))
-    last_true = -1
-    
-    for i in range(len(condition)):
-        if condition.iloc[i]:
-            last_true = i
-        if last_true == -1:
-            result[i] = np.nan
-        else:
-            result[i] = i - last_true
-    
+    """BARSLAST: 上一次条件成立到当前的周期数（此前从未成立为 NaN）"""
+    values = condition.to_numpy()
+    if values.dtype != bool:
+        # 与逐元素 if 判断的真值语义一致（NaN 视为成立）
+        values = np.array([bool(v) for v in values], dtype=bool)
+
+    positions = np.arange(len(values))
+    last_true = np.maximum.accumulate(np.where(values, positions, -1)) if len(values) else positions
+    result = (positions - last_true).astype('float64')
+    result[last_true < 0] = np.nan
+
     return pd.Series(result, index=condition.index)
 
 
@@ -175,34 +341,55 @@ def long_term(close: Series, low: Series) -> Series:
     return result.fillna(50)
 
 
-def calculate_all_indicators(df: DataFrame) -> DataFrame:
+def indicator_columns(df: DataFrame) -> dict:
     """
-    计算所有技术指标并添加到DataFrame
+    计算所有技术指标，返回 {列名: Series}（列顺序即 calculate_all_indicators 追加的顺序）
     df 需要包含: open, high, low, close, volume 列
     """
-    df = df.copy()
-    
     # 基础价格列
-    o, h, l, c, v = df['open'], df['high'], df['low'], df['close'], df['volume']
+    h, l, c = df['high'], df['low'], df['close']
+    columns = {}
     
     # KDJ
-    df['K'], df['D'], df['J'] = kdj(h, l, c)
+    columns['K'], columns['D'], columns['J'] = kdj(h, l, c)
     
     # RSI
-    df['RSI'] = rsi(c, 3)
+    columns['RSI'] = rsi(c, 3)
     
     # 趋势线
-    df['趋势白线'] = trend_white_line(c)
-    df['大哥黄线'] = dage_yellow_line(c)
+    columns['趋势白线'] = trend_white_line(c)
+    columns['大哥黄线'] = dage_yellow_line(c)
     
     # BBI
-    df['BBI'] = bbi(c)
+    columns['BBI'] = bbi(c)
     
     # 短期/长期
-    df['短期'] = short_term(c, l)
-    df['长期'] = long_term(c, l)
+    columns['短期'] = short_term(c, l)
+    columns['长期'] = long_term(c, l)
     
     # MA60
-    df['MA60'] = ma(c, 60)
+    columns['MA60'] = ma(c, 60)
     
-    return df
+    return columns
+
+
+def attach_indicators(df: DataFrame, columns: dict) -> DataFrame:
+    """把指标列（{列名: 与 df 等长的值}）追加到 df，已有同名列时原位覆盖"""
+    if df.columns.isin(list(columns)).any():
+        # 已有同名列时原位覆盖，保持原来的列顺序
+        df = df.copy()
+        for name, values in columns.items():
+            df[name] = np.asarray(values)
+        return df
+
+    # 一次拼接，避免逐列插入 DataFrame 的开销
+    values = pd.DataFrame({name: np.asarray(values) for name, values in columns.items()}, index=df.index)
+    return pd.concat([df, values], axis=1)
+
+
+def calculate_all_indicators(df: DataFrame) -> DataFrame:
+    """
+    计算所有技术指标并添加到DataFrame
+    df 需要包含: open, high, low, close, volume 列
+    """
+    return attach_indicators(df, indicator_columns(df))
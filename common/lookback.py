@@ -0,0 +1,141 @@
+"""
+公式回看长度推导 - 只算最后一根K线时需要多少根历史
+
+把公式里的序列换成 Lookback 对象跑一遍（传入 LOOKBACK_OPS），每个中间量记录
+"最后一根的值依赖最近多少根输入"：
+  REF(X,N): X + N
+  HHV/LLV/COUNT/EVERY/EXIST(X,N): X + N - 1
+  CROSS(A,B): max(A,B) + 1
+  四则运算/比较/与或: 各操作数取最大
+
+BARSLAST 依赖全部历史：截取的窗口里只要在"已经精确"的区域内出现过成立的K线，
+最后一根的结果就与全量计算相同（tail_ops 运行时检查，不满足时抛 NeedFullHistory）；
+对 BARSLAST 的结果再做窗口运算则无法截断，回看长度视为无穷。
+
+EMA/SMA/MA 这类递推指标不在此截断（截断会改变浮点结果），
+先在全量历史上算好，作为回看长度为 0 的输入传给公式；公式里直接调用时回看长度视为无穷。
+"""
+import math
+from types import SimpleNamespace
+from typing import Iterable, NamedTuple
+
+import numpy as np
+
+from .indicators import ref_2d, ma_2d, ema_2d, sma_2d, hhv_2d, llv_2d, count_2d, every_2d, exist_2d, barslast_2d, cross_2d
+
+
+class NeedFullHistory(Exception):
+    """截取的窗口不足以精确计算最后一根K线，需要退回全量计算"""
+
+
+class Lookback:
+    """
+    公式中间量的回看长度
+
+    bars: 最后一根的值依赖最近 bars+1 根输入
+    scan: 依赖的 BARSLAST 的输入回看长度（没有依赖 BARSLAST 时为 None）
+    """
+    __slots__ = ('bars', 'scan')
+    __hash__ = None
+
+    def __init__(self, bars=0, scan=None):
+        self.bars = bars
+        self.scan = scan
+
+    def __repr__(self):
+        return f"Lookback(bars={self.bars}, scan={self.scan})"
+
+    def _pointwise(self, *others):
+        return _combine(self, *others)
+
+    __add__ = __radd__ = __sub__ = __rsub__ = _pointwise
+    __mul__ = __rmul__ = __truediv__ = __rtruediv__ = _pointwise
+    __and__ = __rand__ = __or__ = __ror__ = _pointwise
+    __lt__ = __le__ = __gt__ = __ge__ = __eq__ = __ne__ = _pointwise
+
+    def __abs__(self):
+        return self
+
+    def __neg__(self):
+        return self
+
+    def __invert__(self):
+        return self
+
+
+def _as_lookback(value) -> Lookback:
+    return value if isinstance(value, Lookback) else Lookback()
+
+
+def _combine(*operands) -> Lookback:
+    operands = [_as_lookback(x) for x in operands]
+    scans = [x.scan for x in operands if x.scan is not None]
+    return Lookback(max(x.bars for x in operands), max(scans) if scans else None)
+
+
+def _window(x, extra: int) -> Lookback:
+    x = _as_lookback(x)
+    if x.scan is not None:
+        # BARSLAST 的结果只有最后一根是精确的，不能再做窗口运算
+        return Lookback(math.inf, x.scan)
+    return Lookback(x.bars + extra)
+
+
+def _recursive(x, *periods) -> Lookback:
+    return Lookback(math.inf, _as_lookback(x).scan)
+
+
+def _barslast(x) -> Lookback:
+    x = _as_lookback(x)
+    if x.scan is not None:
+        return Lookback(math.inf, x.scan)
+    return Lookback(x.bars, scan=x.bars)
+
+
+LOOKBACK_OPS = SimpleNamespace(
+    ref=lambda x, n=1: _window(x, n),
+    ma=_recursive,
+    ema=_recursive,
+    sma=_recursive,
+    hhv=lambda x, n: _window(x, n - 1),
+    llv=lambda x, n: _window(x, n - 1),
+    count=lambda x, n: _window(x, n - 1),
+    every=lambda x, n: _window(x, n - 1),
+    exist=lambda x, n: _window(x, n - 1),
+    barslast=_barslast,
+    cross=lambda a, b: _window(_combine(a, b), 1),
+)
+
+
+class LastBarPlan(NamedTuple):
+    """bars: 需要截取的K线根数；scan_start: BARSLAST 的条件在截取窗口内从第几行起是精确的"""
+    bars: float
+    scan_start: int
+
+
+def derive_plan(outputs: Iterable) -> LastBarPlan:
+    """由公式输出（Lookback 对象）推导最后一根K线所需的截取长度"""
+    outputs = [_as_lookback(x) for x in outputs]
+    scans = [x.scan for x in outputs if x.scan is not None]
+    return LastBarPlan(max((x.bars for x in outputs), default=0) + 1, max(scans, default=0))
+
+
+def tail_ops(scan_start: int) -> SimpleNamespace:
+    """
+    在截取窗口上计算用的二维函数集
+
+    BARSLAST 要求每列最后一次成立落在第 scan_start 行之后（该区域内条件已精确），
+    否则无法确定窗口之前是否成立过，抛出 NeedFullHistory。
+    """
+    def barslast(condition):
+        result = barslast_2d(condition)
+        last_true = len(result) - 1 - result[-1]  # NaN 表示窗口内从未成立
+        if not (last_true >= scan_start).all():
+            raise NeedFullHistory("BARSLAST 条件在截取窗口内没有精确的成立记录")
+        return result
+
+    def sma(values, n, m):
+        return sma_2d(values, n, m, np.zeros(np.shape(values)[1], dtype=np.int64))
+
+    return SimpleNamespace(ref=ref_2d, ma=ma_2d, ema=ema_2d, sma=sma, hhv=hhv_2d, llv=llv_2d, count=count_2d,
+                           every=every_2d, exist=exist_2d, barslast=barslast, cross=cross_2d)
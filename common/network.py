@@ -4,6 +4,8 @@ import logging
 import time
 import random
 
+from .rate_limiter import throttle_url
+
 # Setup basic logging
 logger = logging.getLogger(__name__)
 
@@ -13,13 +15,24 @@ USER_AGENTS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/115.0"
 ]
 
+_patched = False
+
+
+def is_patched():
+    return _patched
+
+
 def apply_patch():
     """
     Monkey patch requests.Session.request to:
     1. Inject random User-Agent if missing.
     2. Auto-retry on failures (up to 3 times).
     3. Log success/fail.
+    4. Per-source token-bucket rate limiting (see common/rate_limiter.py).
     """
+    global _patched
+    if _patched:
+        return
     original_request = requests.Session.request
 
     @wraps(original_request)
@@ -33,6 +46,8 @@ def apply_patch():
         max_retries = 3
         for attempt in range(max_retries):
             try:
+                # 按数据源限流（每次尝试都取令牌，重试同样计入速率）
+                throttle_url(url)
                 response = original_request(self, method, url, *args, **kwargs)
                 
                 # Check for 200 OK
@@ -63,7 +78,8 @@ def apply_patch():
 
     # Apply the patch
     requests.Session.request = patched_request
-    print("✅ Network Logging Activated: Auto-Retry (3x) + UA Injection enabled.")
+    _patched = True
+    print("✅ Network Logging Activated: Auto-Retry (3x) + UA Injection + Rate Limit enabled.")
 
 if __name__ == "__main__":
     apply_patch()
@@ -0,0 +1,143 @@
+"""
+全市场面板指标计算 - 日期 x 股票 矩阵一次算完
+
+calculate_all_indicators 一次只处理一只股票；这里把全市场的 open/high/low/close/volume
+各拼成一个 日期 x 股票 的矩阵，所有指标按列同时计算:
+  K/D/J、RSI、趋势白线、大哥黄线、BBI、短期/长期、MA60
+
+上市时间不同（前面几行为 NaN）的股票按各自首根K线起算，之前的行输出 NaN；
+每一列的结果与对该列（去掉前导 NaN）调用 calculate_all_indicators 逐位相同：
+  - 滚动均值: 全部列首尾相接成一维数组，用按列截断的窗口交给 pandas 同一个滚动内核
+  - 滚动最值: 滑动窗口视图上 np.fmax/np.fmin 归约
+  - EMA: DataFrame.ewm 按列计算
+  - SMA: indicators.sma_2d 按行递推
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from .indicators import ema_2d, first_valid_rows, hhv_2d, llv_2d, ma_2d, sma_2d
+
+PANEL_FIELDS = ['open', 'high', 'low', 'close', 'volume']
+PANEL_INDICATORS = ['K', 'D', 'J', 'RSI', '趋势白线', '大哥黄线', 'BBI', '短期', '长期', 'MA60']
+
+
+def build_panel(frames: Dict[str, pd.DataFrame], align: str = 'date') -> Dict[str, pd.DataFrame]:
+    """
+    把逐只股票的K线拼成面板
+
+    Args:
+        frames: {code: DataFrame[date, open, high, low, close, volume]}
+        align: 'date' 按交易日对齐（停牌日为 NaN）；
+               'bars' 按K线序号右对齐（最后一行都是各自最新一根K线，与逐只计算的口径完全一致）
+
+    Returns:
+        {field: DataFrame(行=日期或K线序号, 列=股票代码)}，'bars' 模式额外包含 'date'
+    """
+    codes = list(frames)
+    if align == 'date':
+        panel = {}
+        for field in PANEL_FIELDS:
+            columns = [frames[code].set_index('date')[field].rename(code) for code in codes]
+            panel[field] = pd.concat(columns, axis=1).sort_index() if columns else pd.DataFrame()
+        return panel
+
+    if align != 'bars':
+        raise ValueError(f"unknown align: {align}")
+
+    rows = max((len(df) for df in frames.values()), default=0)
+    # 按 (字段, 股票, K线) 填充，每只股票写入的是连续内存；最后转置成 K线 x 股票
+    bars = np.full((len(PANEL_FIELDS), len(codes), rows), np.nan)
+    dates = np.full((len(codes), rows), np.datetime64('NaT'), dtype='datetime64[ns]')
+    for j, code in enumerate(codes):
+        df = frames[code]
+        n = len(df)
+        if n:
+            for k, field in enumerate(PANEL_FIELDS):
+                bars[k, j, rows - n:] = df[field].to_numpy(dtype='float64')
+            dates[j, rows - n:] = df['date'].to_numpy(dtype='datetime64[ns]')
+
+    panel = {field: pd.DataFrame(bars[k].T, columns=codes) for k, field in enumerate(PANEL_FIELDS)}
+    panel['date'] = pd.DataFrame(dates.T, columns=codes)
+    return panel
+
+
+def panel_ma(panel: pd.DataFrame, n: int) -> pd.DataFrame:
+    return pd.DataFrame(ma_2d(panel.to_numpy(dtype='float64'), n), index=panel.index, columns=panel.columns)
+
+
+def panel_hhv(panel: pd.DataFrame, n: int) -> pd.DataFrame:
+    return pd.DataFrame(hhv_2d(panel.to_numpy(dtype='float64'), n), index=panel.index, columns=panel.columns)
+
+
+def panel_llv(panel: pd.DataFrame, n: int) -> pd.DataFrame:
+    return pd.DataFrame(llv_2d(panel.to_numpy(dtype='float64'), n), index=panel.index, columns=panel.columns)
+
+
+def panel_ema(panel: pd.DataFrame, n: int) -> pd.DataFrame:
+    return pd.DataFrame(ema_2d(panel.to_numpy(dtype='float64'), n), index=panel.index, columns=panel.columns)
+
+
+def panel_sma(panel: pd.DataFrame, n: int, m: int, start: np.ndarray) -> pd.DataFrame:
+    return pd.DataFrame(sma_2d(panel.to_numpy(dtype='float64'), n, m, start),
+                        index=panel.index, columns=panel.columns)
+
+
+def listing_mask(close: pd.DataFrame) -> pd.DataFrame:
+    """每只股票首根K线之前的行（尚未上市/数据缺失）为 True"""
+    start = first_valid_rows(close.to_numpy(dtype='float64'))
+    rows = np.arange(close.shape[0])[:, None]
+    return pd.DataFrame(rows < start, index=close.index, columns=close.columns)
+
+
+def calculate_panel_indicators(panel: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    一次性计算全市场指标
+
+    Args:
+        panel: build_panel 的返回值（至少包含 high, low, close）
+
+    Returns:
+        {指标名: DataFrame(与 close 同形状)}，指标名与 calculate_all_indicators 的列名一致
+    """
+    h, l, c = panel['high'], panel['low'], panel['close']
+    start = first_valid_rows(c.to_numpy(dtype='float64'))
+    unlisted = listing_mask(c)
+
+    def fill_listed(df: pd.DataFrame, value: float) -> pd.DataFrame:
+        # 对应单只计算时的 fillna，但上市前的行保持 NaN
+        return df.fillna(value).mask(unlisted)
+
+    out = {}
+
+    # KDJ
+    llv_low = panel_llv(l, 9)
+    hhv_high = panel_hhv(h, 9)
+    rsv = fill_listed((c - llv_low) / (hhv_high - llv_low) * 100, 50)
+    out['K'] = panel_sma(rsv, 3, 1, start)
+    out['D'] = panel_sma(out['K'], 3, 1, start)
+    out['J'] = 3 * out['K'] - 2 * out['D']
+
+    # RSI
+    diff = c - c.shift(1)
+    sma_up = panel_sma(diff.clip(lower=0), 3, 1, start)
+    sma_abs = panel_sma(diff.abs(), 3, 1, start)
+    out['RSI'] = fill_listed(sma_up / sma_abs * 100, 50)
+
+    # 趋势线
+    out['趋势白线'] = panel_ema(panel_ema(c, 10), 10)
+    out['大哥黄线'] = (panel_ma(c, 14) + panel_ma(c, 28) + panel_ma(c, 57) + panel_ma(c, 114)) / 4
+
+    # BBI
+    out['BBI'] = (panel_ma(c, 3) + panel_ma(c, 6) + panel_ma(c, 12) + panel_ma(c, 24)) / 4
+
+    # 短期/长期
+    for name, n in (('短期', 3), ('长期', 21)):
+        llv_n = panel_llv(l, n)
+        out[name] = fill_listed(100 * (c - llv_n) / (panel_hhv(c, n) - llv_n), 50)
+
+    # MA60
+    out['MA60'] = panel_ma(c, 60)
+
+    return out
@@ -0,0 +1,173 @@
+"""
+全市场B1选股 - 面板版 StockSignals
+
+StockSignals 每只股票构造一次对象、用 pandas Series 跑一遍公式；
+这里把全市场拼成 K线 x 股票 的矩阵（按K线序号右对齐，最后一行都是各自最新一根K线），
+七种买入信号连同 OK棒、异动、强趋势股 等中间条件对所有股票一次算完。
+
+公式主体与 StockSignals 共用 signals.b1_formula，指标来自 panel_indicators，
+每只股票的结果与 StockSignals 逐位相同。
+"""
+from contextlib import nullcontext
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .indicators import first_valid_rows, hhvbars_2d
+from .panel_indicators import build_panel, calculate_panel_indicators
+from .signals import ARRAY_OPS, SIGNAL_NAMES, b1_formula, has_big_gain, is_special_board
+
+# get_latest_signal 中除信号外的逐只字段
+LATEST_FIELDS = ['close', 'K', 'D', 'J', 'RSI', '近期振幅', '远期振幅']
+
+
+def bar_constants(o: np.ndarray, c: np.ndarray, v: np.ndarray, codes, start: np.ndarray,
+                  last_only: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    StockSignals 按最后一根K线判定的逐只常量: 振幅区间、放宽系数、OK棒
+
+    last_only=True 时只算最后一行（每只股票一个值）；否则逐行计算，
+    第 t 行的值等于把K线截到第 t 行再交给 StockSignals 判定的结果（回测逐日复现用）。
+
+    Returns:
+        (振幅区间, 放宽系数, OK棒)，形状为 (股票数,) 或 (K线数, 股票数)
+    """
+    rows, cols = c.shape
+    length = rows - start
+    if last_only:
+        c_rows = slice(-1, None) if rows else slice(0, 0)
+    else:
+        c_rows = slice(None)
+
+    # === 市场环境判定 ===
+    special = np.array([is_special_board(code) for code in codes], dtype=bool)
+    big_gain = has_big_gain(c, ARRAY_OPS)[c_rows] if rows else np.zeros((1, cols), dtype=bool)
+    special = special | big_gain
+    振幅区间 = np.where(special, 8, 5)
+    放宽系数 = np.where(special, 0.9, 1)
+
+    # === 大绿棒判定：近40天最大成交量那天是否是大阴线（同 StockSignals） ===
+    vday = hhvbars_2d(v, 40, start)[c_rows] if rows else np.full((1, cols), np.nan)
+    last_vday = np.where(np.isnan(vday), 0, vday).astype(np.int64)
+    bar = np.arange(rows)[c_rows].reshape(-1, 1) if rows else np.full((1, 1), -1)
+    prefix = bar - start + 1  # 截到该行时的K线根数
+    idx = prefix - 1 - last_vday  # 在各自K线序列中的位置
+    if rows > 1:
+        row = np.clip(start + idx, 1, rows - 1)
+        columns = np.arange(cols)
+        c_val, o_val, c_prev = c[row, columns], o[row, columns], c[row - 1, columns]
+        # 不是大绿棒：收盘>=前收 或 收盘>=开盘
+        not_green = (c_val >= c_prev) | (c_val >= o_val)
+    else:
+        not_green = np.ones_like(idx, dtype=bool)
+    # 数据不足时默认OK
+    is_not_big_green = (last_vday < 0) | (last_vday >= prefix) | (idx < 1) | not_green
+    big_green_far = last_vday >= 15
+    OK棒 = is_not_big_green | (big_green_far & ~is_not_big_green)
+
+    if last_only:
+        return 振幅区间[0], 放宽系数[0], OK棒[0]
+    return 振幅区间, 放宽系数, OK棒
+
+
+class PanelSignals:
+    """全市场选股信号生成器"""
+
+    def __init__(self, frames: Dict[str, pd.DataFrame], profile=None):
+        """
+        Args:
+            frames: {股票代码: 包含 date, open, high, low, close, volume 的日线数据}
+            profile: signal_profile.SignalProfile，按需记录各阶段/各条件的耗时与命中
+        """
+        self.codes = list(frames)
+        self.profile = profile
+        self.panel = build_panel(frames, align='bars')
+        with self._stage('指标'):
+            self.indicators = calculate_panel_indicators(self.panel)
+        self.N = 20  # 近期振幅周期
+        self.M = 50  # 远期振幅周期
+
+        self._calculate_all()
+
+    def _stage(self, name: str):
+        """剖析模式下记录阶段耗时，否则不做任何事"""
+        return self.profile.stage(name) if self.profile is not None else nullcontext()
+
+    def _calculate_all(self):
+        """计算所有股票的信号矩阵"""
+        o, h, l, c, v = (self.panel[field].to_numpy(dtype='float64')
+                         for field in ('open', 'high', 'low', 'close', 'volume'))
+        ind = {name: df.to_numpy(dtype='float64') for name, df in self.indicators.items()}
+        start = first_valid_rows(c)
+        length = len(c) - start
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # === 按最后一根K线判定的逐只常量：振幅区间、放宽系数、OK棒 ===
+            with self._stage('逐只常量'):
+                self.振幅区间, self.放宽系数, OK棒 = bar_constants(o, c, v, self.codes, start, last_only=True)
+
+            # === 公式主体（七种买入信号） ===
+            with self._stage('公式'):
+                result = b1_formula(o, h, l, c, v, ind, self.振幅区间, self.放宽系数, OK棒, ARRAY_OPS, self.N, self.M,
+                                    self.profile)
+
+        index = self.panel['close'].index
+        for name in SIGNAL_NAMES + ['XG', '近期振幅', '远期振幅']:
+            setattr(self, name, pd.DataFrame(result[name], index=index, columns=self.codes))
+        self.OK棒 = pd.Series(OK棒, index=self.codes)
+        self.length = pd.Series(length, index=self.codes)
+
+    def signal_matrix(self) -> pd.DataFrame:
+        """最新一根K线的信号矩阵: 行=股票代码，列=七种信号 + signal（任一成立），bool"""
+        matrix = pd.DataFrame(False, index=self.codes, columns=SIGNAL_NAMES + ['signal'])
+        if len(self.XG):
+            for name in SIGNAL_NAMES:
+                matrix[name] = getattr(self, name).iloc[-1].to_numpy(dtype=bool)
+            matrix['signal'] = self.XG.iloc[-1].to_numpy(dtype=bool)
+        return matrix
+
+    def latest_fields(self) -> pd.DataFrame:
+        """最新一根K线的收盘价/KDJ/RSI/振幅: 行=股票代码，列=LATEST_FIELDS"""
+        if not len(self.XG):
+            return pd.DataFrame(np.nan, index=self.codes, columns=LATEST_FIELDS)
+        fields = {
+            'close': self.panel['close'].iloc[-1],
+            'K': self.indicators['K'].iloc[-1],
+            'D': self.indicators['D'].iloc[-1],
+            'J': self.indicators['J'].iloc[-1],
+            'RSI': self.indicators['RSI'].iloc[-1],
+            '近期振幅': self.近期振幅.iloc[-1],
+            '远期振幅': self.远期振幅.iloc[-1],
+        }
+        return pd.DataFrame(fields, index=self.codes)
+
+    def get_latest_signals(self) -> Dict[str, dict]:
+        """每只股票最新一天的信号，格式与 StockSignals.get_latest_signal 相同"""
+        matrix = self.signal_matrix()
+        fields = self.latest_fields()
+        latest = {}
+        for code, flags, values, length in zip(self.codes, matrix.itertuples(index=False),
+                                               fields.itertuples(index=False), self.length):
+            if length == 0:
+                latest[code] = {'signal': False, 'signals': []}
+                continue
+            flags = dict(zip(matrix.columns, flags))
+            latest[code] = {
+                'signal': flags['signal'],
+                'signals': [name for name in SIGNAL_NAMES if flags[name]],
+                'code': code,
+                **dict(zip(LATEST_FIELDS, values)),
+            }
+        return latest
+
+
+def screen_stocks(frames: Dict[str, pd.DataFrame]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    全市场一次性跑B1信号
+
+    Returns:
+        (signal_matrix, latest_fields)，行均为股票代码
+    """
+    signals = PanelSignals(frames)
+    return signals.signal_matrix(), signals.latest_fields()
@@ -0,0 +1,134 @@
+"""
+按上游数据源限流 - 令牌桶 (eastmoney / sina / ths / tushare)
+
+替代各处零散的固定 sleep：每个数据源一个令牌桶，按 config.RATE_LIMITS 配置的
+每秒请求数 (rate) 和突发容量 (burst) 放行请求。不同数据源互不影响，可以同时跑满。
+
+桶状态放在共享内存里，FetchPool 的 worker 进程继承父进程的桶，
+多进程合计的请求速率仍然受同一个上限约束。
+
+所有 HTTP 请求经由 network.apply_patch 打过补丁的 requests.Session.request，
+按 URL 域名自动识别数据源并限流（akshare / tushare 内部请求同样覆盖）。
+"""
+import multiprocessing as mp
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+from .config import RATE_LIMITS
+
+# 域名后缀 -> 数据源
+SOURCE_DOMAINS = {
+    'eastmoney.com': 'eastmoney',
+    'sina.com.cn': 'sina',
+    'sinajs.cn': 'sina',
+    '10jqka.com.cn': 'ths',
+    'tushare.pro': 'tushare',
+    'waditu.com': 'tushare',
+}
+
+# 共享内存需要和 FetchPool 使用同一种进程启动方式
+_CTX = mp.get_context('spawn')
+
+
+def source_of(url: str) -> Optional[str]:
+    """根据 URL 域名识别数据源，未登记的域名返回 None（不限流）"""
+    host = (urlsplit(url).hostname or '').lower()
+    for domain, source in SOURCE_DOMAINS.items():
+        if host == domain or host.endswith('.' + domain):
+            return source
+    return None
+
+
+class TokenBucket:
+    """令牌桶: 每秒补充 rate 个令牌，最多积攒 burst 个；状态 [tokens, last] 存放在共享内存"""
+
+    def __init__(self, rate: float, burst: float, state=None):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        if state is None:
+            state = _CTX.Array('d', [self.burst, time.monotonic()])
+        self.state = state
+
+    def acquire(self) -> float:
+        """取一个令牌，不够时阻塞等待；返回等待的秒数"""
+        waited = 0.0
+        while True:
+            with self.state.get_lock():
+                now = time.monotonic()
+                tokens = min(self.burst, self.state[0] + (now - self.state[1]) * self.rate)
+                self.state[1] = now
+                if tokens >= 1.0:
+                    self.state[0] = tokens - 1.0
+                    return waited
+                self.state[0] = tokens
+                wait = (1.0 - tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class RateLimiter:
+    """按数据源管理令牌桶"""
+
+    def __init__(self, limits: dict = None):
+        self.limits = RATE_LIMITS if limits is None else limits
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, source: str) -> Optional[TokenBucket]:
+        """未配置或 rate <= 0 的数据源不限流"""
+        limit = self.limits.get(source)
+        if not limit or limit.get('rate', 0) <= 0:
+            return None
+        with self._lock:
+            if source not in self._buckets:
+                self._buckets[source] = TokenBucket(limit['rate'], limit.get('burst', 1))
+            return self._buckets[source]
+
+    def acquire(self, source: str) -> float:
+        bucket = self.bucket(source)
+        return bucket.acquire() if bucket is not None else 0.0
+
+    def acquire_url(self, url: str) -> float:
+        source = source_of(url)
+        return self.acquire(source) if source else 0.0
+
+    def shared_state(self) -> dict:
+        """导出全部桶的共享内存，传给子进程（只能在创建进程时作为参数传递）"""
+        states = {}
+        for source in self.limits:
+            bucket = self.bucket(source)
+            if bucket is not None:
+                states[source] = bucket.state
+        return states
+
+    def install_shared_state(self, states: dict):
+        """子进程中接管父进程的桶"""
+        with self._lock:
+            for source, state in states.items():
+                limit = self.limits[source]
+                self._buckets[source] = TokenBucket(limit['rate'], limit.get('burst', 1), state=state)
+
+
+_default_limiter = None
+_default_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """进程内共享的默认限流器"""
+    global _default_limiter
+    with _default_limiter_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter()
+        return _default_limiter
+
+
+def throttle(source: str) -> float:
+    """按数据源限流（阻塞直到放行）"""
+    return get_rate_limiter().acquire(source)
+
+
+def throttle_url(url: str) -> float:
+    """按 URL 域名识别数据源并限流"""
+    return get_rate_limiter().acquire_url(url)
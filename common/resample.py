@@ -0,0 +1,116 @@
+"""
+多周期K线 - 由本地日线合成周线/月线
+
+周线/月线不再单独向数据源请求，全部由日线（本地行情仓库或已拉取的指数日线）合成:
+  open 取周期内第一根、close 取最后一根、high/low 取极值、volume/amount 求和，
+  日期为周期内最后一个交易日（与通达信/东财的周线、月线一致）。
+
+盘中或每天收盘后只有最后一个（尚未走完的）周期会变化：update_resampled 只重算这个周期，
+已经走完的周期原样保留。
+
+合成是纯向量化的 (np.*.reduceat)，全历史合成一次只需几毫秒，
+一次日线下载即可同时供日线/周线/月线三个周期使用。
+"""
+import numpy as np
+import pandas as pd
+
+# 周期代码 -> 中文名
+TIMEFRAMES = {'D': '日线', 'W': '周线', 'M': '月线'}
+# 周期代码 -> pandas Period 频率（周线按自然周，周一到周日）
+_PERIOD_FREQ = {'W': 'W-SUN', 'M': 'M'}
+# 一个周期最多包含的交易日数（由周线/月线根数估算所需日线深度，宁多勿少）
+_MAX_DAYS_PER_PERIOD = {'D': 1, 'W': 5, 'M': 23}
+# 各列的合成方式
+_AGGREGATIONS = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum',
+    'amount': 'sum',
+}
+
+
+def check_timeframe(timeframe: str) -> str:
+    timeframe = (timeframe or 'D').upper()
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"unknown timeframe: {timeframe} (可选 {', '.join(TIMEFRAMES)})")
+    return timeframe
+
+
+def timeframe_suffix(timeframe: str) -> str:
+    """输出文件名后缀：日线为空，周线/月线为 _周线/_月线"""
+    timeframe = check_timeframe(timeframe)
+    return '' if timeframe == 'D' else f"_{TIMEFRAMES[timeframe]}"
+
+
+def daily_bars_needed(bars: int, timeframe: str) -> int:
+    """合成出至少 bars 根周线/月线所需的日线根数（日线原样返回）"""
+    return int(bars) * _MAX_DAYS_PER_PERIOD[check_timeframe(timeframe)]
+
+
+def period_keys(dates, timeframe: str) -> np.ndarray:
+    """每根日线所属周期的序号（int64，单调不减）"""
+    dates = pd.DatetimeIndex(pd.to_datetime(dates))
+    return dates.to_period(_PERIOD_FREQ[check_timeframe(timeframe)]).asi8
+
+
+def resample_bars(daily: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+    """
+    日线 -> 周线/月线（timeframe='D' 时原样返回）
+
+    Args:
+        daily: 按日期升序的日线，需包含 date 与 open/high/low/close（volume/amount 可选，其他列忽略）
+        timeframe: 'D' / 'W' / 'M'
+
+    Returns:
+        DataFrame[date, open, high, low, close, (volume), (amount)]，索引从 0 开始
+    """
+    timeframe = check_timeframe(timeframe)
+    if timeframe == 'D':
+        return daily
+
+    columns = [name for name in _AGGREGATIONS if name in daily.columns]
+    if daily.empty:
+        return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'),
+                             **{name: pd.Series(dtype='float64') for name in columns}})
+
+    dates = pd.to_datetime(daily['date'])
+    keys = period_keys(dates, timeframe)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+
+    result = {'date': dates.to_numpy()[ends]}
+    for name in columns:
+        values = daily[name].to_numpy(dtype='float64')
+        how = _AGGREGATIONS[name]
+        if how == 'first':
+            result[name] = values[starts]
+        elif how == 'last':
+            result[name] = values[ends]
+        elif how == 'max':
+            result[name] = np.maximum.reduceat(values, starts)
+        elif how == 'min':
+            result[name] = np.minimum.reduceat(values, starts)
+        else:
+            result[name] = np.add.reduceat(values, starts)
+    return pd.DataFrame(result)
+
+
+def update_resampled(resampled: pd.DataFrame, daily: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+    """
+    在已合成的周线/月线上接上最新日线：只重算最后一个（可能未走完的）周期及之后新开的周期
+
+    daily 为完整日线（只会用到最后一个周期起的那几十根），已走完的周期假定不变；
+    复权因子变化（除权除息）后前复权价格整体变化，需要用 resample_bars 全部重算。
+    """
+    timeframe = check_timeframe(timeframe)
+    if timeframe == 'D':
+        return daily
+    if resampled is None or resampled.empty:
+        return resample_bars(daily, timeframe)
+
+    period_start = pd.Timestamp(resampled['date'].iloc[-1]).to_period(_PERIOD_FREQ[timeframe]).start_time
+    position = pd.to_datetime(daily['date']).searchsorted(period_start)
+    tail = resample_bars(daily.iloc[position:], timeframe)
+    return pd.concat([resampled.iloc[:-1], tail], ignore_index=True)
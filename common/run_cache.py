@@ -0,0 +1,118 @@
+"""
+进程内、单次运行范围的接口缓存 (memo)
+
+一次 `main.py all` 里同一份上游数据会被多个模块重复请求，例如:
+  - 涨停池 stock_zt_pool_em: 连板天梯 + 市场情绪
+  - 指数日线 fish_basin.fetch_data: 趋势模型 + 市场情绪 + 收盘速报
+  - 两市成交额 get_market_volume: 市场情绪 + 收盘速报
+这里按 (endpoint, args) 缓存返回值，所有模块共享；运行结束时打印命中统计。
+
+  - 只缓存在内存里，进程退出即失效，不存在跨天脏数据的问题（落盘缓存见 fetch_data_with_cache）
+  - None / 空表 视为失败不缓存，后续调用方仍会重新请求
+  - 返回的是深拷贝，调用方随意修改 DataFrame 不会污染缓存
+"""
+import copy
+import threading
+from collections import Counter
+from functools import wraps
+from typing import Callable, Optional
+
+import pandas as pd
+
+
+def _is_empty(value) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.empty
+    if isinstance(value, (list, tuple, dict)):
+        return len(value) == 0
+    return False
+
+
+class RunCache:
+    """按 (endpoint, args) 缓存接口返回值，并统计命中/未命中次数"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def call(self, endpoint: str, func: Callable, *args, cache_if: Optional[Callable] = None, **kwargs):
+        """
+        带缓存地调用 func(*args, **kwargs)
+
+        Args:
+            endpoint: 缓存命名空间（接口名），统计按此汇总
+            cache_if: 额外判断返回值是否值得缓存（例如成交额为 0 视为失败）
+        """
+        key = (endpoint, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            # 参数不可哈希时直接透传
+            return func(*args, **kwargs)
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # 同一个 key 并发请求时只打一次上游，其余等待结果
+        with key_lock:
+            with self._lock:
+                if key in self._data:
+                    self.hits[endpoint] += 1
+                    return copy.deepcopy(self._data[key])
+                self.misses[endpoint] += 1
+
+            result = func(*args, **kwargs)
+            if not _is_empty(result) and (cache_if is None or cache_if(result)):
+                with self._lock:
+                    self._data[key] = copy.deepcopy(result)
+            return result
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._key_locks.clear()
+            self.hits.clear()
+            self.misses.clear()
+
+    def report(self):
+        """打印各接口的命中统计"""
+        endpoints = sorted(set(self.hits) | set(self.misses))
+        if not endpoints:
+            return
+        total_hits = sum(self.hits.values())
+        total_calls = total_hits + sum(self.misses.values())
+        print("\n" + "=" * 40)
+        print(f"📦 运行内缓存: 命中 {total_hits}/{total_calls}")
+        for endpoint in endpoints:
+            print(f"   {endpoint}: 命中 {self.hits[endpoint]} / 未命中 {self.misses[endpoint]}")
+        print("=" * 40)
+
+
+_run_cache = RunCache()
+
+
+def get_run_cache() -> RunCache:
+    """进程内共享的运行缓存"""
+    return _run_cache
+
+
+def memo_call(endpoint: str, func: Callable, *args, **kwargs):
+    """带缓存地调用上游接口，例如 memo_call('stock_zt_pool_em', ak.stock_zt_pool_em, date=date_str)"""
+    return _run_cache.call(endpoint, func, *args, **kwargs)
+
+
+def memoize(endpoint: str = None, cache_if: Optional[Callable] = None):
+    """装饰器版本，endpoint 默认取 模块名.函数名"""
+    def decorator(func):
+        name = endpoint or f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return _run_cache.call(name, func, *args, cache_if=cache_if, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,237 @@
+"""
+全量扫描归档 - 每天的 all_stocks_*.jsonl 合并进一个按日期分区的列式仓库 (Parquet)
+
+results/YYYYMMDD 下的扫描结果只保留 7 天 (main.cleanup_old_results)，
+这里把每天的扫描压平后长期保存: results/archive/all_stocks/{YYYYMM}.parquet
+  - 按月分区，每天的扫描写入所在月份的文件，同一天重跑时替换当天的行
+  - 分区内按 (code, date) 排序、小行组：按代码查询时 Parquet 行组统计跳过其余股票，
+    同一只股票的名称/代码连续出现，跨天压缩效果好（zstd）
+  - signals 编码为位掩码：第 i 位对应 SIGNAL_NAMES[i]（与 common/backtest 的 flags 一致）
+  - raw_data_mock 压平为 raw_date / raw_open / raw_close / ... 列（价格保持 float64）
+  - 市值、KDJ、RSI、振幅存为 float32（约 7 位有效数字，足够展示与统计）
+  体积约为 JSONL 的 1/10，一只股票一个季度的查询只读三个文件的几列。
+
+列: date（扫描日）, scan_time, code, name, market_cap, industry, signal, signals,
+    K, D, J, RSI, near_amplitude, far_amplitude, raw_*
+
+用法:
+    signal_days('000001', '回踩白线B', start='2026-01-01', end='2026-03-31')  # 本季度触发天数
+    load_archive(start='2026-01-01', codes=['000001'], columns=['date', 'signals', 'J'])
+"""
+import glob
+import json
+import os
+import threading
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .signals import SIGNAL_NAMES
+
+ARCHIVE_DIR = "results/archive/all_stocks"
+# 记录中的标量列（raw_data_mock 压平后的 raw_* 列追加在后面）
+RECORD_COLUMNS = ['code', 'name', 'market_cap', 'industry', 'signal', 'signals',
+                  'K', 'D', 'J', 'RSI', 'near_amplitude', 'far_amplitude']
+FLOAT_COLUMNS = ['market_cap', 'K', 'D', 'J', 'RSI', 'near_amplitude', 'far_amplitude']
+RAW_PREFIX = 'raw_'
+# 行组行数：按代码过滤时的跳读单位（约 400 只股票一个月），太小会拖累压缩率
+ROW_GROUP_SIZE = 8192
+
+
+def encode_signals(names: Iterable[str]) -> int:
+    """信号名称列表 -> 位掩码（不认识的名称忽略）"""
+    mask = 0
+    for name in names or []:
+        if name in SIGNAL_NAMES:
+            mask |= 1 << SIGNAL_NAMES.index(name)
+    return mask
+
+
+def decode_signals(mask: int) -> List[str]:
+    return [name for bit, name in enumerate(SIGNAL_NAMES) if int(mask) >> bit & 1]
+
+
+def signal_mask(name: str) -> int:
+    if name not in SIGNAL_NAMES:
+        raise ValueError(f"unknown signal: {name} (可选 {', '.join(SIGNAL_NAMES)})")
+    return 1 << SIGNAL_NAMES.index(name)
+
+
+def _month_key(date) -> str:
+    return pd.Timestamp(date).strftime('%Y%m')
+
+
+def _partition_path(root: str, date) -> str:
+    return os.path.join(root, f"{_month_key(date)}.parquet")
+
+
+def flatten_records(records: list, scan_date, scan_time: str = '') -> pd.DataFrame:
+    """all_stocks_*.jsonl 的记录 -> 压平的列式表（按代码排序，同一代码保留最后一条）"""
+    frame = pd.DataFrame.from_records(records, columns=RECORD_COLUMNS + ['raw_data_mock'])
+    raw = pd.DataFrame.from_records([record.get('raw_data_mock') or {} for record in records])
+
+    table = pd.DataFrame({
+        'date': pd.Series(pd.Timestamp(scan_date).normalize(), index=frame.index, dtype='datetime64[ns]'),
+        'scan_time': scan_time,
+        'code': frame['code'].astype(str),
+        'name': frame['name'].astype(str),
+        'industry': frame['industry'].where(frame['industry'].notna(), None),
+        'signal': frame['signal'].fillna(False).astype(bool),
+        'signals': frame['signals'].map(encode_signals).astype('uint8'),
+    })
+    for name in FLOAT_COLUMNS:
+        table[name] = pd.to_numeric(frame[name], errors='coerce').astype('float64')
+    for name in raw.columns:
+        if name == 'date':
+            table[f'{RAW_PREFIX}date'] = pd.to_datetime(raw['date'], errors='coerce')
+        else:
+            table[f'{RAW_PREFIX}{name}'] = pd.to_numeric(raw[name], errors='coerce').astype('float64')
+
+    return table.drop_duplicates('code', keep='last').sort_values('code', ignore_index=True)
+
+
+def _to_arrow(table: pd.DataFrame) -> pa.Table:
+    """统一列类型：日期只精确到天，统计列为 float32，不带 pandas 元数据"""
+    arrow = pa.Table.from_pandas(table, preserve_index=False).replace_schema_metadata(None)
+    casts = {'date': pa.date32(), f'{RAW_PREFIX}date': pa.date32(), 'signals': pa.uint8(),
+             **{name: pa.float32() for name in FLOAT_COLUMNS}}
+    for name, type_ in casts.items():
+        if name in arrow.column_names:
+            arrow = arrow.set_column(arrow.column_names.index(name), name, arrow.column(name).cast(type_))
+    return arrow
+
+
+def _write_partition(table: pd.DataFrame, path: str):
+    arrow = _to_arrow(table.sort_values(['code', 'date'], ignore_index=True))
+    floats = [field.name for field in arrow.schema if pa.types.is_floating(field.type)]
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    pq.write_table(arrow, tmp_path, compression='zstd', compression_level=9, row_group_size=ROW_GROUP_SIZE,
+                   use_dictionary=['scan_time', 'code', 'name', 'industry'], use_byte_stream_split=floats)
+    os.replace(tmp_path, path)
+
+
+def archive_records(records: list, scan_date, scan_time: str = '', root: str = ARCHIVE_DIR) -> Optional[str]:
+    """把一天的扫描记录写进所在月份的分区（替换当天已有的行，原子写入），返回分区路径；没有记录时返回 None"""
+    if not records:
+        return None
+    os.makedirs(root, exist_ok=True)
+    path = _partition_path(root, scan_date)
+    day = flatten_records(records, scan_date, scan_time)
+    if os.path.exists(path):
+        month = _read_partition(path)
+        month = month[month['date'] != day['date'].iloc[0]]
+        day = pd.concat([month, day], ignore_index=True)
+    _write_partition(day, path)
+    return path
+
+
+def _read_partition(path: str, columns: List[str] = None, filters=None) -> pd.DataFrame:
+    df = pq.read_table(path, columns=columns, filters=filters).to_pandas()
+    for name in ('date', f'{RAW_PREFIX}date'):
+        if name in df.columns:
+            df[name] = pd.to_datetime(df[name]).astype('datetime64[ns]')
+    return df
+
+
+def archived_dates(root: str = ARCHIVE_DIR) -> List[pd.Timestamp]:
+    """已归档的扫描日"""
+    dates = set()
+    for path in _partitions(root):
+        dates.update(_read_partition(path, columns=['date'])['date'].unique())
+    return sorted(pd.Timestamp(date) for date in dates)
+
+
+def _read_jsonl(path: str) -> list:
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break  # 被中断的扫描最后一行可能只写了一半
+    return records
+
+
+def archive_scan(raw_file: str, root: str = ARCHIVE_DIR) -> Optional[str]:
+    """归档一个 all_stocks_YYYYMMDD_HHMMSS.jsonl（日期和时间取自文件名）"""
+    stamp = os.path.basename(raw_file)[len("all_stocks_"):-len(".jsonl")]
+    scan_date, _, scan_time = stamp.partition('_')
+    return archive_records(_read_jsonl(raw_file), pd.Timestamp(scan_date), scan_time, root)
+
+
+def _pick_scan(raw_files: list) -> str:
+    """同一天有多次扫描时取最近一次完成的（有 .done 标记），都没有标记时取记录最多的"""
+    done = [path for path in raw_files if os.path.exists(path + ".done")]
+    if done:
+        return max(done)
+    return max(raw_files, key=lambda path: (os.path.getsize(path), path))
+
+
+def backfill_archive(results_root: str = "results", root: str = ARCHIVE_DIR, overwrite: bool = False) -> List[str]:
+    """把 results/YYYYMMDD 下已有的扫描补进归档（已归档的日期默认跳过），返回归档了的 all_stocks 文件"""
+    done = set() if overwrite else set(archived_dates(root))
+    written = []
+    for date_dir in sorted(glob.glob(os.path.join(results_root, "[0-9]" * 8))):
+        raw_files = glob.glob(os.path.join(date_dir, "all_stocks_*.jsonl"))
+        if not raw_files or pd.Timestamp(os.path.basename(date_dir)) in done:
+            continue
+        raw_file = _pick_scan(raw_files)
+        if archive_scan(raw_file, root):
+            written.append(raw_file)
+    return written
+
+
+def _partitions(root: str, start=None, end=None) -> List[str]:
+    start = _month_key(start) if start is not None else None
+    end = _month_key(end) if end is not None else None
+    paths = []
+    for path in sorted(glob.glob(os.path.join(root, "[0-9]" * 6 + ".parquet"))):
+        key = os.path.basename(path)[:6]
+        if (start is None or key >= start) and (end is None or key <= end):
+            paths.append(path)
+    return paths
+
+
+def _read_tables(start, end, codes, columns, root) -> List[pa.Table]:
+    filters = []
+    if codes is not None:
+        filters.append(('code', 'in', list(codes)))
+    if start is not None:
+        filters.append(('date', '>=', pd.Timestamp(start).date()))
+    if end is not None:
+        filters.append(('date', '<=', pd.Timestamp(end).date()))
+    tables = [pq.read_table(path, columns=columns, filters=filters or None) for path in _partitions(root, start, end)]
+    return [table for table in tables if table.num_rows]
+
+
+def load_archive(start=None, end=None, codes: Iterable[str] = None, columns: List[str] = None,
+                 root: str = ARCHIVE_DIR) -> pd.DataFrame:
+    """
+    读取归档（扫描日闭区间），按 (code, date) 排序
+
+    codes 给出时按代码过滤（下推到 Parquet 行组统计）；columns 只读需要的列（date 总会读出）。
+    """
+    if columns is not None and 'date' not in columns:
+        columns = ['date', *columns]
+    tables = _read_tables(start, end, codes, columns, root)
+    if not tables:
+        return pd.DataFrame(columns=columns or [])
+    df = pa.concat_tables(tables, promote_options='default').to_pandas()
+    for name in ('date', f'{RAW_PREFIX}date'):
+        if name in df.columns:
+            df[name] = pd.to_datetime(df[name]).astype('datetime64[ns]')
+    # 按月分区依次读出，跨月时需要整体重排
+    return df.sort_values([name for name in ('code', 'date') if name in df.columns], kind='stable', ignore_index=True)
+
+
+def signal_days(code: str, signal: str, start=None, end=None, root: str = ARCHIVE_DIR) -> int:
+    """某只股票在区间内触发某个信号的交易日数（停牌重复的同一根K线只算一次）"""
+    mask = signal_mask(signal)
+    bar_dates = set()
+    for table in _read_tables(start, end, [code], ['signals', f'{RAW_PREFIX}date'], root):
+        fired = (table['signals'].to_numpy() & mask) > 0
+        bar_dates.update(np.asarray(table[f'{RAW_PREFIX}date'])[fired])
+    return len(bar_dates)
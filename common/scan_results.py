@@ -0,0 +1,143 @@
+"""
+全量扫描结果表 - 按股票序号预分配的结构化数组
+
+全量选股原先把每只股票的结果字典（13 个字段 + 嵌套的 raw_data_mock）分别追加进
+all_results / selected 两个列表，去重靠 processed_codes 集合。这里改为一张按股票列表
+预分配的 NumPy 结构化数组（每只股票一行、定长字段），扫描时只填对应行:
+  - 是否已有结果、入选、按 J 值排序等都是整列向量化操作
+  - 需要字典（JSON、AI 分析）时再按行批量还原，格式与 all_stocks_*.jsonl 每行一致
+  - signals 存为位掩码（第 i 位对应 SIGNAL_NAMES[i]，见 common/scan_archive）
+
+all_stocks_*.jsonl 仍由流水线逐行追加写入（断点续跑依赖它），这里只替代内存中的累积与汇总。
+"""
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from .scan_archive import decode_signals, encode_signals
+
+RESULT_DTYPE = np.dtype([
+    ('filled', '?'),
+    ('code', 'U10'),
+    ('name', 'U16'),
+    ('market_cap', 'f8'),
+    ('has_industry', '?'),
+    ('industry', 'U32'),
+    ('signal', '?'),
+    ('signals', 'u1'),
+    ('K', 'f8'),
+    ('D', 'f8'),
+    ('J', 'f8'),
+    ('RSI', 'f8'),
+    ('near_amplitude', 'f8'),
+    ('far_amplitude', 'f8'),
+    ('raw_date', 'datetime64[D]'),
+    ('raw_open', 'f8'),
+    ('raw_high', 'f8'),
+    ('raw_low', 'f8'),
+    ('raw_close', 'f8'),
+    ('raw_volume', 'f8'),
+])
+FLOAT_FIELDS = ['market_cap', 'K', 'D', 'J', 'RSI', 'near_amplitude', 'far_amplitude']
+RAW_FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+
+def _volume(value):
+    """成交量为整数时还原为 int（与原始记录的 JSON 一致）"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+class ScanResults:
+    """
+    按股票序号存放的扫描结果
+
+    用法:
+        results = ScanResults([args[0] for args in args_list])
+        results.add(record)               # 扫描过程中逐只填入
+        results.records(results.selected())  # 入选股票的结果字典
+    """
+
+    def __init__(self, codes: Iterable[str]):
+        self.codes = list(codes)
+        self._index = {code: i for i, code in enumerate(self.codes)}
+        self.rows = np.zeros(len(self.codes), dtype=RESULT_DTYPE)
+
+    @classmethod
+    def from_records(cls, records: list) -> 'ScanResults':
+        """由结果字典列表构造（行顺序与 records 一致，重复代码只保留第一条）"""
+        results = cls(dict.fromkeys(record['code'] for record in records))
+        results.extend(records)
+        return results
+
+    def __len__(self) -> int:
+        """已有结果的股票数"""
+        return int(self.rows['filled'].sum())
+
+    def __contains__(self, code) -> bool:
+        i = self._index.get(code)
+        return i is not None and bool(self.rows['filled'][i])
+
+    def add(self, record: dict, overwrite: bool = False) -> bool:
+        """填入一只股票的结果；代码不在列表中或已有结果（overwrite=False）时忽略，返回是否写入"""
+        i = self._index.get(record.get('code'))
+        if i is None or (self.rows['filled'][i] and not overwrite):
+            return False
+        raw = record.get('raw_data_mock') or {}
+        industry = record.get('industry')
+        raw_date = str(raw['date'])[:10] if raw.get('date') else 'NaT'
+        # 整行一次赋值（逐字段写 np.void 慢一个数量级）
+        self.rows[i] = (
+            True, record['code'], record.get('name') or '', record.get('market_cap', np.nan),
+            industry is not None, industry or '', bool(record.get('signal', False)),
+            encode_signals(record.get('signals')),
+            *(record.get(name, np.nan) for name in FLOAT_FIELDS[1:]),
+            np.datetime64(raw_date, 'D'),
+            *(raw.get(name, np.nan) for name in RAW_FIELDS),
+        )
+        return True
+
+    def extend(self, records: Iterable[dict]) -> int:
+        return sum(self.add(record) for record in records)
+
+    def selected(self) -> np.ndarray:
+        """入选股票的行号（按股票列表顺序）"""
+        return np.flatnonzero(self.rows['filled'] & self.rows['signal'])
+
+    def filled(self) -> np.ndarray:
+        return np.flatnonzero(self.rows['filled'])
+
+    def missing_codes(self) -> List[str]:
+        """还没有结果的股票代码（按股票列表顺序）"""
+        return [self.codes[i] for i in np.flatnonzero(~self.rows['filled'])]
+
+    def order_by(self, field: str, indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """按字段升序排列的行号（稳定排序，相同值保持原有顺序）"""
+        indices = self.filled() if indices is None else np.asarray(indices)
+        return indices[np.argsort(self.rows[field][indices], kind='stable')]
+
+    def records(self, indices: Optional[np.ndarray] = None) -> List[dict]:
+        """按行号还原为结果字典（格式与 all_stocks_*.jsonl 每行一致）"""
+        indices = self.filled() if indices is None else indices
+        rows = self.rows[indices]
+        # 按列转成 Python 值再逐行拼装，比逐行 tolist 快
+        columns = {name: rows[name].tolist() for name in RESULT_DTYPE.names}
+        signals = [decode_signals(mask) for mask in columns['signals']]
+        records = []
+        for k in range(len(rows)):
+            raw_date = columns['raw_date'][k]
+            records.append({
+                'code': columns['code'][k],
+                'name': columns['name'][k],
+                'market_cap': columns['market_cap'][k],
+                'industry': columns['industry'][k] if columns['has_industry'][k] else None,
+                'signal': columns['signal'][k],
+                'signals': signals[k],
+                **{name: columns[name][k] for name in FLOAT_FIELDS[1:]},
+                'raw_data_mock': {
+                    'date': raw_date.isoformat() if raw_date is not None else None,
+                    **{name: columns[f'raw_{name}'][k] for name in RAW_FIELDS[:-1]},
+                    'volume': _volume(columns['raw_volume'][k]),
+                },
+            })
+        return records
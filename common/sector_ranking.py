@@ -0,0 +1,142 @@
+"""
+题材排名产物 - 鱼盆模型题材排名的列式交接文件 (Parquet)
+
+fish_basin_sectors 算完题材排名后立即写 {date_dir}/趋势模型_题材{后缀}.parquet，
+B1 选股直接读这个文件取热门题材，不再从 AI提示词/趋势模型_合并_Prompt.txt 的文字里正则提取，
+也不用等合并Excel和提示词生成完。
+
+列 (SCHEMA):
+  rank              按黄线偏离率从高到低的排名（从 1 开始）
+  code / name       题材代码与名称
+  above_yellow      现价是否在大哥黄线之上（状态 YES）
+  deviation         黄线偏离率（小数，0.05 即 5%）
+  white_deviation   白线偏离率（小数）
+  change            当日涨幅（小数）
+  interval_change   状态变化以来的区间涨幅（小数）
+  golden_cross_days / death_cross_days   金叉/死叉持续天数（0 表示不在该状态）
+  rank_change       与上一交易日相比的排名变化（"+3" / "-2" / "新" / "-"）
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .resample import timeframe_suffix
+from .sector_tagger import get_sector_tagger
+
+SCHEMA = pa.schema([
+    ('rank', pa.int32()),
+    ('code', pa.string()),
+    ('name', pa.string()),
+    ('above_yellow', pa.bool_()),
+    ('deviation', pa.float64()),
+    ('white_deviation', pa.float64()),
+    ('change', pa.float64()),
+    ('interval_change', pa.float64()),
+    ('golden_cross_days', pa.int32()),
+    ('death_cross_days', pa.int32()),
+    ('rank_change', pa.string()),
+])
+
+# 今日没有排名产物时最多往前找几天（按 date_dir 的日期，不按系统时间）
+MAX_LOOKBACK_DAYS = 7
+
+
+def ranking_path(date_dir: str, timeframe: str = 'D') -> str:
+    return os.path.join(date_dir, f"趋势模型_题材{timeframe_suffix(timeframe)}.parquet")
+
+
+def _days(value) -> int:
+    return int(value) if isinstance(value, (int, np.integer)) else 0
+
+
+def build_sector_ranking(rows: list, rank_changes: Optional[list] = None) -> pd.DataFrame:
+    """
+    fish_basin_status 的结果行（已按偏离率排好序）-> 排名表
+
+    rank_changes: 与 rows 对齐的排名变化，缺省为 "-"
+    """
+    rank_changes = rank_changes if rank_changes is not None else ["-"] * len(rows)
+    return pd.DataFrame({
+        'rank': np.arange(1, len(rows) + 1, dtype='int32'),
+        'code': [str(row['代码']) for row in rows],
+        'name': [str(row['名称']) for row in rows],
+        'above_yellow': [row['状态'] == 'YES' for row in rows],
+        'deviation': [float(row['_deviation_raw']) for row in rows],
+        'white_deviation': [float(row['_white_deviation_raw']) for row in rows],
+        'change': [float(row['_change_raw']) for row in rows],
+        'interval_change': [float(row['_interval_change_raw']) for row in rows],
+        'golden_cross_days': np.array([_days(row['金叉天数']) for row in rows], dtype='int32'),
+        'death_cross_days': np.array([_days(row['死叉天数']) for row in rows], dtype='int32'),
+        'rank_change': [str(change) for change in rank_changes],
+    })
+
+
+def save_sector_ranking(ranking: pd.DataFrame, date_dir: str, timeframe: str = 'D') -> str:
+    """原子写入排名产物，返回文件路径"""
+    os.makedirs(date_dir, exist_ok=True)
+    path = ranking_path(date_dir, timeframe)
+    table = pa.Table.from_pandas(ranking[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _previous_dirs(date_dir: str):
+    """date_dir 之前 MAX_LOOKBACK_DAYS 天的日期目录（同一个 results 根目录下）"""
+    root, name = os.path.split(os.path.normpath(date_dir))
+    try:
+        day = datetime.strptime(name, '%Y%m%d')
+    except ValueError:
+        return
+    for back in range(1, MAX_LOOKBACK_DAYS + 1):
+        yield os.path.join(root, (day - timedelta(days=back)).strftime('%Y%m%d'))
+
+
+def load_sector_ranking(date_dir: str, timeframe: str = 'D') -> Optional[pd.DataFrame]:
+    """
+    读取题材排名：优先 date_dir，没有时往前找最近一天的产物；都没有返回 None
+    """
+    for candidate in [date_dir, *_previous_dirs(date_dir)]:
+        path = ranking_path(candidate, timeframe)
+        if not os.path.exists(path):
+            continue
+        try:
+            ranking = pq.read_table(path).to_pandas()
+        except Exception as e:
+            print(f"⚠️ 题材排名文件损坏，忽略: {path} ({e})")
+            continue
+        if candidate != date_dir:
+            print(f"✅ 使用 {os.path.basename(candidate)} 的题材排名: {path}")
+        return ranking.sort_values('rank', ignore_index=True)
+    return None
+
+
+def top_sectors(ranking: Optional[pd.DataFrame], top_n: int = 5) -> List[str]:
+    """排名前 top_n 的题材名称"""
+    if ranking is None or ranking.empty:
+        return []
+    return ranking.nsmallest(top_n, 'rank')['name'].tolist()
+
+
+def join_hot_sectors(stocks: list, ranking: pd.DataFrame, top_n: int = 5) -> pd.DataFrame:
+    """
+    股票 × 热门题材（排名前 top_n）：每只股票命中的排名最靠前的热门题材
+
+    Returns:
+        与 stocks 顺序一致的 DataFrame[name, rank, deviation]，未命中的行为 NaN
+    """
+    hot = ranking.nsmallest(top_n, 'rank')[['name', 'rank', 'deviation']]
+    tags = get_sector_tagger(hot['name'].tolist()).tag_all(stocks)
+    pairs = pd.DataFrame({
+        'position': np.repeat(np.arange(len(stocks)), [len(matched) for matched in tags]),
+        'name': [sector for matched in tags for sector in matched],
+    })
+    best = pairs.merge(hot, on='name').sort_values(['position', 'rank']).drop_duplicates('position')
+    return best.set_index('position')[['name', 'rank', 'deviation']].reindex(np.arange(len(stocks)))
@@ -0,0 +1,149 @@
+"""
+题材标注 - 多关键词一次扫描（Aho–Corasick 自动机）
+
+原先判断"股票是否属于热门题材"是 热门题材 × 映射关键词 的双重循环做子串查找，
+映射表每次调用都重建。这里把所有关键词一次编译成一个自动机:
+  - KeywordMatcher: 关键词 -> 标签，扫描一遍文本返回命中的标签集合（与关键词个数无关）
+  - SectorTagger: 热门题材 + 别名表 (SECTOR_ALIASES) 编译成的 KeywordMatcher，
+    对股票的 industry/sector 字段打题材标签，返回命中的题材集合
+
+也用于板块资金流 (modules/sector_flow) 的噪声板块名称过滤。
+"""
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Set, Union
+
+# 题材映射表：Fish Basin题材名 -> 可能的行业关键词
+SECTOR_ALIASES = {
+    '贵金属': ['黄金', '白银', '贵金属'],
+    '有色金属': ['有色', '铝', '铜', '锌', '镍', '钴', '锂'],
+    '光伏设备': ['光伏', '太阳能', '逆变器', '硅片'],
+    '石油加工贸易': ['石油', '石化', '化工', '炼化'],
+    '半导体': ['半导体', '芯片', '集成电路', 'IC', '晶圆'],
+    '商业航天': ['航天', '卫星', '火箭', '航空航天'],
+    '保险': ['保险', '寿险', '财险'],
+    '稀土': ['稀土', '钕铁硼', '永磁'],
+    '通信设备': ['通信', '5G', '光通信', '网络设备'],
+    '细分化工': ['化工', '化学', '精细化工'],
+    '电网设备': ['电网', '电力设备', '特高压', '变压器'],
+    '煤炭': ['煤炭', '煤矿', '焦煤'],
+    '房地产': ['房地产', '地产', '物业'],
+    '风电设备': ['风电', '风能', '风机'],
+    '电力': ['电力', '发电', '火电', '水电'],
+    '养殖': ['养殖', '猪', '鸡', '禽'],
+    '医疗服务': ['医疗', '医院', '诊断'],
+    '新能源': ['新能源', '电池', '储能', '锂电'],
+    '人工智能': ['人工智能', 'AI', '算力', '芯片', '云计算'],
+    '旅游': ['旅游', '酒店', '景区'],
+}
+
+
+class KeywordMatcher:
+    """
+    多关键词匹配自动机（Aho–Corasick）
+
+    用法:
+        matcher = KeywordMatcher({'黄金': '贵金属', '白银': '贵金属', '铜': '有色金属'})
+        matcher.find('黄金 铜加工')   # {'贵金属', '有色金属'}
+        matcher.search('白银')        # True
+
+    keywords 为关键词列表时标签就是关键词本身；为 dict 时值可以是单个标签或标签列表。
+    """
+
+    def __init__(self, keywords: Union[Iterable[str], Dict[str, Union[str, Iterable[str]]]], ignore_case: bool = False):
+        self.ignore_case = ignore_case
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[frozenset] = [frozenset()]
+
+        items = keywords.items() if isinstance(keywords, dict) else ((keyword, keyword) for keyword in keywords)
+        for keyword, labels in items:
+            keyword = self._normalize(str(keyword))
+            if not keyword:
+                continue
+            labels = {labels} if isinstance(labels, str) else set(labels)
+            node = 0
+            for char in keyword:
+                nxt = self._goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(frozenset())
+                    self._goto[node][char] = nxt
+                node = nxt
+            self._out[node] = self._out[node] | labels
+
+        # BFS 建失败指针，并把后缀节点的输出并入（扫描时不用再沿失败链收集）
+        pending = deque(self._goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0) if node else 0
+                self._out[child] = self._out[child] | self._out[self._fail[child]]
+                pending.append(child)
+
+    def _normalize(self, text: str) -> str:
+        return text.lower() if self.ignore_case else text
+
+    def _scan(self, text: str):
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for char in self._normalize(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                yield out[node]
+
+    def find(self, text) -> Set[str]:
+        """文本中出现的所有关键词对应的标签集合"""
+        found = set()
+        for labels in self._scan(str(text)):
+            found |= labels
+        return found
+
+    def search(self, text) -> bool:
+        """是否出现任一关键词（命中即返回）"""
+        return next(self._scan(str(text)), None) is not None
+
+
+class SectorTagger:
+    """热门题材标注器：题材名本身及其别名（SECTOR_ALIASES）都算命中，不区分大小写"""
+
+    def __init__(self, sectors: Iterable[str], aliases: Dict[str, List[str]] = None):
+        aliases = SECTOR_ALIASES if aliases is None else aliases
+        self.sectors = list(sectors)
+        keywords = {}
+        for sector in self.sectors:
+            for keyword in [sector, *aliases.get(sector, [])]:
+                keywords.setdefault(keyword, set()).add(sector)
+        self.matcher = KeywordMatcher(keywords, ignore_case=True)
+
+    @staticmethod
+    def stock_text(stock_info: dict) -> str:
+        """参与匹配的股票文本：行业 + 题材"""
+        industry = stock_info.get('industry', '')
+        sector = stock_info.get('sector', '')
+        return f"{industry} {sector}"
+
+    def tag(self, stock_info: dict) -> Set[str]:
+        """股票命中的热门题材集合"""
+        return self.matcher.find(self.stock_text(stock_info))
+
+    def tag_all(self, stocks: Iterable[dict]) -> List[Set[str]]:
+        """批量标注，与 stocks 顺序一致"""
+        return [self.tag(stock) for stock in stocks]
+
+
+@lru_cache(maxsize=32)
+def _cached_tagger(sectors: tuple) -> SectorTagger:
+    return SectorTagger(sectors)
+
+
+def get_sector_tagger(sectors: Iterable[str]) -> SectorTagger:
+    """按热门题材列表缓存的标注器（同一组题材只编译一次）"""
+    return _cached_tagger(tuple(sectors))
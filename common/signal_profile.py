@@ -0,0 +1,147 @@
+"""
+B1 信号剖析 - 每个条件的耗时、命中数与淘汰数
+
+选股结果为 0 只或 200 只时，用来回答"是哪个条件筛掉的"和"时间花在哪里"。
+按需开启：把 SignalProfile 传给 StockSignals / check_stock_signal / PanelSignals，
+全市场跑完后写成 JSON 报告（b1_selection 放在 selected_*.json 旁边）。
+
+统计口径（只看最后一根K线，与选股一致）:
+  stages      各阶段耗时：指标计算、逐只常量（振幅区间/放宽系数/OK棒）、公式
+  conditions  公式中每条语句的耗时（去重后的子表达式记在首次出现的语句上）与成立的股票数
+  signals     每种信号成立的股票数，以及按顶层 AND 拆开的每个条件的淘汰数：
+              其余条件都成立、只有这一个条件不成立的股票数（放开该条件会多选出的股票）
+
+多进程选股时每个 worker 各自记录，用 to_dict / merge 汇总。
+"""
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+def _last_bar(value) -> Optional[np.ndarray]:
+    """中间结果在最后一根K线上的值（每只股票一个），无法取值（如 Lookback）时返回 None"""
+    if isinstance(value, pd.Series):
+        return value.to_numpy()[-1:]
+    if isinstance(value, pd.DataFrame):
+        return value.to_numpy()[-1]
+    if isinstance(value, np.ndarray):
+        # 面板里的一维数组是逐只常量（每列一个值），不是时间序列
+        return value[-1] if value.ndim == 2 else value
+    if isinstance(value, (bool, np.bool_, int, float, np.number)):
+        return np.asarray([value])
+    return None
+
+
+class SignalProfile:
+    """可合并、可序列化的信号剖析结果"""
+
+    def __init__(self):
+        self.stocks = 0
+        self.stages = defaultdict(float)
+        self.seconds = defaultdict(float)
+        self.true_count = defaultdict(int)
+        self.signals = {}  # 信号 -> {'true_count': n, 'eliminated': {条件: n}}
+
+    @contextmanager
+    def stage(self, name: str):
+        """记录一个阶段的耗时"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - started
+
+    def add_time(self, condition: str, seconds: float):
+        self.seconds[condition] += seconds
+
+    def record(self, formula, values: dict, targets) -> None:
+        """公式求值结束后统计命中与淘汰（由 Formula.evaluate 调用）"""
+        stocks = None
+        for name, node_id in formula.variables.items():
+            last = _last_bar(values.get(node_id))
+            if last is None:
+                continue
+            stocks = max(stocks or 0, len(last))
+            if last.dtype == bool:
+                self.true_count[name] += int(last.sum())
+        if stocks is None:
+            return
+        self.stocks += stocks
+
+        for name in targets:
+            result = _last_bar(values[formula.variables[name]])
+            if result is None or result.dtype != bool:
+                continue
+            entry = self.signals.setdefault(name, {'true_count': 0, 'eliminated': {}})
+            entry['true_count'] += int(result.sum())
+            conjuncts = formula.conjuncts(name)
+            if len(conjuncts) < 2:
+                continue
+            passed = np.array([np.broadcast_to(_last_bar(values[node_id]), stocks) for node_id in conjuncts], dtype=bool)
+            failed = (~passed).sum(axis=0)
+            for node_id, value in zip(conjuncts, passed):
+                # 只有这一个条件不成立
+                only = int((~value & (failed == 1)).sum())
+                condition = formula.describe(node_id, top=False)
+                entry['eliminated'][condition] = entry['eliminated'].get(condition, 0) + only
+
+    def merge(self, other) -> 'SignalProfile':
+        """合并另一份剖析结果（SignalProfile 或 to_dict 的返回值）"""
+        other = other if isinstance(other, SignalProfile) else SignalProfile.from_dict(other)
+        self.stocks += other.stocks
+        for name, seconds in other.stages.items():
+            self.stages[name] += seconds
+        for name, seconds in other.seconds.items():
+            self.seconds[name] += seconds
+        for name, count in other.true_count.items():
+            self.true_count[name] += count
+        for name, entry in other.signals.items():
+            mine = self.signals.setdefault(name, {'true_count': 0, 'eliminated': {}})
+            mine['true_count'] += entry['true_count']
+            for condition, count in entry['eliminated'].items():
+                mine['eliminated'][condition] = mine['eliminated'].get(condition, 0) + count
+        return self
+
+    def to_dict(self) -> dict:
+        conditions = sorted(set(self.seconds) | set(self.true_count), key=lambda name: -self.seconds.get(name, 0))
+        return {
+            'stocks': self.stocks,
+            'stages': {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            'conditions': [
+                {
+                    'name': name,
+                    'seconds': round(self.seconds.get(name, 0.0), 6),
+                    'true_count': self.true_count.get(name),
+                }
+                for name in conditions
+            ],
+            'signals': {
+                name: {
+                    'true_count': entry['true_count'],
+                    'eliminated': dict(sorted(entry['eliminated'].items(), key=lambda item: -item[1])),
+                }
+                for name, entry in self.signals.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SignalProfile':
+        profile = cls()
+        profile.stocks = data.get('stocks', 0)
+        profile.stages.update(data.get('stages', {}))
+        for item in data.get('conditions', []):
+            profile.seconds[item['name']] += item['seconds']
+            if item.get('true_count') is not None:
+                profile.true_count[item['name']] += item['true_count']
+        for name, entry in data.get('signals', {}).items():
+            profile.signals[name] = {'true_count': entry['true_count'], 'eliminated': dict(entry['eliminated'])}
+        return profile
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
@@ -1,29 +1,114 @@
 """
 选股信号模块 - 实现东方财富"知行B1选股专用"公式的七种买入信号
+
+公式主体 b1_formula 由 config/formulas/b1.txt 编译而来（common/formula.py），与序列函数的实现无关：
+  - StockSignals 逐只计算，传入 pandas Series 与 SERIES_OPS
+  - panel_signals.PanelSignals 全市场一次计算，传入 日期 x 股票 的二维数组与 ARRAY_OPS
+两条路径执行的是同一段公式、同样顺序的浮点运算，结果逐位相同。
+
+日常选股只看最后一根K线：StockSignals(last_bar_only=True) 只在最后 last_bar_plan().bars 根K线上跑公式，
+截取长度由公式定义自动推导（common/lookback.py）；回测需要完整历史时使用默认的全量模式。
+公式按K线逐根计算，与周期无关：传入日线并指定 timeframe='W'/'M' 即在周线/月线上判定信号。
 """
+from contextlib import nullcontext
+from functools import lru_cache
+
 import pandas as pd
 import numpy as np
 from common.indicators import (
-    ref, ma, ema, sma, hhv, llv, hhvbars, count, every, exist, barslast, cross,
+    ma, ema, sma, hhvbars,
     kdj, rsi, bbi, trend_white_line, dage_yellow_line, short_term, long_term,
     calculate_all_indicators
 )
+from common.formula import SERIES_OPS, ARRAY_OPS, load_formula
+from common.resample import check_timeframe, resample_bars
+from common.lookback import LOOKBACK_OPS, LastBarPlan, Lookback, NeedFullHistory, derive_plan, tail_ops
 
 Series = pd.Series
 DataFrame = pd.DataFrame
 
+# 七种买入信号（get_latest_signal 中 signals 的顺序）
+SIGNAL_NAMES = ['超卖缩量拐头B', '超卖缩量B', '原始B1', '超卖超缩量B', '回踩白线B', '回踩超级B', '回踩黄线B']
+
+# b1_formula 的返回值：七种信号、综合信号与振幅
+B1_OUTPUTS = SIGNAL_NAMES + ['XG', '近期振幅', '远期振幅']
+
+# 公式用到的K线与指标列（指标为 calculate_all_indicators 的输出，在全量历史上计算）
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+INDICATOR_COLUMNS = ['K', 'D', 'J', 'RSI', '趋势白线', '大哥黄线', 'BBI', '短期', '长期', 'MA60']
+B1_INDICATORS = ['J', 'RSI', '趋势白线', '大哥黄线', 'BBI', '短期', '长期', 'MA60']
+
+
+def is_special_board(stock_code: str) -> bool:
+    """判断是否为科创板/创业板/北交所等特殊板块"""
+    code = stock_code
+    return (code.startswith('68') or code.startswith('30') or
+            code.startswith('4') or code.startswith('8') or code.startswith('9'))
+
+
+def has_big_gain(c, ops=SERIES_OPS):
+    """近200日内是否出现过单日涨幅超过15%"""
+    return ops.exist(c / ops.ref(c, 1) > 1.15, 200)
+
+
+def b1_formula(o, h, l, c, v, ind, 振幅区间, 放宽系数, OK棒, ops=SERIES_OPS, N: int = 20, M: int = 50,
+               profile=None) -> dict:
+    """
+    知行B1 公式主体（公式文本见 config/formulas/b1.txt，编译一次后缓存）
+
+    Args:
+        o, h, l, c, v: 开高低收量（Series，或 日期 x 股票 的二维数组）
+        ind: 指标，按 calculate_all_indicators 的列名取值 (K/D/J/RSI/趋势白线/...)
+        振幅区间, 放宽系数, OK棒: 按最后一根K线判定的逐只常量（二维时为每列一个值）
+        ops: SERIES_OPS 或 ARRAY_OPS
+        N, M: 近期/远期振幅周期
+        profile: signal_profile.SignalProfile，按需记录每个条件的耗时与命中
+
+    Returns:
+        {信号名: 条件}，包含七种信号、XG、近期振幅、远期振幅
+    """
+    inputs = {name: ind[name] for name in B1_INDICATORS}
+    inputs.update({'open': o, 'high': h, 'low': l, 'close': c, 'volume': v,
+                   '振幅区间': 振幅区间, '放宽系数': 放宽系数, 'OK棒': OK棒, 'N': N, 'M': M})
+    return load_formula('b1').evaluate(inputs, ops, B1_OUTPUTS, profile)
+
+
+@lru_cache(maxsize=None)
+def last_bar_plan(N: int = 20, M: int = 50) -> LastBarPlan:
+    """用 Lookback 跑一遍 b1_formula，推导只算最后一根K线需要截取的K线根数"""
+    x = Lookback()
+    ind = {name: Lookback() for name in INDICATOR_COLUMNS}
+    return derive_plan(b1_formula(x, x, x, x, x, ind, 5, 1, True, LOOKBACK_OPS, N, M).values())
+
+
+@lru_cache(maxsize=None)
+def big_gain_bars() -> int:
+    """has_big_gain 最后一根所需的K线根数"""
+    return derive_plan([has_big_gain(Lookback(), LOOKBACK_OPS)]).bars
+
 
 class StockSignals:
     """选股信号生成器"""
     
-    def __init__(self, df: DataFrame, stock_code: str):
+    def __init__(self, df: DataFrame, stock_code: str, last_bar_only: bool = False, profile=None,
+                 timeframe: str = 'D'):
         """
         初始化
         df: 包含 open, high, low, close, volume 的日线数据
         stock_code: 股票代码
+        last_bar_only: 只计算最后一根K线（日常选股），信号与振幅只保留最后一行；
+                       回测需要每一根K线的信号时保持 False
+        profile: signal_profile.SignalProfile，按需记录各阶段/各条件的耗时与命中
+        timeframe: 'W'/'M' 时先由日线合成周线/月线 (common/resample.py)，公式在周线/月线上逐根计算
         """
-        self.df = calculate_all_indicators(df)
+        self.profile = profile
+        self.timeframe = check_timeframe(timeframe)
+        if self.timeframe != 'D':
+            df = resample_bars(df, self.timeframe)
+        with self._stage('指标'):
+            self.df = calculate_all_indicators(df)
         self.stock_code = stock_code
+        self.last_bar_only = last_bar_only
         self.N = 20  # 近期振幅周期
         self.M = 50  # 远期振幅周期
         
@@ -32,199 +117,106 @@ class StockSignals:
     
     def _is_special_board(self) -> bool:
         """判断是否为科创板/创业板/北交所等特殊板块"""
-        code = self.stock_code
-        return (code.startswith('68') or code.startswith('30') or 
-                code.startswith('4') or code.startswith('8') or code.startswith('9'))
+        return is_special_board(self.stock_code)
+
+    def _stage(self, name: str):
+        """剖析模式下记录阶段耗时，否则不做任何事"""
+        return self.profile.stage(name) if self.profile is not None else nullcontext()
     
     def _calculate_all(self):
         """计算所有中间指标"""
         df = self.df
         o, h, l, c, v = df['open'], df['high'], df['low'], df['close'], df['volume']
-        
-        # 获取已计算的指标
-        k, d, j = df['K'], df['D'], df['J']
-        rsi_val = df['RSI']
-        趋势白线 = df['趋势白线']
-        大哥黄线 = df['大哥黄线']
-        短期 = df['短期']
-        长期 = df['长期']
-        bbi_val = df['BBI']
-        
-        # === 市场环境判定 ===
-        # 检查是否曾经涨幅超过15%（判断是否有涨跌幅限制放宽）
-        has_big_gain = exist(c / ref(c, 1) > 1.15, 200)
-        is_special = self._is_special_board() or has_big_gain
-        
-        # 判断是否特殊板块（需要处理 Series 类型）
-        is_special_val = is_special.iloc[-1] if isinstance(is_special, Series) else is_special
-        self.振幅区间 = 8 if is_special_val else 5
-        self.放宽系数 = 0.9 if is_special_val else 1
-        
-        当日振幅 = (h - l) / l * 100
-        当日涨跌幅 = abs(c - ref(c, 1)) / ref(c, 1) * 100 * self.放宽系数
-        上涨十字星 = (c > ref(c, 1)) & ((abs(c - o) / o * 100 * self.放宽系数) < 1.8)
-        
-        # === 量能形态判定 ===
-        # 大绿棒判定：简化逻辑 - 检查过去40天内最大成交量日是否为绿棒（收盘<开盘 且 收盘<前收）
-        # 使用向量化方法避免动态shift问题
-        vday = hhvbars(v, 40)
-        
-        # 简化大绿棒判定：近40天最大成交量那天是否是大阴线
-        # 如果是大阴线且距离近（15天内），则不是好的形态
-        def check_big_green_bar(df_part, vday_val):
-            """检查大绿棒"""
-            if vday_val < 0 or vday_val >= len(df_part):
-                return True  # 数据不足，默认OK
-            idx = len(df_part) - 1 - int(vday_val)
-            if idx < 1:
-                return True
-            c_val = df_part['close'].iloc[idx]
-            o_val = df_part['open'].iloc[idx]
-            c_prev = df_part['close'].iloc[idx - 1] if idx > 0 else c_val
-            # 不是大绿棒：收盘>=前收 或 收盘>=开盘
-            return c_val >= c_prev or c_val >= o_val
-        
-        # 对最后一行应用判断（选股只关心最后一天）
-        last_vday = int(vday.iloc[-1]) if not pd.isna(vday.iloc[-1]) else 0
-        is_not_big_green = check_big_green_bar(df, last_vday)
-        big_green_far = last_vday >= 15
-        
-        # 创建 Series 以便后续计算
-        不是大绿棒 = pd.Series([is_not_big_green] * len(df), index=df.index)
-        大绿棒离得远 = pd.Series([big_green_far and not is_not_big_green] * len(df), index=df.index)
-        
-        缩量 = (v < hhv(v, 20) * 0.416) | (v < hhv(v, 50) / 3)
-        回踩缩量 = (v < hhv(v, 20) * 0.45) | (v < hhv(v, 50) / 3)
-        适当缩量 = (v < hhv(v, 20) * 0.618) | (v < hhv(v, 50) / 3)
-        超缩量 = (v < hhv(v, 30) / 4) | (v < hhv(v, 50) / 6)
-        
-        OK棒 = 不是大绿棒 | 大绿棒离得远
-        
-        # === 异动与趋势判定 ===
-        lown = llv(l, self.N)
-        highn = hhv(h, self.N)
-        近期振幅 = (highn - lown) / lown * 100
-        近期异动 = (近期振幅 >= 15) | ((hhv(h, 12) - llv(l, 14)) / llv(l, 14) * 100 >= 11)
-        
-        lowm = llv(l, self.M)
-        highm = hhv(h, self.M)
-        远期振幅 = (highm - lowm) / lowm * 100
-        远期异动 = 远期振幅 >= 30
-        超级异动 = 近期振幅 >= 60
-        
-        单针下20 = ((短期 <= 20) & (长期 >= 75)) | ((长期 - 短期) >= 70)
-        聚宝盆 = (count(长期 >= 75, 8) >= 6) & (count(短期 <= 70, 7) >= 4) & (count(短期 <= 50, 8) >= 1)
-        双叉戟 = every(长期 >= 75, 8) & (count(短期 <= 50, 6) >= 2) & (count(短期 <= 20, 7) >= 1)
-        洗盘异动 = (count(单针下20, 10) >= 2) | 聚宝盆 | 双叉戟
-        
-        异动 = 近期异动 | 远期异动 | 洗盘异动
-        
-        红肥绿瘦 = (count(c >= o, 15) > 7) | (count(c > ref(c, 1), 11) > 5)
-        
-        # === 趋势判定 ===
-        做上涨趋势 = (趋势白线 >= 大哥黄线) & ((c >= 大哥黄线) | ((c > 大哥黄线 * 0.975) & (c > o)))
-        
-        强趋势股 = (every(大哥黄线 >= ref(大哥黄线, 1) * 0.999, 13) & 
-                   (趋势白线 >= ref(趋势白线, 1)) & 
-                   every(趋势白线 > 大哥黄线, 20) & 
-                   every(趋势白线 >= ref(趋势白线, 1), 11) & 
-                   红肥绿瘦)
-        
-        超牛股 = ((every(bbi_val >= ref(bbi_val, 1) * 0.999, 20) | (count(bbi_val >= ref(bbi_val, 1), 25) >= 23)) & 
-                 ((近期振幅 >= 30) | (远期振幅 > 80)) & 
-                 (barslast(cross(c, 大哥黄线)) > 12))
-        
-        # === 距离与回踩判定 ===
-        距离白线 = abs(c - 趋势白线) / c * 100
-        L距离白线 = abs(l - 趋势白线) / 趋势白线 * 100
-        距离BBI = abs(c - bbi_val) / c * 100
-        L距离BBI = abs(l - bbi_val) / bbi_val * 100
-        距离黄线 = abs(c - 大哥黄线) / 大哥黄线 * 100
-        
-        回踩白线 = ((c >= 趋势白线) & (距离白线 <= 2)) | \
-                  ((c < 趋势白线) & (距离白线 < 0.8)) | \
-                  ((c >= bbi_val) & (距离BBI < 2.5) & (L距离BBI < 1) & (距离白线 <= 3) & (当日涨跌幅 < 1) & (c > ref(c, 1)))
-        
-        白线支撑 = (c >= 趋势白线) & (距离白线 < 1.5)
-        强势回踩不破 = ((L距离白线 < 1) | (L距离BBI < 0.5)) & (c > 趋势白线) & (距离白线 <= 3.5)
-        
-        回踩黄线 = ((c >= 大哥黄线) & ((距离黄线 <= 1.5) | ((距离黄线 <= 2) & (当日涨跌幅 < 1)))) | \
-                  ((c < 大哥黄线) & (距离黄线 <= 0.8))
-        
-        # === 七种买入信号 ===
-        # 1. 超卖缩量拐头B
-        self.超卖缩量拐头B = (做上涨趋势 & 
-                            ((rsi_val - 15) >= ref(rsi_val, 1)) & 
-                            ((ref(rsi_val, 1) < 20) | (ref(j, 1) < 14)) & 
-                            (当日振幅 < (self.振幅区间 + 0.5)) & 
-                            ((当日涨跌幅 < 2.3) | 上涨十字星) & 
-                            OK棒 & 异动 & (c >= 大哥黄线))
-        
-        # 2. 超卖缩量B
-        self.超卖缩量B = (做上涨趋势 & 
-                        ((j < 14) | (rsi_val < 23)) & 
-                        ((rsi_val + j < 55) | (j == llv(j, 20))) & 
-                        (当日振幅 < self.振幅区间) & 
-                        ((当日涨跌幅 < 2.5) | 上涨十字星) & 
-                        OK棒 & 
-                        (缩量 | (适当缩量 & (当日涨跌幅 < 1))) & 
-                        异动)
-        
-        # 3. 原始B1
-        self.原始B1 = ((趋势白线 > 大哥黄线) & 
-                      (c >= 大哥黄线 * 0.99) & 
-                      (大哥黄线 >= ref(大哥黄线, 1)) & 
-                      ((j < 13) | (rsi_val < 21)) & 
-                      ((rsi_val + j) < llv(rsi_val + j, 15) * 1.5) & 
-                      适当缩量 & OK棒 & 
-                      ((abs(c - o) * 100 / o < 1.5) | 超缩量 | (适当缩量 & ((距离白线 < 1.8) | (距离BBI < 1.5) | (距离黄线 < 2.8)))) & 
-                      异动)
-        
-        # 4. 超卖超缩量B
-        self.超卖超缩量B = (做上涨趋势 & 
-                          ((j < 14) | (rsi_val < 23)) & 
-                          (rsi_val + j < 60) & 
-                          (远期振幅 >= 45) & 
-                          ((当日振幅 < self.振幅区间) | (超级异动 & (当日振幅 < self.振幅区间 + 3.2) & (c > o) & (c > 趋势白线))) & 
-                          (((c < o) & (v < ref(v, 1)) & (c >= 大哥黄线)) | (c >= o)) & 
-                          ((当日涨跌幅 < 2) | 上涨十字星) & 
-                          OK棒 & 超缩量 & 异动)
-        
-        # 5. 回踩白线B
-        self.回踩白线B = (强趋势股 & 
-                        ((j < 30) | (rsi_val < 40) | 洗盘异动) & 
-                        (rsi_val + j < 70) & 
-                        ((当日振幅 < self.振幅区间 + 0.5) | (距离白线 < 1) | (距离BBI < 1)) & 
-                        回踩白线 & 
-                        ((当日涨跌幅 < 2) | ((当日涨跌幅 < 5) & 白线支撑)) & 
-                        OK棒 & 回踩缩量 & 异动 & (l <= ref(c, 1)))
-        
-        # 6. 回踩超级B
-        self.回踩超级B = (超牛股 & 
-                        ((j < 35) | (rsi_val < 45) | 洗盘异动) & 
-                        (rsi_val + j < 80) & 
-                        ((rsi_val + j) == llv(rsi_val + j, 25)) & 
-                        (当日振幅 < self.振幅区间 + 1) & 
-                        ((当日涨跌幅 < 2.5) | (距离白线 < 2)) & 
-                        强势回踩不破 & OK棒 & 异动 & 适当缩量)
-        
-        # 7. 回踩黄线B
-        self.回踩黄线B = ((趋势白线 >= 大哥黄线) & 
-                        (c >= 大哥黄线 * 0.975) & 
-                        ((j < 13) | (rsi_val < 18)) & 
-                        回踩黄线 & OK棒 & 
-                        (缩量 | (适当缩量 & ((j == llv(j, 20)) | (rsi_val == llv(rsi_val, 14))))) & 
-                        (大哥黄线 >= ref(大哥黄线, 1) * 0.997) & 
-                        (df['MA60'] >= ref(df['MA60'], 1)) & 
-                        (近期振幅 >= 11.9) & (远期振幅 >= 19.5))
-        
-        # 综合信号
-        self.XG = (self.超卖缩量拐头B | self.超卖缩量B | self.原始B1 | 
-                   self.超卖超缩量B | self.回踩白线B | self.回踩超级B | self.回踩黄线B)
+        arrays = None
+        if self.last_bar_only:
+            # 只算最后一根时改用二维数组 (行=日期, 列=1) 与 ARRAY_OPS，逐位相同
+            arrays = {name: df[name].to_numpy(dtype='float64').reshape(-1, 1)
+                      for name in PRICE_COLUMNS + INDICATOR_COLUMNS}
+        
+        with self._stage('逐只常量'):
+            # === 市场环境判定 ===
+            # 检查是否曾经涨幅超过15%（判断是否有涨跌幅限制放宽）
+            if arrays is not None:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    big_gain = has_big_gain(arrays['close'][-big_gain_bars():], ARRAY_OPS)[-1, 0]
+            else:
+                big_gain = has_big_gain(c)
+            is_special = self._is_special_board() or big_gain
+        
+            # 判断是否特殊板块（需要处理 Series 类型）
+            is_special_val = is_special.iloc[-1] if isinstance(is_special, Series) else is_special
+            self.振幅区间 = 8 if is_special_val else 5
+            self.放宽系数 = 0.9 if is_special_val else 1
+        
+            # === 量能形态判定 ===
+            # 大绿棒判定：简化逻辑 - 检查过去40天内最大成交量日是否为绿棒（收盘<开盘 且 收盘<前收）
+            # 使用向量化方法避免动态shift问题
+            vday = hhvbars(v, 40)
+        
+            # 简化大绿棒判定：近40天最大成交量那天是否是大阴线
+            # 如果是大阴线且距离近（15天内），则不是好的形态
+            def check_big_green_bar(df_part, vday_val):
+                """检查大绿棒"""
+                if vday_val < 0 or vday_val >= len(df_part):
+                    return True  # 数据不足，默认OK
+                idx = len(df_part) - 1 - int(vday_val)
+                if idx < 1:
+                    return True
+                c_val = df_part['close'].iloc[idx]
+                o_val = df_part['open'].iloc[idx]
+                c_prev = df_part['close'].iloc[idx - 1] if idx > 0 else c_val
+                # 不是大绿棒：收盘>=前收 或 收盘>=开盘
+                return c_val >= c_prev or c_val >= o_val
+        
+            # 对最后一行应用判断（选股只关心最后一天）
+            last_vday = int(vday.iloc[-1]) if not pd.isna(vday.iloc[-1]) else 0
+            is_not_big_green = check_big_green_bar(df, last_vday)
+            big_green_far = last_vday >= 15
+        
+        # === 公式主体（七种买入信号） ===
+        if arrays is not None:
+            OK棒 = is_not_big_green or (big_green_far and not is_not_big_green)
+            with self._stage('公式'):
+                result = self._last_bar_formula(arrays, OK棒)
+        else:
+            # 创建 Series 以便后续计算
+            不是大绿棒 = pd.Series([is_not_big_green] * len(df), index=df.index)
+            大绿棒离得远 = pd.Series([big_green_far and not is_not_big_green] * len(df), index=df.index)
+            
+            OK棒 = 不是大绿棒 | 大绿棒离得远
+            with self._stage('公式'):
+                result = b1_formula(o, h, l, c, v, df, self.振幅区间, self.放宽系数, OK棒, SERIES_OPS, self.N, self.M,
+                                    self.profile)
+        for name in SIGNAL_NAMES + ['XG']:
+            setattr(self, name, result[name])
         
         # 保存用于调试
-        self.近期振幅 = 近期振幅
-        self.远期振幅 = 远期振幅
+        self.近期振幅 = result['近期振幅']
+        self.远期振幅 = result['远期振幅']
+    
+    def _last_bar_formula(self, arrays: dict, OK棒) -> dict:
+        """
+        只截取最后 last_bar_plan().bars 根K线跑公式，结果只保留最后一行
+
+        截取窗口内无法确定 BARSLAST 的结果时（窗口内没有精确的成立记录），改用全部K线再算一次。
+        """
+        plan = last_bar_plan(self.N, self.M)
+        attempts = []
+        if len(self.df) > plan.bars:
+            attempts.append(({name: values[-plan.bars:] for name, values in arrays.items()},
+                             tail_ops(plan.scan_start)))
+        attempts.append((arrays, ARRAY_OPS))
+
+        for data, ops in attempts:
+            try:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    result = b1_formula(data['open'], data['high'], data['low'], data['close'], data['volume'], data,
+                                        self.振幅区间, self.放宽系数, OK棒, ops, self.N, self.M, self.profile)
+                break
+            except NeedFullHistory:
+                continue
+        index = self.df.index[-1:]
+        return {name: pd.Series(value[-1:, 0], index=index) for name, value in result.items()}
     
     def get_latest_signal(self) -> dict:
         """获取最新一天的信号"""
@@ -263,10 +255,11 @@ class StockSignals:
         }
 
 
-def check_stock_signal(df: DataFrame, stock_code: str) -> dict:
-    """检查单只股票的信号"""
+def check_stock_signal(df: DataFrame, stock_code: str, last_bar_only: bool = False, profile=None,
+                       timeframe: str = 'D') -> dict:
+    """检查单只股票的信号（只关心最新信号时传 last_bar_only=True；profile 见 common/signal_profile.py）"""
     try:
-        signals = StockSignals(df, stock_code)
+        signals = StockSignals(df, stock_code, last_bar_only=last_bar_only, profile=profile, timeframe=timeframe)
         return signals.get_latest_signal()
     except Exception as e:
         return {'signal': False, 'signals': [], 'error': str(e)}
@@ -0,0 +1,175 @@
+"""
+分阶段流水线 - 各阶段用有界队列串起来，各自并发，互相掩盖等待
+
+全量选股原先主线程逐条等 worker 结果、再序列化写文件，主线程的处理与 worker 的计算互相等待。
+这里拆成独立阶段:
+  - 源阶段在自己的线程里迭代输入（如 FetchPool.imap_unordered 的结果）
+  - CPU 密集的工作应放在源（worker 进程）里：阶段线程共用主进程的 GIL，只适合轻量处理
+  - 之后每个阶段有自己的线程数，从上游队列取、处理、放进下游队列
+  - 队列有界：下游处理不过来时上游的 put 会阻塞（背压），内存中积压的K线数量有上限
+  - 主线程迭代流水线拿到最后一个阶段的输出，status() 给出各阶段吞吐与队列深度（进度条后缀）
+
+阶段函数返回 None 表示丢弃该条（如K线不足），抛异常时打印并丢弃，不影响其他条目；
+源产出 None 同样只计数不下传（进度按源的条目数推进，失败的条目也算处理过）。
+迭代提前中止（异常/break）时各线程尽快退出。
+"""
+import queue
+import threading
+import time
+
+# 队列之间传递的结束标记
+_DONE = object()
+# 阻塞的 put/get 检查中止标记的间隔（秒）
+_POLL_INTERVAL = 0.2
+
+
+class _Stage:
+    def __init__(self, name, func, workers, maxsize):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.inbox = queue.Queue(maxsize=max(1, int(maxsize)))
+        self.count = 0
+        self.busy = 0.0  # 各线程累计处理耗时（秒）
+        self.lock = threading.Lock()
+
+
+class StagePipeline:
+    """
+    有界队列连接的多阶段流水线
+
+    用法:
+        pipeline = StagePipeline(pool.imap_unordered(fetch, items), source_name='抓取')
+        pipeline.add_stage('信号', score, workers=1, maxsize=32)
+        pipeline.add_stage('序列化', dump, workers=1, maxsize=32)
+        for output in pipeline:
+            bar.set_postfix_str(pipeline.status())
+    """
+
+    def __init__(self, source, source_name='源', maxsize=32):
+        """
+        Args:
+            source: 任意可迭代对象，在独立线程中迭代（生成器可以阻塞等待网络）
+            source_name: 源阶段名称（用于 status）
+            maxsize: 源阶段到下一阶段的队列容量（之后的阶段用 add_stage 的 maxsize）
+        """
+        self.source = source
+        self.source_name = source_name
+        self.source_count = 0
+        self.maxsize = maxsize
+        self.stages = []
+        self._stop = threading.Event()
+        self._threads = []
+        self._started_at = None
+        self._errors = []
+
+    def add_stage(self, name, func, workers=1, maxsize=None):
+        """追加一个阶段：func(item) -> 输出（None 丢弃）；maxsize 为该阶段输入队列的容量"""
+        if self._started_at is not None:
+            raise RuntimeError("pipeline already started")
+        capacity = self.maxsize if maxsize is None else maxsize
+        self.stages.append(_Stage(name, func, workers, capacity))
+        return self
+
+    # ---------- 线程主体 ----------
+
+    def _put(self, target, item):
+        """放进下游队列，队列满时阻塞（背压），中止时返回 False"""
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source):
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _run_source(self, target):
+        try:
+            for item in self.source:
+                self.source_count += 1
+                if item is None:
+                    continue
+                if not self._put(target, item):
+                    return
+        except Exception as e:
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            self._put(target, _DONE)
+
+    def _run_stage(self, stage, target, remaining):
+        """remaining: [仍在运行的线程数]，最后一个退出的线程负责向下游发结束标记"""
+        while True:
+            item = self._get(stage.inbox)
+            if item is _DONE:
+                break
+            started = time.perf_counter()
+            try:
+                output = stage.func(item)
+            except Exception as e:
+                print(f"⚠️ 流水线阶段[{stage.name}]处理失败: {type(e).__name__}: {e}")
+                output = None
+            with stage.lock:
+                stage.count += 1
+                stage.busy += time.perf_counter() - started
+            if output is not None and not self._put(target, output):
+                break
+        with stage.lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        # 同阶段还有线程在运行时把结束标记留给它们，最后一个线程再通知下游
+        self._put(target if last else stage.inbox, _DONE)
+
+    # ---------- 迭代 ----------
+
+    def __iter__(self):
+        if self._started_at is not None:
+            raise RuntimeError("pipeline already started")
+        self._started_at = time.monotonic()
+        output = queue.Queue(maxsize=self.maxsize)
+        targets = [stage.inbox for stage in self.stages[1:]] + [output]
+        first = self.stages[0].inbox if self.stages else output
+
+        self._threads.append(threading.Thread(target=self._run_source, args=(first,), daemon=True))
+        for stage, target in zip(self.stages, targets):
+            remaining = [stage.workers]
+            for _ in range(stage.workers):
+                self._threads.append(threading.Thread(target=self._run_stage, args=(stage, target, remaining), daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+        try:
+            while True:
+                item = self._get(output)
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            self._stop.set()
+            for thread in self._threads:
+                thread.join(timeout=5)
+        if self._errors:
+            raise self._errors[0]
+
+    def status(self) -> str:
+        """各阶段吞吐（条/秒）与输入队列深度，例如: 抓取 12.0/s │ 信号 11.8/s q=3/32 │ 序列化 11.8/s q=0/32"""
+        elapsed = max(time.monotonic() - (self._started_at or time.monotonic()), 1e-9)
+        parts = [f"{self.source_name} {self.source_count / elapsed:.1f}/s"]
+        for stage in self.stages:
+            parts.append(f"{stage.name} {stage.count / elapsed:.1f}/s q={stage.inbox.qsize()}/{stage.inbox.maxsize}")
+        return " │ ".join(parts)
+
+    def stats(self) -> dict:
+        """各阶段处理条数与累计耗时（秒），用于结束后的汇总"""
+        stats = {self.source_name: {'count': self.source_count}}
+        for stage in self.stages:
+            stats[stage.name] = {'count': stage.count, 'busy_seconds': round(stage.busy, 3)}
+        return stats
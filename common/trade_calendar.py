@@ -0,0 +1,103 @@
+"""
+A股交易日历 - 某天是否开市、当前时刻最近一个已收盘的交易日
+
+原先只按周末判断，工作日节假日（春节、国庆等）会被当成交易日:
+收盘快照入库会把上一交易日的K线以节假日日期写进仓库，is_fresh 也会对全市场判"不新鲜"。
+
+数据源: Tushare trade_cal（已配置 token 时）-> 新浪 tool_trade_date_hist_sina（含当年剩余交易日）
+  - 进程内只取一次；落盘缓存当天有效，FetchPool 各 worker 进程共用一份
+  - 数据源都不可用时返回 None，调用方退回按周末判断（失败后 RETRY_SECONDS 内不再重试）
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from .disk_cache import get_disk_cache
+
+# 日历获取失败后多久再重试（秒），避免逐只股票的 is_fresh 反复请求网络
+RETRY_SECONDS = 600
+# 从 Tushare 取的交易日数（约4年，够回测/回填使用）
+TUSHARE_TRADE_DAYS = 1000
+
+_calendar = None
+_failed_at = None
+_lock = threading.Lock()
+
+
+def _fetch_tushare() -> Optional[list]:
+    from .tushare_manager import TushareManager
+
+    ts_manager = TushareManager()
+    if not ts_manager.is_ready:
+        return None
+    # 截止到年底，今天之后的交易日也在内
+    return ts_manager.get_trade_dates(TUSHARE_TRADE_DAYS, end_date=f"{datetime.now().year}1231") or None
+
+
+def _fetch_sina() -> Optional[list]:
+    import akshare as ak
+    from .run_cache import memo_call
+
+    df = memo_call('tool_trade_date_hist_sina', ak.tool_trade_date_hist_sina)
+    if df is None or df.empty or 'trade_date' not in df.columns:
+        return None
+    return df['trade_date'].tolist()
+
+
+def _as_calendar(trade_dates: Iterable) -> np.ndarray:
+    """交易日列表（字符串/日期均可）-> 升序去重的 datetime64[D] 数组"""
+    return np.unique(pd.to_datetime(pd.Series(list(trade_dates)), errors='coerce').dropna().to_numpy().astype('datetime64[D]'))
+
+
+def _load() -> Optional[np.ndarray]:
+    today = datetime.now().strftime('%Y%m%d')
+    cache = get_disk_cache()
+    hit, cached = cache.get('trade_calendar', today, 'parquet')
+    if hit and cached is not None and not cached.empty:
+        return _as_calendar(cached['trade_date'])
+
+    for source, fetch in (('Tushare', _fetch_tushare), ('新浪', _fetch_sina)):
+        try:
+            dates = fetch()
+        except Exception as e:
+            print(f"⚠️ 交易日历获取失败 ({source}): {type(e).__name__}: {e}")
+            continue
+        if dates:
+            calendar = _as_calendar(dates)
+            cache.put('trade_calendar', today, pd.DataFrame({'trade_date': pd.to_datetime(calendar)}), 'parquet')
+            return calendar
+    return None
+
+
+def get_trade_calendar() -> Optional[np.ndarray]:
+    """全部已知交易日（升序 datetime64[D]），数据源都不可用时返回 None"""
+    global _calendar, _failed_at
+    with _lock:
+        if _calendar is not None:
+            return _calendar
+        if _failed_at is not None and time.monotonic() - _failed_at < RETRY_SECONDS:
+            return None
+        _calendar = _load()
+        _failed_at = None if _calendar is not None else time.monotonic()
+        return _calendar
+
+
+def is_trade_day(day, trade_dates: Iterable = None) -> bool:
+    """
+    day 是否为A股交易日
+
+    trade_dates 缺省时用 get_trade_calendar()；日历不可用或 day 超出日历范围时按周末判断。
+    """
+    calendar = get_trade_calendar() if trade_dates is None else _as_calendar(trade_dates)
+    day = pd.Timestamp(day).date()
+    if calendar is None or len(calendar) == 0:
+        return day.weekday() < 5
+    value = np.datetime64(day, 'D')
+    if value < calendar[0] or value > calendar[-1]:
+        return day.weekday() < 5
+    i = np.searchsorted(calendar, value)
+    return bool(calendar[i] == value)
@@ -162,10 +162,12 @@ class TushareManager:
             print(f"❌ Tushare get_stock_list failed: {e}")
             return None
 
-    def get_daily_data(self, code: str, days: int = 300) -> Optional[pd.DataFrame]:
+    def get_daily_data(self, code: str, days: int = 300, start_date: str = None) -> Optional[pd.DataFrame]:
         """
         Get daily data for a specific stock
         Returns DataFrame with columns: [date, open, high, low, close, volume]
+
+        start_date (YYYYMMDD): only fetch bars from this date on (incremental tail fetch)
         """
         if not self.is_ready:
             return None
@@ -173,7 +175,8 @@ class TushareManager:
         try:
             ts_code = self._to_ts_code(code)
             end_date = datetime.now().strftime("%Y%m%d")
-            start_date = (datetime.now() - timedelta(days=days*2)).strftime("%Y%m%d") # *2 to ensure enough trading days
+            if start_date is None:
+                start_date = (datetime.now() - timedelta(days=days*2)).strftime("%Y%m%d") # *2 to ensure enough trading days
 
             import tushare as ts
             # Use pro_bar for adjusted price (qfq)
@@ -210,3 +213,160 @@ class TushareManager:
         except Exception as e:
             print(f"❌ Tushare get_daily_data failed for {code}: {e}")
             return None
+
+    def get_raw_daily_data(self, code: str, days: int = 300, start_date: str = None) -> Optional[pd.DataFrame]:
+        """
+        Get unadjusted daily data plus adjustment factors for a specific stock
+        Returns DataFrame with columns: [date, open, high, low, close, volume, adj_factor]
+        """
+        if not self.is_ready:
+            return None
+
+        try:
+            ts_code = self._to_ts_code(code)
+            end_date = datetime.now().strftime("%Y%m%d")
+            if start_date is None:
+                start_date = (datetime.now() - timedelta(days=days*2)).strftime("%Y%m%d")
+
+            df = self.api.daily(ts_code=ts_code, start_date=start_date, end_date=end_date)
+            if df is None or df.empty:
+                return None
+            factors = self.api.adj_factor(ts_code=ts_code, start_date=start_date, end_date=end_date)
+
+            df = df.rename(columns={'trade_date': 'date', 'vol': 'volume'})
+            if factors is not None and not factors.empty:
+                df = df.merge(factors.rename(columns={'trade_date': 'date'})[['date', 'adj_factor']], on='date', how='left')
+            else:
+                df['adj_factor'] = 1.0
+
+            df = df[['date', 'open', 'high', 'low', 'close', 'volume', 'adj_factor']]
+            df['date'] = pd.to_datetime(df['date'])
+            df = df.sort_values('date').reset_index(drop=True)
+            if len(df) > days:
+                df = df.tail(days).reset_index(drop=True)
+            return df
+
+        except Exception as e:
+            print(f"❌ Tushare get_raw_daily_data failed for {code}: {e}")
+            return None
+
+    # ------------------------------------------------------------------
+    # Bulk mode: one call per trade date for the whole market
+    # ------------------------------------------------------------------
+
+    def get_trade_dates(self, count: int, end_date: str = None) -> List[str]:
+        """
+        Get the last `count` open trade dates (YYYYMMDD, ascending) up to end_date
+        """
+        if not self.is_ready:
+            return []
+
+        end_date = end_date or datetime.now().strftime("%Y%m%d")
+        start_date = (datetime.strptime(end_date, "%Y%m%d") - timedelta(days=count * 2 + 30)).strftime("%Y%m%d")
+        try:
+            cal = self.api.trade_cal(exchange='SSE', start_date=start_date, end_date=end_date, is_open='1')
+            if cal is None or cal.empty:
+                return []
+            dates = sorted(cal['cal_date'].astype(str).tolist())
+            return dates[-count:]
+        except Exception as e:
+            print(f"❌ Tushare trade_cal failed: {e}")
+            return []
+
+    def get_daily_by_date(self, trade_date: str) -> Optional[pd.DataFrame]:
+        """
+        Unadjusted daily bars of every stock on one trade date (single API call)
+        Returns DataFrame with columns: [code, date, open, high, low, close, volume, prev_close]
+        """
+        if not self.is_ready:
+            return None
+
+        try:
+            df = self.api.daily(trade_date=trade_date)
+            if df is None or df.empty:
+                return None
+            df = df.rename(columns={'trade_date': 'date', 'vol': 'volume', 'pre_close': 'prev_close'})
+            df['code'] = df['ts_code'].map(self._to_plain_code)
+            df['date'] = pd.to_datetime(df['date'])
+            return df[['code', 'date', 'open', 'high', 'low', 'close', 'volume', 'prev_close']]
+        except Exception as e:
+            print(f"❌ Tushare daily failed for {trade_date}: {e}")
+            return None
+
+    def get_adj_factor_by_date(self, trade_date: str) -> Optional[pd.DataFrame]:
+        """
+        Adjustment factors of every stock on one trade date (single API call)
+        Returns DataFrame with columns: [code, date, adj_factor]
+        """
+        if not self.is_ready:
+            return None
+
+        try:
+            df = self.api.adj_factor(trade_date=trade_date)
+            if df is None or df.empty:
+                return None
+            df = df.rename(columns={'trade_date': 'date'})
+            df['code'] = df['ts_code'].map(self._to_plain_code)
+            df['date'] = pd.to_datetime(df['date'])
+            return df[['code', 'date', 'adj_factor']]
+        except Exception as e:
+            print(f"❌ Tushare adj_factor failed for {trade_date}: {e}")
+            return None
+
+    def get_bulk_daily_data(self, days: int = 300, end_date: str = None, adjust: Optional[str] = 'qfq') -> Dict[str, pd.DataFrame]:
+        """
+        Whole-market history for the last `days` trade dates, 2 API calls per date
+        (daily + adj_factor) instead of one pro_bar call per stock.
+
+        adjust='qfq': computed locally the same way pro_bar does it
+        (price * adj_factor / latest adj_factor, rounded to 2 decimals)
+        adjust=None: unadjusted prices plus the adj_factor column (for the local history store)
+
+        Returns {code: DataFrame[date, open, high, low, close, volume(, adj_factor)]}
+        """
+        if not self.is_ready:
+            return {}
+
+        from tqdm import tqdm
+
+        trade_dates = self.get_trade_dates(days, end_date)
+        bars, factors = [], []
+        for trade_date in tqdm(trade_dates, desc="Tushare 按日批量拉取"):
+            daily = self.get_daily_by_date(trade_date)
+            adj = self.get_adj_factor_by_date(trade_date)
+            if daily is None:
+                continue
+            bars.append(daily)
+            if adj is not None:
+                factors.append(adj)
+
+        if not bars:
+            return {}
+
+        panel = pd.concat(bars, ignore_index=True)
+        if factors:
+            panel = panel.merge(pd.concat(factors, ignore_index=True), on=['code', 'date'], how='left')
+        else:
+            panel['adj_factor'] = 1.0
+        return self.to_frames(panel, adjust)
+
+    @staticmethod
+    def to_frames(panel: pd.DataFrame, adjust: Optional[str] = 'qfq') -> Dict[str, pd.DataFrame]:
+        """
+        Split a long [code, date, OHLCV, adj_factor] table into per-symbol frames
+        """
+        panel = panel.sort_values(['code', 'date'])
+        panel['adj_factor'] = panel.groupby('code')['adj_factor'].transform(lambda s: s.ffill().bfill()).fillna(1.0)
+        columns = ['date', 'open', 'high', 'low', 'close', 'volume']
+        if adjust == 'qfq':
+            latest = panel.groupby('code')['adj_factor'].transform('last')
+            ratio = panel['adj_factor'] / latest
+            for col in ['open', 'high', 'low', 'close']:
+                panel[col] = (panel[col] * ratio).round(2)
+        else:
+            columns.append('adj_factor')
+
+        frames = {}
+        for code, df in panel.groupby('code', sort=False):
+            frames[code] = df[columns].reset_index(drop=True)
+        return frames
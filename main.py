@@ -38,13 +38,19 @@ def run_fish_basin(args):
     from modules.fish_basin import generate_combined_prompt
     import pandas as pd
     
+    timeframe = getattr(args, 'timeframe', 'D')
+
     # 1. Indices (In-Memory)
     print("--- Part A: Indices ---")
-    df_index = fish_basin.run(args.date_dir, save_excel=True)
+    df_index = fish_basin.run(args.date_dir, save_excel=True, timeframe=timeframe)
 
     # 2. Sectors (In-Memory)
     print("\n--- Part B: Sectors ---")
-    df_sector = fish_basin_sectors.run(args.date_dir, save_excel=True)
+    df_sector = fish_basin_sectors.run(args.date_dir, save_excel=True, timeframe=timeframe)
+
+    # Weekly/monthly views are standalone Excel files; the merged sheet and prompt stay daily
+    if timeframe != 'D':
+        return True
     
     # 3. Save Merged Excel (Index and Sector together in ONE sheet)
     if not df_index.empty or not df_sector.empty:
@@ -67,7 +73,22 @@ def run_b1_selection(args):
     print("\n=== [Module 2] B1 Stock Selection & AI Analysis ===")
     from modules.stock_selection import b1_selection
     force = getattr(args, 'force', False)
-    return b1_selection.run(args.date_dir, force=force)
+    timeframe = getattr(args, 'timeframe', 'D')
+    if timeframe != 'D':
+        return b1_selection.run_timeframe_selection(args.date_dir, timeframe=timeframe, profile=getattr(args, 'profile', False))
+    return b1_selection.run(args.date_dir, force=force, profile=getattr(args, 'profile', False))
+
+def run_b1_intraday(args):
+    print("\n=== [Module 2] B1 Intraday Re-screen ===")
+    from modules.stock_selection import b1_selection
+    return b1_selection.run_intraday_loop(args.date_dir, interval_minutes=args.interval, profile=args.profile,
+                                          timeframe=args.timeframe)
+
+def run_b1_backtest(args):
+    print("\n=== [Module 2] B1 Signal Backtest ===")
+    from common import backtest
+    return backtest.run(years=args.years, horizons=args.horizons, processes=args.processes, timeframe=args.timeframe,
+                        backfill=args.backfill)
 
 def run_sector_flow(args):
     print("\n=== [Module 3] Sector Funds Flow ===")
@@ -246,6 +267,14 @@ def cleanup_old_results(keep_days=7):
     
     if len(date_dirs) > keep_days:
         to_remove = date_dirs[keep_days:]
+        # 删除前把还没归档的全量扫描补进 results/archive（common/scan_archive.py）
+        try:
+            from common.scan_archive import backfill_archive
+            archived = backfill_archive(results_base)
+            if archived:
+                print(f"\n📦 Archived {len(archived)} scan(s) before cleanup")
+        except Exception as e:
+            print(f"⚠️ Scan archive backfill failed: {e}")
         print(f"\n🧹 Cleaning up old results (Keeping last {keep_days} days)...")
         for d in to_remove:
             path = os.path.join(results_base, d)
@@ -267,8 +296,21 @@ def main():
     
     # Subcommands
     subparsers.add_parser('all', parents=[parent_parser], help='Run all modules in parallel')
-    subparsers.add_parser('fish_basin', parents=[parent_parser], help='Run Fish Basin Analysis')
-    subparsers.add_parser('b1', parents=[parent_parser], help='Run B1 Stock Selection')
+    fish_basin_parser = subparsers.add_parser('fish_basin', parents=[parent_parser], help='Run Fish Basin Analysis')
+    fish_basin_parser.add_argument('--timeframe', type=str.upper, choices=['D', 'W', 'M'], default='D', help='Bar timeframe: D (daily), W (weekly), M (monthly), derived from daily bars')
+    b1_parser = subparsers.add_parser('b1', parents=[parent_parser], help='Run B1 Stock Selection')
+    b1_parser.add_argument('--profile', action='store_true', help='Write per-condition timing/hit-count report beside selected_*.json')
+    b1_parser.add_argument('--timeframe', type=str.upper, choices=['D', 'W', 'M'], default='D', help='Screen on weekly/monthly bars derived from the local daily store (no AI analysis)')
+    b1_intraday_parser = subparsers.add_parser('b1_intraday', parents=[parent_parser], help='Re-screen B1 intraday from local history + live snapshot')
+    b1_intraday_parser.add_argument('--interval', type=int, default=0, help='Repeat every N minutes until market close (default: run once)')
+    b1_intraday_parser.add_argument('--profile', action='store_true', help='Write per-condition timing/hit-count report beside the intraday results')
+    b1_intraday_parser.add_argument('--timeframe', type=str.upper, choices=['D', 'W', 'M'], default='D', help='Re-screen on weekly/monthly bars (current period includes today)')
+    b1_backtest_parser = subparsers.add_parser('b1_backtest', parents=[parent_parser], help='Backtest B1 signals over the local history store')
+    b1_backtest_parser.add_argument('--years', type=float, default=5, help='Evaluate signals of the last N years (default: 5)')
+    b1_backtest_parser.add_argument('--horizons', type=int, nargs='+', default=[1, 3, 5, 10, 20], help='Holding periods in bars')
+    b1_backtest_parser.add_argument('--processes', type=int, default=None, help='Worker processes (default: CPU count)')
+    b1_backtest_parser.add_argument('--timeframe', type=str.upper, choices=['D', 'W', 'M'], default='D', help='Backtest on daily/weekly/monthly bars (horizons count bars of this timeframe)')
+    b1_backtest_parser.add_argument('--backfill', action='store_true', help='Fetch missing history first so the store covers --years (needs network)')
     subparsers.add_parser('sector_flow', parents=[parent_parser], help='Run Sector Flow')
     subparsers.add_parser('ladder', parents=[parent_parser], help='Run Market Ladder')
     subparsers.add_parser('core_news', parents=[parent_parser], help='Run Core News Monitor')
@@ -297,6 +339,10 @@ def main():
         run_fish_basin(args)
     elif args.command == 'b1':
         run_b1_selection(args)
+    elif args.command == 'b1_intraday':
+        run_b1_intraday(args)
+    elif args.command == 'b1_backtest':
+        run_b1_backtest(args)
     elif args.command == 'sector_flow':
         run_sector_flow(args)
     elif args.command == 'ladder':
@@ -320,5 +366,9 @@ def main():
     else:
         parser.print_help()
 
+    # 运行内接口缓存命中统计（重复请求的上游数据）
+    from common.run_cache import get_run_cache
+    get_run_cache().report()
+
 if __name__ == "__main__":
     main()
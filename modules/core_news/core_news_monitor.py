@@ -11,12 +11,12 @@ import json
 from datetime import datetime, timedelta
 import os
 import re
-import time
 import sys
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from common.image_generator import generate_image_from_text
+from common.run_cache import memoize
 
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -77,6 +77,7 @@ def generate_podcast_text(news_list, is_weekly=False):
 """
     return text
 
+@memoize('fetch_eastmoney_data')
 def fetch_eastmoney_data(target_window_hours=24):
     """Fetch 7x24 news from EastMoney until target window covered"""
     base_url = "https://newsapi.eastmoney.com/kuaixun/v1/getlist_102_ajaxResult_50_{}_.html"
@@ -123,8 +124,6 @@ def fetch_eastmoney_data(target_window_hours=24):
         except Exception as e:
             print(f"Error: {e}")
             break
-            
-        time.sleep(0.1)
         
     return all_data
 
@@ -4,6 +4,10 @@ import numpy as np
 from datetime import datetime
 import time
 import os
+
+from common.resample import TIMEFRAMES, check_timeframe, resample_bars, timeframe_suffix
+from common.run_cache import memoize
+
 try:
     from modules.fish_basin.fish_basin_helper import save_to_excel
 except ImportError:
@@ -64,6 +68,7 @@ def get_a_share_spot(code):
         return row.iloc[0]
     return None
 
+@memoize('fish_basin.fetch_data')  # 指数日线同时被趋势模型、市场情绪、收盘速报使用
 def fetch_data(name, code):
     """
     Fetch data for a given symbol.
@@ -256,7 +261,135 @@ def fetch_data(name, code):
         return None
     return None
 
-def get_fish_basin_analysis(symbols_map):
+def fish_basin_status(df, name, code, timeframe='D'):
+    """
+    鱼盆模型核心计算（指数与题材共用）：K线 -> 一行状态
+    (大哥黄线/趋势白线、偏离率、金叉/死叉持续天数、状态变化时间与区间涨幅)
+
+    timeframe 为 'W'/'M' 时先由日线合成周线/月线 (common/resample.py)，
+    涨幅、天数均按周线/月线的根数计。K线不足以算出大哥黄线（114根）时返回 None。
+    返回行中 _ 开头的字段是未格式化的数值（偏离率/涨幅为小数），供排序与题材排名产物使用。
+    """
+    df = resample_bars(df, timeframe).copy()
+    close = df['close']
+
+    # 大哥黄线: (MA14 + MA28 + MA57 + MA114) / 4
+    df['MA14'] = close.rolling(window=14).mean()
+    df['MA28'] = close.rolling(window=28).mean()
+    df['MA57'] = close.rolling(window=57).mean()
+    df['MA114'] = close.rolling(window=114).mean()
+    df['大哥黄线'] = (df['MA14'] + df['MA28'] + df['MA57'] + df['MA114']) / 4
+
+    # 趋势白线: EMA(EMA(C,10),10)
+    ema10 = close.ewm(span=10, adjust=False).mean()
+    df['趋势白线'] = ema10.ewm(span=10, adjust=False).mean()
+
+    # Volume Ratio (Vol / MA5_Vol)
+    if 'volume' in df.columns:
+        vol_ma5 = df['volume'].rolling(window=5).mean()
+        df['vol_ratio'] = df['volume'] / vol_ma5
+    else:
+        df['vol_ratio'] = np.nan
+
+    df_valid = df.dropna(subset=['大哥黄线']).copy()
+    if df_valid.empty:
+        return None
+
+    last_row = df_valid.iloc[-1]
+    current_price = last_row['close']
+    dage_yellow_current = last_row['大哥黄线']
+    white_line_current = last_row['趋势白线']
+    vol_ratio = last_row.get('vol_ratio', 0)
+
+    # Status
+    status_str = "YES" if current_price >= dage_yellow_current else "NO"
+
+    # Deviation
+    deviation = (current_price - dage_yellow_current) / dage_yellow_current
+
+    # Signal Date (Backtrack for price crossing yellow line)
+    price_arr = df['close'].values
+    indicator_arr = df['大哥黄线'].values
+    white_arr = df['趋势白线'].values
+    dates_arr = df['date'].values
+
+    idx = len(df) - 1
+    curr_state = (price_arr[idx] >= indicator_arr[idx])
+
+    signal_idx = -1
+    for i in range(idx - 1, 114, -1):  # 大哥黄线需要114天数据
+        if pd.isna(indicator_arr[i]): break
+        state_i = (price_arr[i] >= indicator_arr[i])
+        if state_i != curr_state:
+            signal_idx = i + 1
+            break
+
+    interval_change = 0.0
+    change_date_str = "-"
+    if signal_idx != -1:
+        # Safe date conversion
+        try:
+            ts = (dates_arr[signal_idx] - np.datetime64('1970-01-01T00:00:00Z')) / np.timedelta64(1, 's')
+            change_date_str = datetime.utcfromtimestamp(ts).strftime("%y.%m.%d")
+        except: pass
+        base_price = price_arr[signal_idx]
+        interval_change = (current_price - base_price) / base_price
+
+    # 计算金叉/死叉持续天数 (白线vs黄线)
+    golden_cross_days = 0 
+    death_cross_days = 0
+
+    current_is_golden = white_arr[idx] > indicator_arr[idx]
+
+    for i in range(idx, 114, -1):
+        if pd.isna(white_arr[i]) or pd.isna(indicator_arr[i]): break
+        is_golden = white_arr[i] > indicator_arr[i]
+        if is_golden == current_is_golden:
+            if current_is_golden:
+                golden_cross_days += 1
+            else:
+                death_cross_days += 1
+        else:
+            break
+
+    if current_is_golden:
+        death_cross_days = 0
+    else:
+        golden_cross_days = 0
+
+    # Daily Change
+    prev_close = df.iloc[-2]['close'] if len(df) >= 2 else current_price
+    daily_change = (current_price - prev_close) / prev_close
+
+    # 白线偏离率
+    white_deviation = (current_price - white_line_current) / white_line_current
+
+    # Vol Ratio Format
+    vr_str = f"{vol_ratio:.2f}" if pd.notna(vol_ratio) else "-"
+
+    return {
+        "代码": code,
+        "名称": name,
+        "状态": status_str,
+        "涨幅%": f"{daily_change*100:+.2f}%",
+        "现价": int(current_price) if current_price > 5 else f"{current_price:.2f}",
+        "黄线": int(dage_yellow_current),
+        "白线": int(white_line_current) if white_line_current > 5 else f"{white_line_current:.2f}",
+        "黄线偏离率": f"{deviation*100:.2f}%",
+        "白线偏离率": f"{white_deviation*100:.2f}%",
+        "量比": vr_str,
+        "金叉天数": golden_cross_days if golden_cross_days > 0 else "-",
+        "死叉天数": death_cross_days if death_cross_days > 0 else "-",
+        "状态变量时间": change_date_str,
+        "区间涨幅%": f"{interval_change*100:.2f}%",
+        "_deviation_raw": deviation,
+        "_white_deviation_raw": white_deviation,
+        "_change_raw": daily_change,
+        "_interval_change_raw": interval_change,
+    }
+
+
+def get_fish_basin_analysis(symbols_map, timeframe='D'):
     results = []
     failed_items = list(symbols_map.items()) # Start with all
     max_retries = 2
@@ -289,123 +422,12 @@ def get_fish_basin_analysis(symbols_map):
                     failed_items.append((name, code))
                     continue
                     
-                close = df['close']
-                
-                # 2. Indicators
-                # 大哥黄线: (MA14 + MA28 + MA57 + MA114) / 4
-                df['MA14'] = close.rolling(window=14).mean()
-                df['MA28'] = close.rolling(window=28).mean()
-                df['MA57'] = close.rolling(window=57).mean()
-                df['MA114'] = close.rolling(window=114).mean()
-                df['大哥黄线'] = (df['MA14'] + df['MA28'] + df['MA57'] + df['MA114']) / 4
-                
-                # 趋势白线: EMA(EMA(C,10),10)
-                ema10 = close.ewm(span=10, adjust=False).mean()
-                df['趋势白线'] = ema10.ewm(span=10, adjust=False).mean()
-                
-                # Volume Ratio (Vol / MA5_Vol)
-                if 'volume' in df.columns:
-                    vol_ma5 = df['volume'].rolling(window=5).mean()
-                    df['vol_ratio'] = df['volume'] / vol_ma5
-                else:
-                    df['vol_ratio'] = np.nan
-
-                df_valid = df.dropna(subset=['大哥黄线']).copy()
-                if df_valid.empty: 
-                    # Data too short?
+                row = fish_basin_status(df, name, code, timeframe)
+                if row is None:
+                    # Data too short? Not a fetch fail, just data issue. Don't retry.
                     print(f"⚠️ Data too short for {name}")
-                    continue # Not a fetch fail, just data issue. Don't retry.
-                
-                last_row = df_valid.iloc[-1]
-                current_date = last_row['date']
-                current_price = last_row['close']
-                dage_yellow_current = last_row['大哥黄线']
-                white_line_current = last_row['趋势白线']
-                vol_ratio = last_row.get('vol_ratio', 0)
-                
-                # Status
-                status_str = "YES" if current_price >= dage_yellow_current else "NO"
-                
-                # Deviation
-                deviation = (current_price - dage_yellow_current) / dage_yellow_current
-                
-                # Signal Date (Backtrack for price crossing yellow line)
-                price_arr = df['close'].values
-                indicator_arr = df['大哥黄线'].values
-                white_arr = df['趋势白线'].values
-                dates_arr = df['date'].values
-                
-                idx = len(df) - 1
-                curr_state = (price_arr[idx] >= indicator_arr[idx])
-                
-                signal_idx = -1
-                for i in range(idx - 1, 114, -1):  # 大哥黄线需要114天数据
-                    if pd.isna(indicator_arr[i]): break
-                    state_i = (price_arr[i] >= indicator_arr[i])
-                    if state_i != curr_state:
-                        signal_idx = i + 1
-                        break
-                
-                interval_change = 0.0
-                change_date_str = "-"
-                if signal_idx != -1:
-                    # Safe date conversion
-                    try:
-                        ts = (dates_arr[signal_idx] - np.datetime64('1970-01-01T00:00:00Z')) / np.timedelta64(1, 's')
-                        change_date_str = datetime.utcfromtimestamp(ts).strftime("%y.%m.%d")
-                    except: pass
-                    base_price = price_arr[signal_idx]
-                    interval_change = (current_price - base_price) / base_price
-
-                # 计算金叉/死叉持续天数 (白线vs黄线)
-                golden_cross_days = 0 
-                death_cross_days = 0
-                
-                current_is_golden = white_arr[idx] > indicator_arr[idx]
-                
-                for i in range(idx, 114, -1):
-                    if pd.isna(white_arr[i]) or pd.isna(indicator_arr[i]): break
-                    is_golden = white_arr[i] > indicator_arr[i]
-                    if is_golden == current_is_golden:
-                        if current_is_golden:
-                            golden_cross_days += 1
-                        else:
-                            death_cross_days += 1
-                    else:
-                        break
-                
-                if current_is_golden:
-                    death_cross_days = 0
-                else:
-                    golden_cross_days = 0
-
-                # Daily Change
-                prev_close = df.iloc[-2]['close'] if len(df) >= 2 else current_price
-                daily_change = (current_price - prev_close) / prev_close
-                
-                # 白线偏离率
-                white_deviation = (current_price - white_line_current) / white_line_current
-                
-                # Vol Ratio Format
-                vr_str = f"{vol_ratio:.2f}" if pd.notna(vol_ratio) else "-"
-                
-                results.append({
-                    "代码": code,
-                    "名称": name,
-                    "状态": status_str,
-                    "涨幅%": f"{daily_change*100:+.2f}%",
-                    "现价": int(current_price) if current_price > 5 else f"{current_price:.2f}",
-                    "黄线": int(dage_yellow_current),
-                    "白线": int(white_line_current) if white_line_current > 5 else f"{white_line_current:.2f}",
-                    "黄线偏离率": f"{deviation*100:.2f}%",
-                    "白线偏离率": f"{white_deviation*100:.2f}%",
-                    "量比": vr_str,
-                    "金叉天数": golden_cross_days if golden_cross_days > 0 else "-",
-                    "死叉天数": death_cross_days if death_cross_days > 0 else "-",
-                    "状态变量时间": change_date_str,
-                    "区间涨幅%": f"{interval_change*100:.2f}%",
-                    "_deviation_raw": deviation
-                })
+                    continue
+                results.append(row)
                 
                 print(f"✅ {name} Done.")
                 
@@ -431,7 +453,9 @@ def get_fish_basin_analysis(symbols_map):
     # Sort results by deviation descending
     results.sort(key=lambda x: x.get('_deviation_raw', -999), reverse=True)
     
-    return pd.DataFrame(results).drop(columns=['_deviation_raw'], errors='ignore')
+    df = pd.DataFrame(results)
+    # 下划线开头的是未格式化的原始数值（排序/题材排名产物用），不进Excel
+    return df.drop(columns=[c for c in df.columns if c.startswith('_')])
 
 # Export Default Targets for external use
 DEFAULT_TARGETS = {
@@ -455,15 +479,18 @@ DEFAULT_TARGETS = {
     "上证指数": "sh000001" 
 }
 
-def run(date_dir=None, save_excel=True):
+def run(date_dir=None, save_excel=True, timeframe='D'):
     """
     Main entry point for Fish Basin Index Analysis.
+    timeframe: 'D' / 'W' / 'M'，周线/月线由日线合成，结果文件名带 _周线/_月线 后缀
     Returns the DataFrame.
     """
-    print("\n=== 鱼盆趋势模型v2.0 (Fish Basin Model) ===")
+    timeframe = check_timeframe(timeframe)
+    suffix = timeframe_suffix(timeframe)
+    print(f"\n=== 鱼盆趋势模型v2.0 (Fish Basin Model) {TIMEFRAMES[timeframe]} ===")
     print(f"Date: {datetime.now().strftime('%Y.%m.%d')}")
     
-    df = get_fish_basin_analysis(DEFAULT_TARGETS)
+    df = get_fish_basin_analysis(DEFAULT_TARGETS, timeframe)
     
     if not df.empty:
         curr_date = datetime.now().strftime('%Y%m%d')
@@ -479,10 +506,10 @@ def run(date_dir=None, save_excel=True):
                 
                 # Check Merged first, then Individual
                 merged_prev = f"results/{prev_date}/趋势模型_合并.xlsx"
-                old_prev = f"results/{prev_date}/趋势模型_指数.xlsx"
+                old_prev = f"results/{prev_date}/趋势模型_指数{suffix}.xlsx"
                 prev_df = None
                 
-                if os.path.exists(merged_prev):
+                if not suffix and os.path.exists(merged_prev):
                     try: prev_df = pd.read_excel(merged_prev, sheet_name='指数')
                     except: pass
                 
@@ -510,9 +537,9 @@ def run(date_dir=None, save_excel=True):
         # Save Excel only if requested
         if save_excel:
             if date_dir:
-                 output_path = os.path.join(date_dir, "趋势模型_指数.xlsx")
+                 output_path = os.path.join(date_dir, f"趋势模型_指数{suffix}.xlsx")
             else:
-                 output_path = f"results/{curr_date}/趋势模型_指数.xlsx"
+                 output_path = f"results/{curr_date}/趋势模型_指数{suffix}.xlsx"
             save_to_excel(df, output_path)
 
         # Console Output (Preserved)
@@ -3,14 +3,40 @@
 
 import akshare as ak
 import pandas as pd
-import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 import time
 import os
-import concurrent.futures
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from common.fetch_pool import FetchPool
+from common.resample import TIMEFRAMES, daily_bars_needed, timeframe_suffix
+from common.sector_ranking import build_sector_ranking, save_sector_ranking
+from modules.fish_basin.fish_basin import fish_basin_status
 
 # Config is now loaded from config/fish_basin_sectors.json
 
+# 日线题材K线的起始日期（够看状态变化）
+DEFAULT_START_DATE = "20240101"
+# 鱼盆大哥黄线最长的均线：周线/月线合成后至少要有这么多根K线
+YELLOW_LINE_BARS = 114
+# 交易日 -> 自然日的换算（一年约243个交易日）
+CALENDAR_DAYS_PER_TRADE_DAY = 1.5
+
+
+def history_start_date(timeframe='D', now=None):
+    """
+    题材K线的起始日期（YYYYMMDD）
+
+    日线取 DEFAULT_START_DATE；周线/月线按合成出 YELLOW_LINE_BARS 根所需的日线往前推
+    （月线约11年），否则 MA114 算不出来、每个题材都没有状态。
+    """
+    now = now or datetime.now()
+    days = daily_bars_needed(YELLOW_LINE_BARS, timeframe) * CALENDAR_DAYS_PER_TRADE_DAY
+    start = (now - timedelta(days=int(days))).strftime('%Y%m%d')
+    return min(start, DEFAULT_START_DATE)
+
+
 def fetch_data_router(item):
     """
     Route fetching based on item type.
@@ -21,7 +47,7 @@ def fetch_data_router(item):
     
     df = None
     turnover = 0
-    start_date = "20240101" # Extended history to capture status change
+    start_date = item.get('start_date', DEFAULT_START_DATE)  # 周线/月线需要更长的历史 (history_start_date)
     
     try:
         # 1. THS Industry
@@ -512,11 +538,13 @@ def patch_today_spot(df, name, spot_map):
 
 
 
-def run(date_dir=None, save_excel=True):
+def run(date_dir=None, save_excel=True, timeframe='D'):
     """
     Main entry point for Fish Basin Sector Analysis.
+    timeframe: 'D' / 'W' / 'M'，周线/月线由日线合成，结果文件名带 _周线/_月线 后缀
     Returns the DataFrame.
     """
+    suffix = timeframe_suffix(timeframe)
     print("=== Fish Basin Sector Analysis (Configured List) ===")
     
     # 1. Load Config
@@ -531,8 +559,9 @@ def run(date_dir=None, save_excel=True):
     for item in items:
         unique_map[item['name']] = item
     
-    final_list = list(unique_map.values())
-    print(f"Total items to process from config: {len(final_list)}")
+    start_date = history_start_date(timeframe)
+    final_list = [{**item, 'start_date': start_date} for item in unique_map.values()]
+    print(f"Total items to process from config: {len(final_list)} (history from {start_date})")
 
     # 3. Fetch Data (logic moved below to support better tracking)
 
@@ -546,21 +575,19 @@ def run(date_dir=None, save_excel=True):
     processed_results = []
     successful_config_names = set()
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor: # Reduced to 1 to avoid libmini_racer crash
-        futures = {executor.submit(fetch_data_router, item): item for item in final_list}
-        
-        for future in concurrent.futures.as_completed(futures):
-            item = futures[future]
-            try:
-                name, code, df, turnover, original_name = future.result()
-                if df is not None and not df.empty:
-                    processed_results.append({
-                        'name': name, 'code': code, 'df': df, 'turnover': turnover, 'original_name': original_name
-                    })
-                    successful_config_names.add(item['name']) # Track by CONFIG name
-                # else: logic handles as missing implicitly
-            except Exception as e:
-                print(f"❌ Initial fetch failed for {item['name']}: {e}")
+    # 多进程抓取：每个 worker 独立的 mini_racer 运行时，崩溃的 worker 自动重启并重排任务
+    with FetchPool() as pool:
+        for item, result in pool.imap_unordered(fetch_data_router, final_list):
+            if result is None:
+                print(f"❌ Initial fetch failed for {item['name']}")
+                continue
+            name, code, df, turnover, original_name = result
+            if df is not None and not df.empty:
+                processed_results.append({
+                    'name': name, 'code': code, 'df': df, 'turnover': turnover, 'original_name': original_name
+                })
+                successful_config_names.add(item['name']) # Track by CONFIG name
+            # else: logic handles as missing implicitly
 
     missing_items = [item for item in final_list if item['name'] not in successful_config_names]
     
@@ -619,6 +646,7 @@ def run(date_dir=None, save_excel=True):
     print(f"Spot Data Loaded: {len(spot_map)} sectors")
 
     results = []
+    short = []
     for item in final_results_list:
         name = item['name']
         code = item['code']
@@ -633,105 +661,19 @@ def run(date_dir=None, save_excel=True):
         if df is None or df.empty:
             continue
 
-        # Fish Basin Logic
-        close = df['close']
-        
-        df['MA14'] = close.rolling(window=14).mean()
-        df['MA28'] = close.rolling(window=28).mean()
-        df['MA57'] = close.rolling(window=57).mean()
-        df['MA114'] = close.rolling(window=114).mean()
-        df['大哥黄线'] = (df['MA14'] + df['MA28'] + df['MA57'] + df['MA114']) / 4
-        
-        ema10 = close.ewm(span=10, adjust=False).mean()
-        df['趋势白线'] = ema10.ewm(span=10, adjust=False).mean()
-        
-        if 'volume' in df.columns:
-            vol_ma5 = df['volume'].rolling(window=5).mean()
-            df['vol_ratio'] = df['volume'] / vol_ma5
-        else:
-            df['vol_ratio'] = np.nan
-            
-        df_valid = df.dropna(subset=['大哥黄线']).copy()
-        if df_valid.empty: continue
-        
-        last_row = df_valid.iloc[-1]
-        current_price = last_row['close']
-        dage_yellow_current = last_row['大哥黄线']
-        white_line_current = last_row['趋势白线']
-        vol_ratio = last_row.get('vol_ratio', 0)
-        
-        status_str = "YES" if current_price >= dage_yellow_current else "NO"
-        deviation = (current_price - dage_yellow_current) / dage_yellow_current
-        white_deviation = (current_price - white_line_current) / white_line_current
-        
-        # Backtrack
-        price_arr = df['close'].values
-        yellow_arr = df['大哥黄线'].values
-        white_arr = df['趋势白线'].values
-        dates_arr = df['date'].values
-        
-        idx = len(df) - 1
-        curr_state = (price_arr[idx] >= yellow_arr[idx])
-        
-        signal_idx = -1
-        min_idx = min(114, len(df) - 1)
-        for i in range(idx - 1, min_idx, -1):
-            if i < 0: break
-            if pd.isna(yellow_arr[i]): break
-            state_i = (price_arr[i] >= yellow_arr[i])
-            if state_i != curr_state:
-                signal_idx = i + 1
-                break
-                
-        interval_change = 0.0
-        change_date_str = "-"
-        
-        if signal_idx != -1:
-            try:
-                ts = (dates_arr[signal_idx] - np.datetime64('1970-01-01T00:00:00Z')) / np.timedelta64(1, 's')
-                change_date_str = datetime.utcfromtimestamp(ts).strftime("%y.%m.%d")
-                base_price = price_arr[signal_idx]
-                interval_change = (current_price - base_price) / base_price
-            except: pass
-
-        golden_cross_days = 0 
-        death_cross_days = 0
-        current_is_golden = white_arr[idx] > yellow_arr[idx]
-        for i in range(idx, min_idx, -1):
-            if i < 0: break
-            if pd.isna(white_arr[i]) or pd.isna(yellow_arr[i]): break
-            is_golden = white_arr[i] > yellow_arr[i]
-            if is_golden == current_is_golden:
-                if current_is_golden: golden_cross_days += 1
-                else: death_cross_days += 1
-            else: break
-        if current_is_golden: death_cross_days = 0
-        else: golden_cross_days = 0
-
-        daily_change = 0.0
-        if len(df_valid) >= 2:
-            prev_row = df_valid.iloc[-2]
-            daily_change = (current_price - prev_row['close']) / prev_row['close']
-        
-        vr_str = f"{vol_ratio:.2f}" if pd.notna(vol_ratio) else "-"
-
-        results.append({
-            "代码": code,
-            "名称": name,
-            "状态": status_str,
-            "涨幅%": f"{daily_change*100:+.2f}%",
-            "现价": int(current_price) if current_price > 5 else f"{current_price:.2f}",
-            "黄线": int(dage_yellow_current),
-            "白线": int(white_line_current) if white_line_current > 5 else f"{white_line_current:.2f}",
-            "黄线偏离率": f"{deviation*100:.2f}%",
-            "白线偏离率": f"{white_deviation*100:.2f}%",
-            "量比": vr_str,
-            "金叉天数": golden_cross_days if golden_cross_days > 0 else "-",
-            "死叉天数": death_cross_days if death_cross_days > 0 else "-",
-            "状态变量时间": change_date_str,
-            "区间涨幅%": f"{interval_change*100:.2f}%",
-            "_deviation_raw": deviation
-        })
+        # Fish Basin Logic（与指数共用同一个核心计算）
+        row = fish_basin_status(df, name, code, timeframe)
+        if row is None:
+            short.append(name)
+            continue
+        results.append(row)
+
+    if short:
+        print(f"⚠️ {len(short)} 个题材K线不足{YELLOW_LINE_BARS}根{TIMEFRAMES[timeframe]}，算不出大哥黄线，已跳过: "
+              f"{', '.join(short)}")
+    if not results and short:
+        print(f"❌ 没有题材满{YELLOW_LINE_BARS}根{TIMEFRAMES[timeframe]}，不写题材表和题材排名")
+        return pd.DataFrame()
 
     results.sort(key=lambda x: x['_deviation_raw'], reverse=True)
 
@@ -745,7 +687,7 @@ def run(date_dir=None, save_excel=True):
                 prev_date = (today - timedelta(days=days_back)).strftime('%Y%m%d')
                 
                 # Check Individual file FIRST (More reliable for same-type comparison)
-                old_prev = f"results/{prev_date}/趋势模型_题材.xlsx"
+                old_prev = f"results/{prev_date}/趋势模型_题材{suffix}.xlsx"
                 merged_prev = f"results/{prev_date}/趋势模型_合并.xlsx"
                 prev_df = None
 
@@ -755,7 +697,7 @@ def run(date_dir=None, save_excel=True):
                         # print(f"Comparing ranks with previous file: {old_prev}")
                     except: pass
 
-                if prev_df is None and os.path.exists(merged_prev):
+                if prev_df is None and not suffix and os.path.exists(merged_prev):
                     try:
                         prev_df = pd.read_excel(merged_prev, sheet_name='题材')
                     except:
@@ -782,17 +724,22 @@ def run(date_dir=None, save_excel=True):
         except Exception as e:
             print(f"排名变化计算失败: {e}")
         
+        # 题材排名产物：B1 选股直接读取（common/sector_ranking.py），先于Excel和提示词落盘
+        curr_date = datetime.now().strftime('%Y%m%d')
+        output_dir = date_dir or f"results/{curr_date}"
+        try:
+            ranking = build_sector_ranking(results, df_res['排名变化'].tolist())
+            print(f"Saving sector ranking to {save_sector_ranking(ranking, output_dir, timeframe)}")
+        except Exception as e:
+            print(f"⚠️ 题材排名产物保存失败: {e}")
+
         cols = ["代码", "名称", "状态", "涨幅%", "现价", "黄线", "白线", "黄线偏离率", "白线偏离率", "金叉天数", "死叉天数", "量比", "状态变量时间", "区间涨幅%", "排名变化"]
         df_res = df_res[[c for c in cols if c in df_res.columns]]
         print("\n=== Result Head (Sorted by Deviation) ===")
         print(df_res.head(10).to_string())
         
-        curr_date = datetime.now().strftime('%Y%m%d')
         if save_excel:
-            if date_dir:
-                 output_path = os.path.join(date_dir, "趋势模型_题材.xlsx")
-            else:
-                 output_path = f"results/{curr_date}/趋势模型_题材.xlsx"
+            output_path = os.path.join(output_dir, f"趋势模型_题材{suffix}.xlsx")
                  
             print(f"Saving to {output_path}...")
             save_to_excel_colored(df_res, output_path)
@@ -8,6 +8,8 @@ from datetime import datetime, timedelta
 import os
 import platform
 
+from common.run_cache import memo_call
+
 # --- Configuration ---
 plt.style.use('default')
 
@@ -41,7 +43,7 @@ def get_trading_date(date_str, offset=0):
     """
     # Try to fetch recent trade dates
     try:
-        df = ak.tool_trade_date_hist_sina()
+        df = memo_call('tool_trade_date_hist_sina', ak.tool_trade_date_hist_sina)
         df['trade_date'] = pd.to_datetime(df['trade_date']).dt.strftime('%Y%m%d')
         dates = df['trade_date'].tolist()
         
@@ -68,7 +70,8 @@ def get_limit_up_data(date_str):
     
     for i in range(3):
         try:
-            df_zt = ak.stock_zt_pool_em(date=date_str)
+            # 涨停池同时被连板天梯和市场情绪使用，走运行内缓存
+            df_zt = memo_call('stock_zt_pool_em', ak.stock_zt_pool_em, date=date_str)
             if df_zt is not None and not df_zt.empty:
                 # Validate columns
                 if all(col in df_zt.columns for col in cols_needed):
@@ -93,7 +96,7 @@ def get_limit_up_data(date_str):
     # 2. Today's Fried Board (Zha Ban)
     # Use EastMoney Source: stock_zt_pool_zbgc_em
     try:
-        df_fried = ak.stock_zt_pool_zbgc_em(date=date_str)
+        df_fried = memo_call('stock_zt_pool_zbgc_em', ak.stock_zt_pool_zbgc_em, date=date_str)
         if df_fried is not None and not df_fried.empty:
             df_fried = df_fried[['代码', '名称', '首次封板时间', '所属行业', '涨停统计']]
     except Exception as e:
@@ -104,7 +107,7 @@ def get_limit_up_data(date_str):
     prev_date = get_trading_date(date_str, -1)
     print(f"Fetching previous day data ({prev_date})...")
     try:
-        df_prev = ak.stock_zt_pool_em(date=prev_date)
+        df_prev = memo_call('stock_zt_pool_em', ak.stock_zt_pool_em, date=prev_date)
         if df_prev is not None and not df_prev.empty:
             df_prev = df_prev[['代码', '名称', '连板数', '所属行业']]
     except:
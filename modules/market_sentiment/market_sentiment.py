@@ -20,6 +20,7 @@ from modules.market_ladder.limit_up_ladder import get_limit_up_data
 from modules.core_news.core_news_monitor import fetch_eastmoney_data
 from modules.market_sentiment.generate_sentiment_prompt import get_raw_image_prompt, generate_image_prompt
 from common.image_generator import generate_image_from_text
+from common.run_cache import memoize
 
 
 def get_limit_down_count(date_str: str = None) -> int:
@@ -137,6 +138,7 @@ def get_market_volume_sina() -> float:
         return 0.0
 
 
+@memoize('get_market_volume', cache_if=lambda data: data['today_volume'] > 0)
 def get_market_volume(date_str: str = None) -> Dict[str, float]:
     """
     Get market turnover volume for today and yesterday.
@@ -9,6 +9,24 @@ import platform
 import requests
 from datetime import datetime
 
+from common.sector_tagger import KeywordMatcher
+
+# 噪声板块名称（指数成分、资金属性、风格类，不是题材），编译成自动机一次扫描
+_NOISE_KEYWORDS = [
+    "同花顺", "板块", "概念", "成分", "持股", "股通", "基金", "昨日", "人民币",
+    "融资", "融券", "B股", "ST", "转债", "高股息", "破净", "百元", "核心",
+    "龙头", "茅", "大盘", "中字头", "AH", "REITs", "ETF", "标准", "普尔", "MSCI"
+]
+# 东方财富 / DataAPI
+_EM_NOISE = KeywordMatcher(_NOISE_KEYWORDS)
+# 同花顺：概念资金流本身就是概念板块，不按"概念"过滤；另外去掉"含H股"
+_THS_NOISE = KeywordMatcher([keyword for keyword in _NOISE_KEYWORDS if keyword != "概念"] + ["含H股"])
+
+
+def _drop_noise(df, name_col, matcher):
+    """去掉名称命中噪声关键词的板块"""
+    return df[~df[name_col].map(lambda name: matcher.search(str(name)))]
+
 # Configure Chinese Font
 def get_chinese_font():
     system = platform.system()
@@ -178,13 +196,8 @@ def get_sector_flow(sector_type='行业资金流'):
                     df_ths['net_flow_billion'] = pd.to_numeric(df_ths['net_flow_billion'], errors='coerce')
 
                     # --- Filtering Noise (THS Concept) ---
-                    exclude_keywords = [
-                        "同花顺", "板块", "成分", "持股", "股通", "基金", "昨日", "人民币",
-                        "融资", "融券", "B股", "ST", "转债", "高股息", "破净", "百元", "核心",
-                        "龙头", "茅", "大盘", "中字头", "AH", "REITs", "ETF", "标准", "普尔", "MSCI", "含H股"
-                    ]
                     if '名称' in df_ths.columns:
-                         df_ths = df_ths[~df_ths['名称'].apply(lambda x: any(k in str(x) for k in exclude_keywords))]
+                        df_ths = _drop_noise(df_ths, '名称', _THS_NOISE)
 
                     top_inflow = df_ths.sort_values(by='net_flow_billion', ascending=False).head(10)
                     top_outflow = df_ths.sort_values(by='net_flow_billion', ascending=True).head(10)
@@ -203,13 +216,8 @@ def get_sector_flow(sector_type='行业资金流'):
                     df_ths['net_flow_billion'] = pd.to_numeric(df_ths['net_flow'], errors='coerce')
 
                     # --- Filtering Noise (THS Industry) ---
-                    exclude_keywords = [
-                        "同花顺", "板块", "成分", "持股", "股通", "基金", "昨日", "人民币",
-                        "融资", "融券", "B股", "ST", "转债", "高股息", "破净", "百元", "核心",
-                        "龙头", "茅", "大盘", "中字头", "AH", "REITs", "ETF", "标准", "普尔", "MSCI", "含H股"
-                    ]
                     if '名称' in df_ths.columns:
-                         df_ths = df_ths[~df_ths['名称'].apply(lambda x: any(k in str(x) for k in exclude_keywords))]
+                        df_ths = _drop_noise(df_ths, '名称', _THS_NOISE)
 
                     # Ensure we have both Inflow and Outflow
                     top_inflow = df_ths.sort_values(by='net_flow_billion', ascending=False).head(10)
@@ -248,14 +256,7 @@ def get_sector_flow(sector_type='行业资金流'):
                 return None
 
             # --- Filtering Noise / Garbage Names ---
-            exclude_keywords = [
-                "同花顺", "板块", "概念", "成分", "持股", "股通", "基金", "昨日", "人民币",
-                "融资", "融券", "B股", "ST", "转债", "高股息", "破净", "百元", "核心",
-                "龙头", "茅", "大盘", "中字头", "AH", "REITs", "ETF", "标准", "普尔", "MSCI"
-            ]
-            df_dataapi = df_dataapi[
-                ~df_dataapi["名称"].apply(lambda x: any(k in str(x) for k in exclude_keywords))
-            ]
+            df_dataapi = _drop_noise(df_dataapi, "名称", _EM_NOISE)
             top_inflow = df_dataapi.sort_values(by='net_flow_billion', ascending=False).head(10)
             top_outflow = df_dataapi.sort_values(by='net_flow_billion', ascending=True).head(10)
             return top_inflow, top_outflow, '名称', 'net_flow_billion'
@@ -290,14 +291,7 @@ def get_sector_flow(sector_type='行业资金流'):
         df_em['net_flow_billion'] = pd.to_numeric(df_em[target_col], errors='coerce') / 100000000
 
         # --- Filtering Noise / Garbage Names ---
-        exclude_keywords = [
-            "同花顺", "板块", "概念", "成分", "持股", "股通", "基金", "昨日", "人民币",
-            "融资", "融券", "B股", "ST", "转债", "高股息", "破净", "百元", "核心",
-            "龙头", "茅", "大盘", "中字头", "AH", "REITs", "ETF", "标准", "普尔", "MSCI"
-        ]
-
-        # If we have name_col, filter
-        df_em = df_em[~df_em[name_col].apply(lambda x: any(k in str(x) for k in exclude_keywords))]
+        df_em = _drop_noise(df_em, name_col, _EM_NOISE)
 
         # 排序
         top_inflow = df_em.sort_values(by='net_flow_billion', ascending=False).head(10)
@@ -7,17 +7,16 @@
 import sys
 import os
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
 import requests
 import base64
 import time
-import random
 import numpy as np
+import pandas as pd
 from tqdm import tqdm
 
 # 导入配置和Prompt模块
-from common.config import MAX_WORKERS, MIN_MARKET_CAP
+from common.config import FETCH_PROCESSES, MIN_MARKET_CAP, PIPELINE_QUEUE_SIZE, SCAN_BATCH_SIZE
 from common.prompts import (
     NumpyEncoder, 
     get_analysis_prompt, 
@@ -27,8 +26,23 @@ from common.prompts import (
 # 导入数据获取和信号检测模块
 
 # 导入数据获取和信号检测模块
-from common.data_fetcher import get_all_stock_list, get_stock_data
+from common.data_fetcher import (
+    get_all_stock_list, get_stock_data, ingest_spot_snapshot, backfill_history_store, deepen_history_store,
+    get_intraday_snapshot
+)
+from common.history_store import get_history_store, adjust_bars, append_live_bar, MARKET_CLOSE_TIME
+from common.resample import (
+    TIMEFRAMES, check_timeframe, daily_bars_needed, resample_bars, timeframe_suffix, update_resampled
+)
 from common.signals import check_stock_signal
+from common.panel_signals import PanelSignals
+from common.signal_profile import SignalProfile
+from common.fetch_pool import FetchPool
+from common.sector_tagger import get_sector_tagger
+from common.scan_archive import archive_scan
+from common.scan_results import ScanResults
+from common.sector_ranking import join_hot_sectors, load_sector_ranking, ranking_path, top_sectors
+from common.stage_pipeline import StagePipeline
 # Import new LLM client
 from common.llm_client import chat_completion
 
@@ -39,164 +53,460 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 def get_hot_sectors_from_fish_basin(date_dir: str, top_n: int = 5):
     """
-    从趋势模型Prompt文件中提取Top N热门题材
+    从鱼盆模型的题材排名产物（趋势模型_题材.parquet，见 common/sector_ranking.py）取Top N热门题材
     
     Args:
-        date_dir: 日期目录（例如：results/20260204）
+        date_dir: 日期目录（例如：results/20260204），当天没有时往前找最近一天的排名
         top_n: 获取前N个题材，默认5
     
     Returns:
         题材列表，例如：['贵金属', '有色金属', '光伏设备', '石油加工贸易', '半导体']
-        如果提取失败返回空列表
+        没有排名产物时返回空列表
     """
-    import re
-    from datetime import datetime, timedelta
-    
-    # 尝试读取今天的趋势模型Prompt文件
-    prompt_file = os.path.join(date_dir, "AI提示词", "趋势模型_合并_Prompt.txt")
-    
-    # Fallback: 如果今天的文件不存在，尝试昨天的
-    if not os.path.exists(prompt_file):
-        print(f"⚠️ 今日趋势模型文件不存在: {prompt_file}")
-        # 尝试昨天
-        yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y%m%d")
-        prompt_file = os.path.join("results", yesterday, "AI提示词", "趋势模型_合并_Prompt.txt")
-        if not os.path.exists(prompt_file):
-            print(f"❌ 昨日趋势模型文件也不存在: {prompt_file}")
-            return []
-        else:
-            print(f"✅ 使用昨日趋势模型文件: {prompt_file}")
-    
-    try:
-        with open(prompt_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 查找 "SECTION 2: 热门题材趋势" 部分
-        section_match = re.search(r'SECTION 2:.*?热门题材.*?\*\*Data\*\*:(.*?)---', content, re.DOTALL)
-        if not section_match:
-            print("❌ 未找到热门题材数据段")
-            return []
-        
-        data_section = section_match.group(1)
-        
-        # 提取题材名称：格式为 "1. ● 贵金属 | 涨跌:..."
-        # 正则匹配：数字. ○/● 题材名称 |
-        pattern = r'\d+\.\s*[●○]\s*([^\s|]+)\s*\|'
-        matches = re.findall(pattern, data_section)
-        
-        if not matches:
-            print("❌ 未能提取题材名称")
-            return []
-        
-        # 取前top_n个
-        hot_sectors = matches[:top_n]
-        print(f"📊 提取到Top{top_n}热门题材: {hot_sectors}")
-        return hot_sectors
-        
-    except Exception as e:
-        print(f"❌ 提取热门题材失败: {e}")
+    hot_sectors = top_sectors(load_sector_ranking(date_dir), top_n)
+    if not hot_sectors:
+        print(f"❌ 未找到题材排名: {ranking_path(date_dir)}")
         return []
+    print(f"📊 提取到Top{top_n}热门题材: {hot_sectors}")
+    return hot_sectors
 
 
 def match_stock_sector(stock_info: dict, hot_sectors: list) -> bool:
     """
-    判断股票是否属于热门题材
+    判断股票是否属于热门题材（题材名及其别名见 common/sector_tagger.SECTOR_ALIASES）
     
     Args:
         stock_info: 股票信息字典（需包含'industry'或'sector'字段）
         hot_sectors: 热门题材列表
     
     Returns:
-        是否匹配任一热门题材
+        是否匹配任一热门题材（需要命中的题材集合时用 get_sector_tagger(hot_sectors).tag）
     """
     if not hot_sectors:
         return False
+    return bool(get_sector_tagger(hot_sectors).tag(stock_info))
+
+
+def build_stock_record(args, df, result):
+    """把信号结果整理成选股记录（与 all_stocks_*.jsonl 每行格式一致）"""
+    code, name, market_cap, industry = args
+    # 获取最后一行原始数据
+    last_row = df.iloc[-1].to_dict()
+    last_row['date'] = str(last_row['date'])[:10]
     
-    # 获取股票的行业/题材信息
-    industry = stock_info.get('industry', '')
-    sector = stock_info.get('sector', '')
-    combined = f"{industry} {sector}".lower()
-    
-    # 题材映射表：Fish Basin题材名 -> 可能的行业关键词
-    sector_mapping = {
-        '贵金属': ['黄金', '白银', '贵金属'],
-        '有色金属': ['有色', '铝', '铜', '锌', '镍', '钴', '锂'],
-        '光伏设备': ['光伏', '太阳能', '逆变器', '硅片'],
-        '石油加工贸易': ['石油', '石化', '化工', '炼化'],
-        '半导体': ['半导体', '芯片', '集成电路', 'IC', '晶圆'],
-        '商业航天': ['航天', '卫星', '火箭', '航空航天'],
-        '保险': ['保险', '寿险', '财险'],
-        '稀土': ['稀土', '钕铁硼', '永磁'],
-        '通信设备': ['通信', '5G', '光通信', '网络设备'],
-        '细分化工': ['化工', '化学', '精细化工'],
-        '电网设备': ['电网', '电力设备', '特高压', '变压器'],
-        '煤炭': ['煤炭', '煤矿', '焦煤'],
-        '房地产': ['房地产', '地产', '物业'],
-        '风电设备': ['风电', '风能', '风机'],
-        '电力': ['电力', '发电', '火电', '水电'],
-        '养殖': ['养殖', '猪', '鸡', '禽'],
-        '医疗服务': ['医疗', '医院', '诊断'],
-        '新能源': ['新能源', '电池', '储能', '锂电'],
-        '人工智能': ['人工智能', 'AI', '算力', '芯片', '云计算'],
-        '旅游': ['旅游', '酒店', '景区'],
+    return {
+        'code': code,
+        'name': name,
+        'market_cap': float(market_cap),
+        'industry': industry if str(industry).lower() != 'nan' else None,  # 题材/行业
+        'signal': bool(result.get('signal', False)),
+        'signals': result.get('signals', []),
+        'K': float(result.get('K', 0)),
+        'D': float(result.get('D', 0)),
+        'J': float(result.get('J', 0)),
+        'RSI': float(result.get('RSI', 0)),
+        'near_amplitude': float(result.get('近期振幅', 0)),
+        'far_amplitude': float(result.get('远期振幅', 0)),
+        'raw_data_mock': last_row
     }
-    
-    # 匹配逻辑
-    for hot_sector in hot_sectors:
-        # 直接匹配
-        if hot_sector.lower() in combined:
-            return True
-        
-        # 通过映射表匹配
-        if hot_sector in sector_mapping:
-            keywords = sector_mapping[hot_sector]
-            for keyword in keywords:
-                if keyword.lower() in combined:
-                    return True
-    
-    return False
 
 
-def process_single_stock(args):
-    """处理单只股票"""
-    code, name, market_cap, industry = args
-    # Add random delay to prevent request bursts (Anti-Scraping / Flow Control)
-    time.sleep(random.uniform(0.1, 0.2))
+# 跑B1信号至少需要的K线根数（日线/周线/月线都按本周期的根数计）
+MIN_BARS = 120
+
+
+def evaluate_stock(args, df, profile=None):
+    """对一只股票的前复权K线跑B1信号，返回结果记录（不足120根K线返回 None）"""
+    code = args[0]
     try:
-        df = get_stock_data(code, 300)
-        if df is None or len(df) < 120:
+        if df is None or len(df) < MIN_BARS:
             return None
         
-        result = check_stock_signal(df, code)
-        
-        # 获取最后一行原始数据
-        last_row = df.iloc[-1].to_dict()
-        last_row['date'] = str(last_row['date'])[:10]
-        
-        return {
-            'code': code,
-            'name': name,
-            'market_cap': float(market_cap),
-            'industry': industry if str(industry).lower() != 'nan' else None,  # 题材/行业
-            'signal': bool(result.get('signal', False)),
-            'signals': result.get('signals', []),
-            'K': float(result.get('K', 0)),
-            'D': float(result.get('D', 0)),
-            'J': float(result.get('J', 0)),
-            'RSI': float(result.get('RSI', 0)),
-            'near_amplitude': float(result.get('近期振幅', 0)),
-            'far_amplitude': float(result.get('远期振幅', 0)),
-            'raw_data_mock': last_row
-        }
+        result = check_stock_signal(df, code, last_bar_only=True, profile=profile)
+        return build_stock_record(args, df, result)
     except Exception as e:
         return None
 
 
-def run_full_selection(force=False):
+def evaluate_stocks(batch, profile=None):
+    """
+    批量版 evaluate_stock: 全市场拼成面板一次跑完B1信号（common/panel_signals）
+
+    Args:
+        batch: [(args, df), ...]
+        profile: SignalProfile，按需记录各条件的耗时与命中
+
+    Returns:
+        与 batch 顺序一致的结果记录列表（不足120根K线的为 None）
+    """
+    eligible = {args[0]: (args, df) for args, df in batch if df is not None and len(df) >= MIN_BARS}
+    try:
+        latest = PanelSignals({code: df for code, (_, df) in eligible.items()}, profile=profile).get_latest_signals()
+    except Exception as e:
+        print(f"⚠️ 面板计算失败，改为逐只计算: {e}")
+        return [evaluate_stock(args, df, profile) for args, df in batch]
+
+    records = []
+    for args, df in batch:
+        if args[0] not in eligible:
+            records.append(None)
+            continue
+        try:
+            records.append(build_stock_record(args, df, latest[args[0]]))
+        except Exception:
+            records.append(None)
+    return records
+
+
+# 信号剖析开关（进程级；全量选股时由 FetchPool 的 initializer 在各 worker 进程中打开）
+_PROFILE_SIGNALS = False
+# 剖析模式下单只结果记录中附带的剖析数据，汇总后从记录中移除，不写入 all_stocks_*.jsonl
+PROFILE_KEY = '_signal_profile'
+
+
+def set_signal_profiling(enabled):
+    global _PROFILE_SIGNALS
+    _PROFILE_SIGNALS = bool(enabled)
+
+
+def fetch_stock(args):
+    """抓取单只股票的前复权K线：返回 (args, df)，失败返回 None"""
+    # 限流由 common/rate_limiter 按数据源统一处理，这里不再固定 sleep
+    try:
+        return args, get_stock_data(args[0], 300)
+    except Exception:
+        return None
+
+
+def score_stock(item):
+    """(args, df) -> 结果记录，剖析模式下附带剖析数据"""
+    if item is None:
+        return None
+    args, df = item
+    if not _PROFILE_SIGNALS:
+        return evaluate_stock(args, df)
+    profile = SignalProfile()
+    result = evaluate_stock(args, df, profile)
+    if result is not None:
+        result[PROFILE_KEY] = profile.to_dict()
+    return result
+
+
+def process_single_stock(args):
+    """处理单只股票（抓取 + 信号，串行重试时使用）"""
+    return score_stock(fetch_stock(args))
+
+
+def scan_chunk(chunk):
+    """
+    全量选股的一个 worker 任务（在 FetchPool worker 进程中执行）：
+    逐只读取K线后拼成面板，一次跑完这一批的B1信号 (evaluate_stocks)，不再逐只构造 StockSignals
+
+    Returns:
+        (与 chunk 顺序一致的结果记录列表（失败/K线不足为 None）, 剖析数据 dict 或 None)
+    """
+    batch = [fetched or (args, None) for args, fetched in zip(chunk, map(fetch_stock, chunk))]
+    profile = SignalProfile() if _PROFILE_SIGNALS else None
+    records = evaluate_stocks(batch, profile)
+    return records, profile.to_dict() if profile is not None else None
+
+
+def take_profile(result, profile):
+    """把单只结果附带的剖析数据并入 profile（并从记录中移除）"""
+    part = result.pop(PROFILE_KEY, None)
+    if part is not None and profile is not None:
+        profile.merge(part)
+
+
+def serialize_result(result, profile=None):
+    """流水线序列化阶段：并入剖析数据后转成 all_stocks_*.jsonl 的一行，返回 (result, line)"""
+    take_profile(result, profile)
+    return result, json.dumps(result, cls=NumpyEncoder, ensure_ascii=False) + '\n'
+
+
+def scan_pipeline(pool, pending_args, profile=None, batch_size=SCAN_BATCH_SIZE):
+    """
+    全量选股流水线：抓取 + 指标/信号在 FetchPool 的 worker 进程中按批完成（scan_chunk，
+    CPU 计算随进程数扩展，只把结果记录传回主进程），序列化在主进程的线程中进行，与 worker 的计算重叠
+
+    迭代产出 (result, line)；source_count 为已处理的股票数（含失败/K线不足的）
+    """
+    chunks = [pending_args[i:i + batch_size] for i in range(0, len(pending_args), batch_size)]
+
+    def scored():
+        for chunk, output in pool.imap_unordered(scan_chunk, chunks):
+            # worker 重试后仍崩溃的整批记为失败，交给逐只串行重试
+            records, part = output if output is not None else ([None] * len(chunk), None)
+            if part is not None and profile is not None:
+                profile.merge(part)
+            yield from records
+
+    pipeline = StagePipeline(scored(), source_name='抓取+信号', maxsize=PIPELINE_QUEUE_SIZE)
+    pipeline.add_stage('序列化', lambda result: serialize_result(result, profile))
+    return pipeline
+
+
+# ============ 盘中快速重筛 ============
+
+# 本地原始K线（截至上一交易日），进程内常驻，循环重筛时只读一次仓库
+_INTRADAY_HISTORY = {}
+# 盘中周线/月线 {(代码, 周期): (前复权基准因子, 合成的K线)}，每轮只重算当前（未走完的）周期
+_INTRADAY_RESAMPLED = {}
+
+
+def _intraday_resampled(code, merged, adjusted, timeframe):
+    """盘中周线/月线：复权因子没变时只重算当前周期，除权除息（前复权价格整体变化）时整段重新合成"""
+    key = (code, timeframe)
+    factor = float(merged['adj_factor'].iloc[-1])
+    cached = _INTRADAY_RESAMPLED.get(key)
+    if cached is not None and cached[0] == factor:
+        bars = update_resampled(cached[1], adjusted, timeframe)
+    else:
+        bars = resample_bars(adjusted, timeframe)
+    _INTRADAY_RESAMPLED[key] = (factor, bars)
+    return bars
+
+
+def run_intraday_selection(date_dir=None, profile=False, timeframe='D'):
+    """
+    盘中重筛：本地仓库历史 + 一张全市场实时快照拼成今日K线，全市场重跑B1信号
+
+    不逐只请求网络（只有快照一次请求），适合午盘每15分钟跑一次。
+    本地没有历史或K线对不上（缺K线）的股票跳过，收盘后的全量选股会补齐。
+    profile=True 时在结果旁边写 intraday_signal_profile_*.json（各条件耗时/命中/淘汰数）。
+    timeframe='W'/'M' 时在周线/月线上重筛（当前周期含今日实时K线），结果文件名带 _周线/_月线 后缀；
+    盘中不补历史，合成后不足 MIN_BARS 根的股票跳过并警告（先收盘后跑一次 b1 --timeframe 补足本地仓库）。
+    没有可评估的股票（全部K线不足）时不写结果文件。
+
+    Returns:
+        (selected, timestamp)
+    """
+    start_time = time.time()
+    now = datetime.now()
+    today_date = now.strftime('%Y%m%d')
+    date_dir = date_dir or os.path.join("results", today_date)
+    os.makedirs(date_dir, exist_ok=True)
+
+    timeframe = check_timeframe(timeframe)
+    suffix = timeframe_suffix(timeframe)
+    print(f"\n⚡ B1 盘中重筛{suffix.replace('_', ' ')} {now.strftime('%H:%M:%S')}")
+    stock_list = get_all_stock_list(min_market_cap=MIN_MARKET_CAP, exclude_st=True)
+    snapshot = get_intraday_snapshot()
+    if snapshot is None or snapshot.empty or len(stock_list) == 0:
+        print("❌ 无法获取实时快照或股票列表")
+        return [], ""
+
+    live = snapshot.drop_duplicates('code').set_index('code')
+    store = get_history_store()
+    trade_date = pd.Timestamp(now.date())
+
+    selected = []
+    batch = []
+    stats = {'evaluated': 0, 'no_history': 0, 'no_quote': 0, 'gap': 0, 'short': 0}
+    for _, row in stock_list.iterrows():
+        args = (row['code'], row['name'], row['market_cap'], row.get('industry', ''))
+        code = args[0]
+        if code not in _INTRADAY_HISTORY:
+            _INTRADAY_HISTORY[code] = store.load(code)
+        raw = _INTRADAY_HISTORY[code]
+        if raw is None or raw.empty:
+            stats['no_history'] += 1
+            continue
+        if code not in live.index:
+            stats['no_quote'] += 1
+            continue
+        bar = live.loc[code]
+        # 停牌或尚未成交
+        if not (bar['close'] > 0 and bar['volume'] > 0):
+            stats['no_quote'] += 1
+            continue
+
+        merged = append_live_bar(raw, bar, trade_date)
+        if merged is None:
+            stats['gap'] += 1
+            continue
+        bars = adjust_bars(merged, 'qfq')
+        if timeframe != 'D':
+            bars = _intraday_resampled(code, merged, bars, timeframe)
+        if len(bars) < MIN_BARS:
+            stats['short'] += 1
+            continue
+        batch.append((args, bars.tail(300).reset_index(drop=True)))
+
+    # 全市场一次性跑信号，替代逐只构造 StockSignals
+    signal_profile = SignalProfile() if profile else None
+    for result in evaluate_stocks(batch, signal_profile):
+        if result is None:
+            continue
+        stats['evaluated'] += 1
+        if result['signal']:
+            selected.append(result)
+
+    if timeframe != 'D' and stats['short']:
+        print(f"⚠️ {stats['short']} 只股票本地日线合成后不足{MIN_BARS}根{TIMEFRAMES[timeframe]}，已跳过；"
+              f"盘中不补历史，先在收盘后运行 python main.py b1 --timeframe {timeframe} 补足本地仓库")
+    if not stats['evaluated'] and stats['short']:
+        print(f"❌ 没有可评估的股票（K线不足{MIN_BARS}根），不写结果文件")
+        return [], ""
+
+    timestamp = now.strftime('%Y%m%d_%H%M%S')
+    selected_file = os.path.join(date_dir, f"intraday_selected{suffix}_{timestamp}.json")
+    with open(selected_file, 'w', encoding='utf-8') as f:
+        json.dump(selected, f, cls=NumpyEncoder, ensure_ascii=False, indent=2)
+
+    print(f"✅ 盘中重筛完成: 评估 {stats['evaluated']} 只 | 入选 {len(selected)} 只 | "
+          f"无本地历史 {stats['no_history']} | 无报价/停牌 {stats['no_quote']} | K线缺口 {stats['gap']} | "
+          f"K线不足 {stats['short']} | "
+          f"耗时 {time.time() - start_time:.1f}s")
+    print(f"📁 盘中选股结果: {selected_file}")
+    if signal_profile is not None:
+        profile_file = os.path.join(date_dir, f"intraday_signal_profile{suffix}_{timestamp}.json")
+        signal_profile.save(profile_file)
+        print(f"📁 信号剖析: {profile_file}")
+    return selected, timestamp
+
+
+def run_intraday_loop(date_dir=None, interval_minutes=15, profile=False, timeframe='D'):
+    """按固定间隔循环盘中重筛，收盘后退出；interval_minutes <= 0 只跑一轮"""
+    while True:
+        run_intraday_selection(date_dir, profile=profile, timeframe=timeframe)
+        if interval_minutes <= 0:
+            return
+        next_run = time.time() + interval_minutes * 60
+        if datetime.fromtimestamp(next_run).time() >= MARKET_CLOSE_TIME:
+            print("🔔 已到收盘时间，盘中重筛结束")
+            return
+        time.sleep(max(0.0, next_run - time.time()))
+
+
+# ============ 周线/月线选股 ============
+
+def run_timeframe_selection(date_dir=None, timeframe='W', profile=False):
+    """
+    周线/月线B1选股：本地仓库的日线合成周线/月线后全市场跑B1信号
+
+    周线/月线不单独下载，依赖日线选股已把本地仓库更新到最近交易日。
+    日线选股只存约300个交易日（约60根周线、14根月线），不够 MIN_BARS 根：
+    先把本地仓库补足到 daily_bars_needed(MIN_BARS, timeframe) 个交易日（周线600、月线2760，
+    只有首次运行需要网络，见 data_fetcher.deepen_history_store）。
+    本地没有历史或合成后仍不足 MIN_BARS 根的股票跳过并给出警告；一只都评估不了时不写结果文件。不做AI分析。
+    结果写入 selected_周线_*.json / selected_月线_*.json（profile=True 时旁边写 signal_profile_*）。
+
+    Returns:
+        (selected, timestamp)，没有可评估的股票时为 ([], "")
+    """
+    start_time = time.time()
+    now = datetime.now()
+    timeframe = check_timeframe(timeframe)
+    suffix = timeframe_suffix(timeframe)
+    date_dir = date_dir or os.path.join("results", now.strftime('%Y%m%d'))
+    os.makedirs(date_dir, exist_ok=True)
+
+    print(f"\n📅 B1 {TIMEFRAMES[timeframe]}选股（本地日线合成）")
+    stock_list = get_all_stock_list(min_market_cap=MIN_MARKET_CAP, exclude_st=True)
+    store = get_history_store()
+    deepen_history_store(stock_list['code'].tolist(), daily_bars_needed(MIN_BARS, timeframe))
+
+    batch = []
+    missing = short = 0
+    for _, row in stock_list.iterrows():
+        args = (row['code'], row['name'], row['market_cap'], row.get('industry', ''))
+        bars = store.load_adjusted(args[0], 'qfq', timeframe)
+        if bars is None or bars.empty:
+            missing += 1
+            continue
+        if len(bars) < MIN_BARS:
+            short += 1
+            continue
+        batch.append((args, bars.tail(300).reset_index(drop=True)))
+
+    if short:
+        print(f"⚠️ {short} 只股票合成后不足{MIN_BARS}根{TIMEFRAMES[timeframe]}（上市时间短或历史未补足），已跳过")
+    if not batch:
+        print(f"❌ 没有股票满{MIN_BARS}根{TIMEFRAMES[timeframe]}，无法选股，不写结果文件")
+        return [], ""
+
+    signal_profile = SignalProfile() if profile else None
+    results = [result for result in evaluate_stocks(batch, signal_profile) if result is not None]
+    selected = [result for result in results if result['signal']]
+
+    timestamp = now.strftime('%Y%m%d_%H%M%S')
+    selected_file = os.path.join(date_dir, f"selected{suffix}_{timestamp}.json")
+    with open(selected_file, 'w', encoding='utf-8') as f:
+        json.dump(selected, f, cls=NumpyEncoder, ensure_ascii=False, indent=2)
+
+    print(f"✅ {TIMEFRAMES[timeframe]}选股完成: 评估 {len(results)} 只 | 入选 {len(selected)} 只 | "
+          f"无本地历史 {missing} | K线不足 {short} | 耗时 {time.time() - start_time:.1f}s")
+    print(f"📁 选股结果: {selected_file}")
+    if signal_profile is not None:
+        profile_file = os.path.join(date_dir, f"signal_profile{suffix}_{timestamp}.json")
+        signal_profile.save(profile_file)
+        print(f"📁 信号剖析: {profile_file}")
+    return selected, timestamp
+
+
+# ============ 断点续跑 ============
+
+def scan_done_marker(raw_file):
+    """全量扫描完成标记（与 all_stocks_*.jsonl 同名的 .done 文件）"""
+    return raw_file + ".done"
+
+
+def find_resumable_scan(date_dir, today_date):
+    """今日最近一次未完成（没有 .done 标记）的 all_stocks_*.jsonl，没有返回 None"""
+    import glob
+    raw_files = glob.glob(os.path.join(date_dir, f"all_stocks_{today_date}_*.jsonl"))
+    if not raw_files:
+        return None
+    latest_file = max(raw_files)  # 文件名带时间戳，字典序即时间序
+    if os.path.exists(scan_done_marker(latest_file)):
+        return None
+    return latest_file
+
+
+def load_scan_results(raw_file):
+    """
+    读取增量写入的扫描结果
+
+    进程中途被杀时最后一行可能只写了一半：丢弃并把文件截断到最后一个完整行，
+    保证之后追加写入的内容仍是合法 JSONL。
+    """
+    results = []
+    valid_bytes = 0
+    with open(raw_file, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                results.append(json.loads(line))
+            except ValueError:
+                break
+            valid_bytes += len(line)
+    if valid_bytes != os.path.getsize(raw_file):
+        with open(raw_file, 'r+b') as f:
+            f.truncate(valid_bytes)
+    return results
+
+
+def mark_scan_done(raw_file, total_count, success_count):
+    with open(scan_done_marker(raw_file), 'w', encoding='utf-8') as f:
+        json.dump({
+            'total': total_count,
+            'success': success_count,
+            'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }, f, ensure_ascii=False)
+
+
+def run_full_selection(force=False, profile=False):
     """全市场选股
     
+    今日有未完成的扫描（进程中途崩溃）时自动续跑：沿用同一个 all_stocks_*.jsonl，
+    只处理还没有结果的股票；扫描完成后写 .done 标记。
+    
     Args:
-        force: 是否强制重新选股，忽略今日已有结果
+        force: 是否强制重新选股，忽略今日已有结果（也不续跑）
+        profile: 记录各条件的耗时/命中/淘汰数，在 selected_*.json 旁边写 signal_profile_*.json
+                 （续跑时只统计本次运行处理的股票）
     """
     today_date = datetime.now().strftime('%Y%m%d')
     date_dir = os.path.join("results", today_date)
@@ -222,7 +532,7 @@ def run_full_selection(force=False):
 
     print("=" * 70)
     print("  东方财富 - 知行B1选股策略 (AI智能分析版)")
-    print(f"  市值 >= {MIN_MARKET_CAP}亿 | 排除ST | 并发线程: {MAX_WORKERS}")
+    print(f"  市值 >= {MIN_MARKET_CAP}亿 | 排除ST | 抓取进程: {FETCH_PROCESSES}")
     print(f"  执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 70)
     
@@ -242,41 +552,59 @@ def run_full_selection(force=False):
         (row['code'], row['name'], row['market_cap'], row.get('industry', '')) 
         for _, row in stock_list.iterrows()
     ]
+
+    # 本地K线仓库大面积缺失时先批量回填；收盘后再用一张全市场快照追加今日K线，
+    # 后续逐只读取基本不走网络
+    backfill_history_store([args[0] for args in args_list], days=300)
+    ingest_spot_snapshot()
     
     print(f"\n[2/4] 并发分析 {len(args_list)} 只股票的信号...")
     
-    selected = []
-    all_results = []
-    
-    # 保存结果
-    today_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    # 按股票列表预分配的结果表（common/scan_results.py），已有结果的股票即"已处理"
+    results = ScanResults([args[0] for args in args_list])
     
-    # 保存所有原始数据 (Incremental)
-    raw_file = os.path.join(date_dir, f"all_stocks_{today_timestamp}.jsonl")
-    print(f"📁 实时数据将写入: {raw_file}")
+    resume_file = None if force else find_resumable_scan(date_dir, today_date)
+    if resume_file:
+        # 断点续跑：沿用未完成的文件和时间戳，已有结果的股票不再处理
+        raw_file = resume_file
+        today_timestamp = os.path.basename(raw_file)[len("all_stocks_"):-len(".jsonl")]
+        results.extend(load_scan_results(raw_file))
+        print(f"♻️ 续跑未完成的扫描: {raw_file} (已完成 {len(results)}/{len(args_list)})")
+    else:
+        # 保存结果
+        today_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        
+        # 保存所有原始数据 (Incremental)
+        raw_file = os.path.join(date_dir, f"all_stocks_{today_timestamp}.jsonl")
+        print(f"📁 实时数据将写入: {raw_file}")
+
+    pending_args = [args for args in args_list if args[0] not in results]
+    signal_profile = SignalProfile() if profile else None
+    set_signal_profiling(profile)
 
     # Initial Parallel Fetch
-    processed_codes = set()
-    
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(process_single_stock, args): args[0] for args in args_list}
-        
+    # 流水线：抓取 + 指标/信号（多进程，每个任务一批股票拼成面板计算）-> 序列化（主进程线程），
+    # 阶段之间用有界队列连接；
+    # 进度条后缀显示各阶段吞吐与队列深度
+    # 多进程抓取：akshare/mini_racer 崩溃只会带走单个 worker，任务自动重新排队
+    with FetchPool(processes=FETCH_PROCESSES, initializer=set_signal_profiling, initargs=(profile,)) as pool:
         # Open file in append mode for incremental writing
-        with open(raw_file, 'w', encoding='utf-8') as f_out:
-            for future in tqdm(as_completed(futures), total=len(futures), desc="选股进度"):
-                result = future.result()
-                if result is not None:
+        with open(raw_file, 'a', encoding='utf-8') as f_out:
+            pipeline = scan_pipeline(pool, pending_args, signal_profile)
+            with tqdm(total=len(pending_args), desc="选股进度") as bar:
+                for result, line in pipeline:
                     # Incremental Write
-                    f_out.write(json.dumps(result, cls=NumpyEncoder, ensure_ascii=False) + '\n')
+                    f_out.write(line)
                     f_out.flush() # Ensure it flows to disk
-                    
-                    all_results.append(result)
-                    processed_codes.add(result['code'])
-                    if result['signal']:
-                        selected.append(result)
+                    results.add(result)
+                    # 抓取失败/K线不足的股票在流水线中被丢弃，进度按已处理的股票数推进
+                    bar.update(pipeline.source_count - bar.n)
+                    bar.set_postfix_str(pipeline.status(), refresh=False)
+                bar.update(pipeline.source_count - bar.n)
+            print(f"⏱️ 流水线: {pipeline.status()}")
 
     # Retry Logic
-    missing_args = [arg for arg in args_list if arg[0] not in processed_codes]
+    missing_args = [arg for arg in args_list if arg[0] not in results]
     if missing_args:
         print(f"\n🔄 B1 Retry: {len(missing_args)} stocks failed. Retrying sequentially...")
         import time
@@ -290,12 +618,10 @@ def run_full_selection(force=False):
                     result = process_single_stock(args)
                     
                     if result is not None:
+                        take_profile(result, signal_profile)
                         f_out.write(json.dumps(result, cls=NumpyEncoder, ensure_ascii=False) + '\n')
                         f_out.flush()
-                        all_results.append(result)
-                        processed_codes.add(code)
-                        if result['signal']:
-                            selected.append(result)
+                        results.add(result)
                         print(f"   ✅ Retry success: {code}")
                     else:
                         pass # still failed
@@ -306,7 +632,7 @@ def run_full_selection(force=False):
                     print(f"   Retry progress: {i+1}/{len(missing_args)}")
 
     # Summary
-    success_count = len(processed_codes)
+    success_count = len(results)
     total_count = len(args_list)
     fail_count = total_count - success_count
     
@@ -319,7 +645,9 @@ def run_full_selection(force=False):
     # raw_file is already written incrementally
     
     
-    print(f"\n📁 原始数据: {raw_file} ({len(all_results)} 条)")
+    print(f"\n📁 原始数据: {raw_file} ({len(results)} 条)")
+    # 入选股票一次性还原为结果字典（按股票列表顺序）
+    selected = results.records(results.selected())
     
     # 保存选股结果
     selected_file = os.path.join(date_dir, f"selected_{today_timestamp}.json")
@@ -327,6 +655,19 @@ def run_full_selection(force=False):
         json.dump(selected, f, cls=NumpyEncoder, ensure_ascii=False, indent=2)
             
     print(f"📁 选股结果: {selected_file} ({len(selected)} 只)")
+    if signal_profile is not None:
+        profile_file = os.path.join(date_dir, f"signal_profile_{today_timestamp}.json")
+        signal_profile.save(profile_file)
+        print(f"📁 信号剖析: {profile_file}")
+    
+    # 选股结果落盘后再打完成标记，之后的运行不会再续跑这个文件
+    mark_scan_done(raw_file, total_count, success_count)
+
+    # 长期归档（results/archive/all_stocks，按月分区的 Parquet），日期目录7天后会被清理
+    try:
+        print(f"📦 扫描归档: {archive_scan(raw_file)}")
+    except Exception as e:
+        print(f"⚠️ 扫描归档失败: {e}")
     
     return selected, today_timestamp
 
@@ -849,13 +1190,14 @@ def enrich_stocks_from_analysis(selected_stocks, date_dir):
 
 
 
-def run(date_dir=None, force=False):
+def run(date_dir=None, force=False, profile=False):
     """
     Main entry point for Daily Stock Selection & AI Analysis.
     
     Args:
         date_dir: 输出目录
         force: 是否强制重新生成，忽略今日缓存
+        profile: 记录B1各条件的耗时/命中/淘汰数（见 common/signal_profile.py）
     """
     # 1. 全市场选股
     # DEBUG: Mock selection to test downstream
@@ -878,7 +1220,7 @@ def run(date_dir=None, force=False):
     #         'raw_data_mock': {'收盘': 30.0, '换手%': 2.1, 'close': 30.0, 'volume': 500000}
     #     }
     # ]
-    selected, today = run_full_selection(force=force)
+    selected, today = run_full_selection(force=force, profile=profile)
     
     # 确保日期文件夹存在
     date_str = today.split('_')[0]
@@ -902,30 +1244,34 @@ def run(date_dir=None, force=False):
     
     print(f"📊 B1技术筛选结果: {len(selected)} 只股票")
     
-    # 获取Top5热门题材
-    hot_sectors = get_hot_sectors_from_fish_basin(date_dir, top_n=5)
+    # 获取Top5热门题材（鱼盆模型的题材排名产物）
+    ranking = load_sector_ranking(date_dir)
+    hot_sectors = top_sectors(ranking, top_n=5)
     
     if not hot_sectors:
         print("⚠️ 未能获取热门题材，跳过题材过滤，使用全部B1股票")
         filtered_stocks = selected
     else:
         # 按题材过滤逻辑优化：优先选题材，不足则按信号强度补齐
-        hot_stocks = [s for s in selected if match_stock_sector(s, hot_sectors)]
+        # 每只股票命中的排名最靠前的热门题材（未命中为 NaN）
+        matched = join_hot_sectors(selected, ranking, top_n=5)
+        hot = matched['rank'].notna().to_numpy()
+        hot_stocks = [selected[i] for i in np.flatnonzero(hot)]
 
         print(f"\n✅ 题材匹配完成:")
         print(f"   - 热门题材Top5: {', '.join(hot_sectors)}")
         print(f"   - 匹配题材的B1股票: {len(hot_stocks)} 只")
+        sector_counts = matched['name'].value_counts()
+        print(f"   - 各题材命中: {', '.join(f'{sector} {sector_counts.get(sector, 0)}' for sector in hot_sectors)}")
 
         # 补齐逻辑：确保至少有 15-20 只候选股供 AI 筛选 Top 5
         target_pool_size = 20
         if len(hot_stocks) < target_pool_size:
-            # 排除已选中的题材股
-            remaining = [s for s in selected if s not in hot_stocks]
-            # 按 J 值排序（越低代表超卖越严重，信号通常越强）
-            remaining.sort(key=lambda x: x.get('J', 100))
-
-            padding_needed = min(len(remaining), target_pool_size - len(hot_stocks))
-            padding_stocks = remaining[:padding_needed]
+            # 排除已选中的题材股，其余按 J 值升序补齐（越低代表超卖越严重，信号通常越强）
+            remaining = np.flatnonzero(~hot)
+            j_values = np.array([selected[i].get('J', 100) for i in remaining], dtype='float64')
+            padding = remaining[np.argsort(j_values, kind='stable')[:target_pool_size - len(hot_stocks)]]
+            padding_stocks = [selected[i] for i in padding]
 
             filtered_stocks = hot_stocks + padding_stocks
             print(f"   - 信号补齐: 题材股 {len(hot_stocks)} 只 + 强信号补齐 {len(padding_stocks)} 只 = 总计 {len(filtered_stocks)} 只候选")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+B1 全量扫描吞吐对比（本地仓库已是最新，不走网络）
+
+在临时目录里造一个"已更新到最近交易日"的本地K线仓库，用同一个 FetchPool 依次跑:
+  - 逐只任务: worker 里抓取 + 算信号，主线程逐条序列化写文件（流水线之前的做法）
+  - 主进程信号线程: worker 只抓取，K线传回主进程由信号线程计算（d45776a 的流水线）
+  - 当前: b1_selection.scan_pipeline（worker 里按批拼面板算信号）
+每种方式先预热一轮（进程导入、文件缓存），再计时 --rounds 轮取最快的一轮，输出 只/秒。
+
+用法:
+    python scripts/bench_b1_scan.py --stocks 600 --processes 8
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import history_store  # noqa: E402
+from common.fetch_pool import FetchPool  # noqa: E402
+from common.history_store import HistoryStore, expected_last_trade_date  # noqa: E402
+from common.prompts import NumpyEncoder  # noqa: E402
+from common.stage_pipeline import StagePipeline  # noqa: E402
+from modules.stock_selection import b1_selection as b1  # noqa: E402
+
+
+def use_store(root):
+    """FetchPool initializer: worker 进程改用临时仓库"""
+    history_store._default_store = HistoryStore(os.path.join(root, "history"))
+    b1.set_signal_profiling(False)
+
+
+def build_store(root, stocks, bars, seed=7):
+    rng = np.random.default_rng(seed)
+    store = HistoryStore(os.path.join(root, "history"))
+    dates = pd.bdate_range(end=expected_last_trade_date(), periods=bars)
+    args_list = []
+    for k in range(stocks):
+        close = np.round(10 * np.exp(np.cumsum(rng.normal(0.001, 0.025, bars))), 2)
+        open_ = np.round(close * (1 + rng.normal(0, 0.01, bars)), 2)
+        store.save(f"{k:06d}", pd.DataFrame({
+            'date': dates, 'open': open_,
+            'high': np.maximum(open_, close) * 1.01, 'low': np.minimum(open_, close) * 0.99,
+            'close': close, 'volume': rng.uniform(1e5, 1e6, bars), 'adj_factor': 1.0,
+        }), depth=bars)
+        args_list.append((f"{k:06d}", f"股票{k}", 150.0, '银行'))
+    return args_list
+
+
+def per_stock_tasks(pool, args_list, f_out):
+    for _, result in pool.imap_unordered(b1.process_single_stock, args_list):
+        if result is not None:
+            f_out.write(json.dumps(result, cls=NumpyEncoder, ensure_ascii=False) + '\n')
+
+
+def parent_signal_threads(pool, args_list, f_out):
+    fetched = (item for _, item in pool.imap_unordered(b1.fetch_stock, args_list))
+    pipeline = StagePipeline(fetched, source_name='抓取', maxsize=64)
+    pipeline.add_stage('信号', b1.score_stock)
+    pipeline.add_stage('序列化', b1.serialize_result)
+    for _, line in pipeline:
+        f_out.write(line)
+
+
+def current(pool, args_list, f_out):
+    for _, line in b1.scan_pipeline(pool, args_list):
+        f_out.write(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="B1 全量扫描吞吐对比")
+    parser.add_argument('--stocks', type=int, default=600)
+    parser.add_argument('--bars', type=int, default=300)
+    parser.add_argument('--processes', type=int, default=min(8, os.cpu_count() or 1))
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_b1_")
+    try:
+        use_store(root)
+        args_list = build_store(root, args.stocks, args.bars)
+        modes = [('逐只任务', per_stock_tasks), ('主进程信号线程', parent_signal_threads), ('当前', current)]
+        print(f"📊 {args.stocks} 只股票 × {args.bars} 根K线, {args.processes} 个进程")
+        with FetchPool(processes=args.processes, initializer=use_store, initargs=(root,)) as pool:
+            for name, scan in modes:
+                with open(os.devnull, 'w', encoding='utf-8') as f_out:
+                    scan(pool, args_list, f_out)  # 预热
+                    timings = []
+                    for _ in range(args.rounds):
+                        started = time.perf_counter()
+                        scan(pool, args_list, f_out)
+                        timings.append(time.perf_counter() - started)
+                elapsed = min(timings)
+                print(f"   {name:<8} {elapsed:6.2f}s  {args.stocks / elapsed:7.1f} 只/秒")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
+import json
+import os
+import tempfile
 import unittest
 import types
 import re
 from unittest.mock import patch
 
+import pandas as pd
+
+from common.history_store import HistoryStore
+from common.signal_profile import SignalProfile
+
 from modules.stock_selection import b1_selection
 
 
@@ -138,5 +146,201 @@ class TestB1SelectionPromptStyle(unittest.TestCase):
         self.assertIn("rounded light highlight background", prompt)
 
 
+def _daily_history(periods, end="2026-01-09"):
+    close = [10.0 + 0.5 * ((i * 7) % 11) / 11 for i in range(periods)]
+    return pd.DataFrame(
+        {
+            "date": pd.bdate_range(end=end, periods=periods),
+            "open": close,
+            "high": [c + 0.3 for c in close],
+            "low": [c - 0.3 for c in close],
+            "close": close,
+            "volume": 1000.0,
+            "adj_factor": 1.0,
+        }
+    )
+
+
+class TestIntradaySelection(unittest.TestCase):
+    def test_rescreens_from_local_history_plus_snapshot(self):
+        dates = pd.bdate_range(end="2026-01-09", periods=200)
+        history = pd.DataFrame(
+            {"date": dates, "open": 10.0, "high": 10.5, "low": 9.5, "close": 10.0, "volume": 1000.0, "adj_factor": 1.0}
+        )
+        stock_list = pd.DataFrame(
+            {"code": ["000001", "000002"], "name": ["A", "B"], "market_cap": [500.0, 500.0], "industry": ["银行", "地产"]}
+        )
+        snapshot = pd.DataFrame(
+            {
+                "code": ["000001", "000002"],
+                "name": ["A", "B"],
+                "open": [10.0, 10.0],
+                "high": [10.8, 10.8],
+                "low": [9.9, 9.9],
+                "close": [10.6, 10.6],
+                "volume": [3000.0, 3000.0],
+                "prev_close": [10.0, 10.0],
+            }
+        )
+        seen = {}
+
+        def fake_evaluate(batch, profile=None):
+            seen.update({args[0]: df for args, df in batch})
+            return [{"code": args[0], "signal": True} for args, _ in batch]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            store = HistoryStore(os.path.join(tmp, "history"))
+            store.save("000001", history, depth=300)
+            b1_selection._INTRADAY_HISTORY.clear()
+            with patch.object(b1_selection, "get_history_store", return_value=store), patch.object(
+                b1_selection, "get_all_stock_list", return_value=stock_list
+            ), patch.object(b1_selection, "get_intraday_snapshot", return_value=snapshot), patch.object(
+                b1_selection, "evaluate_stocks", side_effect=fake_evaluate
+            ), patch.object(b1_selection, "datetime") as mock_dt:
+                mock_dt.now.return_value = pd.Timestamp("2026-01-12 14:00").to_pydatetime()
+                selected, timestamp = b1_selection.run_intraday_selection(tmp)
+
+            self.assertTrue(os.path.exists(os.path.join(tmp, f"intraday_selected_{timestamp}.json")))
+        b1_selection._INTRADAY_HISTORY.clear()
+
+        self.assertEqual([s["code"] for s in selected], ["000001"])
+        df = seen["000001"]
+        self.assertEqual(len(df), 201)
+        self.assertEqual(df["date"].iloc[-1], pd.Timestamp("2026-01-12"))
+        self.assertEqual(df["close"].iloc[-1], 10.6)
+
+    def test_weekly_rescreen_skips_short_history_without_writing(self):
+        stock_list = pd.DataFrame({"code": ["000001"], "name": ["A"], "market_cap": [500.0], "industry": ["银行"]})
+        snapshot = pd.DataFrame(
+            {"code": ["000001"], "name": ["A"], "open": [10.0], "high": [10.8], "low": [9.9],
+             "close": [10.6], "volume": [3000.0], "prev_close": [10.0]}
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            store = HistoryStore(os.path.join(tmp, "history"))
+            store.save("000001", _daily_history(300), depth=300)  # 约60根周线
+            b1_selection._INTRADAY_HISTORY.clear()
+            with patch.object(b1_selection, "get_history_store", return_value=store), patch.object(
+                b1_selection, "get_all_stock_list", return_value=stock_list
+            ), patch.object(b1_selection, "get_intraday_snapshot", return_value=snapshot), patch.object(
+                b1_selection, "datetime"
+            ) as mock_dt:
+                mock_dt.now.return_value = pd.Timestamp("2026-01-12 14:00").to_pydatetime()
+                result = b1_selection.run_intraday_selection(tmp, timeframe="W")
+            written = [name for name in os.listdir(tmp) if name.startswith("intraday_selected")]
+        b1_selection._INTRADAY_HISTORY.clear()
+        b1_selection._INTRADAY_RESAMPLED.clear()
+
+        self.assertEqual(result, ([], ""))
+        self.assertEqual(written, [])
+
+
+class TestTimeframeSelection(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = HistoryStore(os.path.join(self.tmp.name, "history"))
+        self.store.save("000001", _daily_history(300), depth=300)
+        stock_list = pd.DataFrame({"code": ["000001"], "name": ["A"], "market_cap": [500.0], "industry": ["银行"]})
+        self.patchers = [
+            patch.object(b1_selection, "get_history_store", return_value=self.store),
+            patch.object(b1_selection, "get_all_stock_list", return_value=stock_list),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        self.tmp.cleanup()
+
+    def test_deepens_store_to_enough_weekly_bars(self):
+        def deepen(codes, days):
+            for code in codes:
+                self.store.save(code, _daily_history(days), depth=days)
+            return 0
+
+        with patch.object(b1_selection, "deepen_history_store", side_effect=deepen) as deepen_mock:
+            selected, timestamp = b1_selection.run_timeframe_selection(self.tmp.name, timeframe="W")
+
+        self.assertEqual(deepen_mock.call_args.args, (["000001"], 600))
+        self.assertGreaterEqual(len(self.store.load_adjusted("000001", "qfq", "W")), b1_selection.MIN_BARS)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, f"selected_周线_{timestamp}.json")))
+
+    def test_refuses_to_write_empty_result_when_history_stays_short(self):
+        with patch.object(b1_selection, "deepen_history_store", return_value=1) as deepen_mock:
+            self.assertEqual(b1_selection.run_timeframe_selection(self.tmp.name, timeframe="M"), ([], ""))
+
+        self.assertEqual(deepen_mock.call_args.args[1], 120 * 23)
+        self.assertFalse([name for name in os.listdir(self.tmp.name) if name.startswith("selected")])
+
+
+class TestBatchEvaluation(unittest.TestCase):
+    def test_evaluate_stocks_matches_per_stock_records(self):
+        from tests.test_panel_signals import _golden_frames
+
+        frames = _golden_frames(count=12)
+        batch = [((code, code, 100.0, "银行"), df) for code, df in frames.items()]
+        batch.append((("000999", "X", 100.0, "nan"), None))
+
+        records = b1_selection.evaluate_stocks(batch)
+
+        self.assertEqual(len(records), len(batch))
+        self.assertEqual(records, [b1_selection.evaluate_stock(args, df) for args, df in batch])
+        self.assertTrue(any(record is None for record in records))
+        self.assertTrue(any(record is not None for record in records))
+
+
+class _InlinePool:
+    """FetchPool 的进程内替身：按提交顺序同步执行"""
+
+    def imap_unordered(self, func, items):
+        return ((item, func(item)) for item in items)
+
+
+class TestScanPipeline(unittest.TestCase):
+    def test_batches_match_per_stock_records_and_count_failed_stocks(self):
+        from tests.test_panel_signals import _golden_frames
+
+        frames = _golden_frames(count=12)
+        args_list = [(code, code, 100.0, "银行") for code in frames]
+        args_list.append(("000999", "X", 100.0, "银行"))
+        profile = SignalProfile()
+
+        b1_selection.set_signal_profiling(True)
+        try:
+            with patch.object(b1_selection, "get_stock_data", side_effect=lambda code, days: frames.get(code)):
+                pipeline = b1_selection.scan_pipeline(_InlinePool(), args_list, profile, batch_size=5)
+                outputs = list(pipeline)
+        finally:
+            b1_selection.set_signal_profiling(False)
+
+        expected = [b1_selection.evaluate_stock(args, frames.get(args[0])) for args in args_list]
+        expected = {record["code"]: record for record in expected if record is not None}
+        self.assertEqual({result["code"]: result for result, _ in outputs}, expected)
+        self.assertEqual([json.loads(line) for _, line in outputs], [result for result, _ in outputs])
+        self.assertEqual(pipeline.source_count, len(args_list))
+        # 每批的剖析数据在主进程汇总：面板里的股票即K线足够的股票
+        self.assertEqual(profile.stocks, sum(len(df) >= 120 for df in frames.values()))
+
+
+class TestResumableScan(unittest.TestCase):
+    def test_finds_latest_incomplete_scan_and_drops_truncated_line(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            old = os.path.join(tmp, "all_stocks_20260105_090000.jsonl")
+            latest = os.path.join(tmp, "all_stocks_20260105_100000.jsonl")
+            with open(old, "w", encoding="utf-8") as f:
+                f.write('{"code": "000009"}\n')
+            with open(latest, "w", encoding="utf-8") as f:
+                f.write('{"code": "000001", "signal": true}\n{"code": "000002", "signal": false}\n{"code": "0000')
+
+            self.assertEqual(b1_selection.find_resumable_scan(tmp, "20260105"), latest)
+            results = b1_selection.load_scan_results(latest)
+            self.assertEqual([r["code"] for r in results], ["000001", "000002"])
+            with open(latest, encoding="utf-8") as f:
+                self.assertTrue(f.read().endswith('"signal": false}\n'))
+
+            b1_selection.mark_scan_done(latest, total_count=2, success_count=2)
+            self.assertIsNone(b1_selection.find_resumable_scan(tmp, "20260105"))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from common import backtest
+from common.backtest import (
+    MIN_BARS, SharedArrays, backfill_days, evaluate_shard, load_history, panel_arrays, run_backtest, summarize,
+)
+from common.history_store import HistoryStore
+from common.signals import SIGNAL_NAMES, StockSignals
+from tests.test_panel_signals import _golden_frames
+
+
+def _eligible_frames(count=24, seed=5):
+    return {code: df for code, df in _golden_frames(count, seed).items() if len(df) >= MIN_BARS}
+
+
+class TestBacktest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.frames = _eligible_frames()
+        cls.events = evaluate_shard(panel_arrays(cls.frames), list(cls.frames), horizons=(1, 5))
+
+    def test_signals_match_stock_signals_as_of_each_bar(self):
+        flags = {(row.code, row.date): row.flags for row in self.events.itertuples()}
+        for code, df in list(self.frames.items())[:4]:
+            for t in range(MIN_BARS - 1, len(df), 7):
+                latest = StockSignals(df.iloc[:t + 1], code, last_bar_only=True).get_latest_signal()
+                expected = sum(1 << bit for bit, name in enumerate(SIGNAL_NAMES) if name in latest['signals'])
+                self.assertEqual(flags.get((code, df['date'].iloc[t]), 0), expected, f"{code} {t}")
+        self.assertGreater(len(self.events), 0)
+
+    def test_forward_return_and_drawdown(self):
+        row = self.events.iloc[0]
+        df = self.frames[row.code]
+        t = df.index[df['date'] == row.date][0]
+        entry = df['close'].iloc[t]
+        if t + 5 < len(df):
+            self.assertAlmostEqual(row.return_5, (df['close'].iloc[t + 5] / entry - 1) * 100)
+            lowest = df['low'].iloc[t + 1:t + 6].min()
+            self.assertAlmostEqual(row.drawdown_5, min(lowest / entry - 1, 0) * 100)
+        last_dates = self.events['code'].map({code: df['date'].iloc[-1] for code, df in self.frames.items()})
+        unfinished = self.events['date'] == last_dates
+        self.assertTrue(self.events.loc[unfinished, 'return_1'].isna().all())
+        self.assertFalse(self.events.loc[~unfinished, 'return_1'].isna().any())
+
+    def test_summary_counts_each_signal(self):
+        summary = summarize(self.events, horizons=(1, 5)).set_index(['signal', 'horizon'])
+        fired = self.events.dropna(subset=['return_1'])
+        self.assertEqual(summary.loc[('XG', 1), 'trades'], len(fired))
+        for bit, name in enumerate(SIGNAL_NAMES):
+            self.assertEqual(summary.loc[(name, 1), 'trades'], int(((fired['flags'] & (1 << bit)) > 0).sum()))
+
+    def test_process_pool_over_shared_memory_matches_inline(self):
+        inline = run_backtest(self.frames, years=None, horizons=(1, 5), processes=1)
+        pooled = run_backtest(self.frames, years=None, horizons=(1, 5), processes=2, shard_size=5)
+        pd.testing.assert_frame_equal(inline, pooled)
+
+    def test_years_limits_signal_dates(self):
+        events = run_backtest(self.frames, years=0.25, horizons=(1,), processes=1)
+        cutoff = max(df['date'].iloc[-1] for df in self.frames.values()) - pd.DateOffset(months=3)
+        self.assertTrue((events['date'] >= cutoff).all())
+
+    def test_span_is_limited_by_store_depth(self):
+        events = run_backtest(self.frames, years=5, horizons=(1,), processes=1)
+        # 300 根日线去掉 MIN_BARS 根预热，只剩不到一年
+        self.assertLess(events.attrs['span_years'], 1)
+        self.assertGreaterEqual(events['date'].min(), pd.Timestamp('2025-01-01'))
+        recent = run_backtest(self.frames, years=0.25, horizons=(1,), processes=1)
+        self.assertAlmostEqual(recent.attrs['span_years'], 0.25, delta=0.01)
+
+    def test_run_tags_output_with_real_span(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            with patch.object(backtest, 'load_history', return_value=self.frames):
+                backtest.run(years=5, horizons=(1,), processes=1, output_dir=output_dir)
+            names = os.listdir(output_dir)
+        self.assertTrue(names)
+        self.assertTrue(all(name.startswith('b1_0.7y_') for name in names), names)
+
+    def test_backfill_days_cover_warmup(self):
+        self.assertEqual(backfill_days(5), 5 * 250 + MIN_BARS)
+        self.assertGreaterEqual(backfill_days(1, 'W') / 5, 52 + MIN_BARS)
+        self.assertGreaterEqual(backfill_days(1, 'M') / 23, 12 + MIN_BARS)
+
+    def test_shared_arrays_roundtrip(self):
+        arrays = {'close': np.arange(6, dtype='float64').reshape(3, 2)}
+        with SharedArrays(arrays) as shared:
+            name, shape, dtype = shared.spec['close']
+            self.assertEqual(shape, (3, 2))
+            self.assertEqual(np.dtype(dtype), np.float64)
+
+    def test_load_history_skips_short_stocks(self):
+        with tempfile.TemporaryDirectory() as root:
+            store = HistoryStore(root)
+            frames = _golden_frames(6)
+            for code, df in frames.items():
+                store.save(code, df)
+            loaded = load_history(store)
+        self.assertEqual(sorted(loaded), sorted(code for code, df in frames.items() if len(df) >= MIN_BARS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+import pandas as pd
+
+from common import data_fetcher
+from common.disk_cache import DiskCache
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = DiskCache(self.tmp.name, max_bytes=10 * 1024 * 1024, ttls={"intraday": 60})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_feather_roundtrip(self):
+        df = pd.DataFrame({"code": ["000001", "600000"], "close": [10.5, 20.1]})
+        self.cache.put("spot", "20260105", df, "feather")
+        hit, loaded = self.cache.get("spot", "20260105", "feather")
+        self.assertTrue(hit)
+        pd.testing.assert_frame_equal(loaded, df)
+
+    def test_ttl_expires_by_key(self):
+        self.cache.put("intraday", "20260105", {"v": 1})
+        self.cache.put("daily", "20260105", {"v": 2})
+        old = time.time() - 120
+        for key in ("intraday", "daily"):
+            path = self.cache.path(key, "20260105", "pickle")
+            os.utime(path, (old, old))
+
+        self.assertEqual(self.cache.get("intraday", "20260105"), (False, None))
+        self.assertEqual(self.cache.get("daily", "20260105"), (True, {"v": 2}))
+
+    def test_lru_eviction_keeps_recently_used(self):
+        cache = DiskCache(self.tmp.name, max_bytes=2500, ttls={})
+        payload = b"x" * 1000
+        cache.put("a", "d", payload)
+        cache.put("b", "d", payload)
+        now = time.time()
+        os.utime(cache.path("a", "d", "pickle"), (now - 100, now))
+        os.utime(cache.path("b", "d", "pickle"), (now - 200, now))
+        cache.get("a", "d")
+
+        cache.put("c", "d", payload)
+
+        self.assertTrue(cache.get("a", "d")[0])
+        self.assertFalse(cache.get("b", "d")[0])
+        self.assertTrue(cache.get("c", "d")[0])
+
+    def test_eviction_skips_in_flight_tmp_and_sweeps_stale(self):
+        cache = DiskCache(self.tmp.name, max_bytes=1500, ttls={})
+        in_flight = cache.path("a", "d", "pickle") + ".123.456.tmp"
+        stale = cache.path("b", "d", "pickle") + ".789.1.tmp"
+        for path in (in_flight, stale):
+            with open(path, "wb") as f:
+                f.write(b"x" * 5000)
+        old = time.time() - 3600
+        os.utime(stale, (old, old))
+
+        cache.put("c", "d", b"x" * 1000)
+
+        self.assertTrue(os.path.exists(in_flight))
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(cache.get("c", "d")[0])
+
+    def test_corrupt_file_is_dropped(self):
+        path = self.cache.path("k", "20260105", "pickle")
+        with open(path, "wb") as f:
+            f.write(b"\x80\x04trunc")
+        self.assertEqual(self.cache.get("k", "20260105"), (False, None))
+        self.assertFalse(os.path.exists(path))
+
+    def test_fetch_data_with_cache_uses_layer(self):
+        fetch = Mock(return_value=pd.DataFrame({"close": [1.0]}))
+        with patch.object(data_fetcher, "get_disk_cache", return_value=self.cache):
+            data_fetcher.fetch_data_with_cache(fetch, "k", "20260105", cache_type="feather")
+            data_fetcher.fetch_data_with_cache(fetch, "k", "20260105", cache_type="feather")
+        fetch.assert_called_once()
+        self.assertEqual([name for name in os.listdir(self.tmp.name) if name.endswith(".tmp")], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
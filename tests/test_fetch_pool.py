@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+
+from common.fetch_pool import FetchPool
+
+
+def _square(x):
+    return x * x
+
+
+def _crash_once(args):
+    value, marker = args
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)  # simulate a mini_racer segfault taking the worker down
+    return value * 10
+
+
+def _always_crash(_):
+    os._exit(1)
+
+
+def _raise(_):
+    raise ValueError("boom")
+
+
+class TestFetchPool(unittest.TestCase):
+    def test_results_for_all_items(self):
+        with FetchPool(processes=2) as pool:
+            results = dict(pool.imap_unordered(_square, range(6)))
+        self.assertEqual(results, {i: i * i for i in range(6)})
+
+    def test_crashed_worker_is_restarted_and_task_requeued(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            marker = os.path.join(tmp, "crashed")
+            with FetchPool(processes=1) as pool:
+                results = list(pool.imap_unordered(_crash_once, [(1, marker), (2, marker)]))
+                self.assertEqual(pool.restarts, 1)
+        self.assertEqual(sorted(result for _, result in results), [10, 20])
+
+    def test_gives_up_after_max_retries(self):
+        with FetchPool(processes=1, max_retries=1) as pool:
+            results = list(pool.imap_unordered(_always_crash, ["a"]))
+            self.assertEqual(pool.restarts, 2)
+        self.assertEqual(results, [("a", None)])
+
+    def test_exception_in_task_returns_none_without_retry(self):
+        with FetchPool(processes=1) as pool:
+            results = list(pool.imap_unordered(_raise, ["a"]))
+            self.assertEqual(pool.restarts, 0)
+        self.assertEqual(results, [("a", None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
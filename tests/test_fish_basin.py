@@ -1,9 +1,11 @@
+import tempfile
 import unittest
+from datetime import datetime
 from unittest.mock import patch
 
 import pandas as pd
 
-from modules.fish_basin import fish_basin
+from modules.fish_basin import fish_basin, fish_basin_sectors
 
 
 class TestFishBasinHKStrictDataPolicy(unittest.TestCase):
@@ -36,5 +38,47 @@ class TestFishBasinHKStrictDataPolicy(unittest.TestCase):
         self.assertIsNone(result)
 
 
+class _InlinePool:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def imap_unordered(self, func, items):
+        return ((item, func(item)) for item in items)
+
+
+class TestFishBasinSectorsTimeframe(unittest.TestCase):
+    def test_history_start_covers_yellow_line_bars(self):
+        now = datetime(2026, 10, 17)
+        self.assertEqual(fish_basin_sectors.history_start_date("D", now), "20240101")
+        self.assertEqual(fish_basin_sectors.history_start_date("W", now), "20240101")
+        # 114 根月线约 9.5 年，再留出节假日余量
+        self.assertLessEqual(fish_basin_sectors.history_start_date("M", now), "20170101")
+
+    def test_monthly_run_writes_nothing_when_every_sector_is_short(self):
+        dates = pd.bdate_range(end="2026-10-16", periods=700)  # 约33个月
+        short = pd.DataFrame({"date": dates, "open": 10.0, "high": 10.5, "low": 9.5, "close": 10.0, "volume": 1.0})
+        seen = []
+
+        def router(item):
+            seen.append(item["start_date"])
+            return item["name"], "", short, 0, item["name"]
+
+        with tempfile.TemporaryDirectory() as tmp, patch.object(
+            fish_basin_sectors, "load_sector_config", return_value=[{"name": "半导体", "type": "THS"}]
+        ), patch.object(fish_basin_sectors, "FetchPool", _InlinePool), patch.object(
+            fish_basin_sectors, "fetch_data_router", side_effect=router
+        ), patch.object(fish_basin_sectors, "get_spot_data_map", return_value={}), patch.object(
+            fish_basin_sectors, "patch_today_spot", side_effect=lambda df, name, spot_map: df
+        ), patch.object(fish_basin_sectors, "save_sector_ranking") as save_ranking:
+            result = fish_basin_sectors.run(tmp, save_excel=False, timeframe="M")
+
+        self.assertTrue(result.empty)
+        save_ranking.assert_not_called()
+        self.assertEqual(seen, [fish_basin_sectors.history_start_date("M")])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,87 @@
+import math
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from common.formula import ARRAY_OPS, FormulaError, compile_formula, load_formula
+from common.indicators import calculate_all_indicators, ema, ma, sma
+from common.lookback import LOOKBACK_OPS, Lookback, derive_plan
+from common.signals import B1_INDICATORS, B1_OUTPUTS
+from tests.test_panel_signals import _golden_frames
+
+
+class TestFormulaCompiler(unittest.TestCase):
+    def test_precedence_and_outputs(self):
+        formula = compile_formula("X:=C+2*3-1; Y:X>C AND C<=6 OR -C=-1; Z:ABS(-C)/2;")
+        self.assertEqual(formula.outputs, ['Y', 'Z'])
+        close = pd.Series([1.0, 5.0, 9.0])
+        result = formula.evaluate({'close': close})
+        self.assertEqual(result['Y'].tolist(), [True, True, False])
+        self.assertEqual(result['Z'].tolist(), [0.5, 2.5, 4.5])
+        self.assertEqual(list(formula.evaluate({'close': close}, outputs=['x'])), ['X'])
+
+    def test_common_subexpressions_are_shared(self):
+        formula = compile_formula("A:=V<HHV(V,50)/3; B:=V<HHV(V,20)*0.45 OR V<HHV(V,50)/3; S:A AND B;")
+        calls = [node for node in formula.nodes if node[0] == 'call']
+        self.assertEqual(len(calls), 2)
+        self.assertGreater(formula.stats()['references'], formula.stats()['nodes'])
+
+    def test_recursive_functions_match_indicators(self):
+        close = pd.Series(np.linspace(10, 20, 30))
+        formula = compile_formula("A:MA(C,5); B:EMA(C,N); D:SMA(C,9,1);")
+        result = formula.evaluate({'close': close, 'N': 12})
+        pd.testing.assert_series_equal(result['A'], ma(close, 5))
+        pd.testing.assert_series_equal(result['B'], ema(close, 12))
+        pd.testing.assert_series_equal(result['D'], sma(close, 9, 1))
+
+        arrays = formula.evaluate({'close': close.to_numpy().reshape(-1, 1), 'N': 12}, ARRAY_OPS)
+        for name in ('A', 'B', 'D'):
+            np.testing.assert_array_equal(arrays[name][:, 0], result[name].to_numpy())
+
+    def test_errors(self):
+        for text in ("X:=C+;", "X C;", "X:FOO(C);", "X:REF(C);", "X:REF(C,C+1);", "X:C$;"):
+            with self.assertRaises(FormulaError, msg=text):
+                compile_formula(text)
+        with self.assertRaises(FormulaError):
+            compile_formula("X:C>J;").evaluate({'close': pd.Series([1.0])})
+        with self.assertRaises(FormulaError):
+            compile_formula("X:C;").evaluate({'close': pd.Series([1.0])}, outputs=['Y'])
+
+    def test_lookback_of_recursive_call_is_unbounded(self):
+        result = compile_formula("A:REF(C,3); B:MA(C,5);").evaluate({'close': Lookback()}, LOOKBACK_OPS)
+        self.assertEqual(result['A'].bars, 3)
+        self.assertEqual(result['B'].bars, math.inf)
+
+
+class TestB1FormulaFile(unittest.TestCase):
+    def test_compiles_with_expected_interface(self):
+        formula = load_formula('b1')
+        self.assertEqual(set(formula.outputs), set(B1_OUTPUTS))
+        inputs = set(B1_INDICATORS) | {'open', 'high', 'low', 'close', 'volume', '振幅区间', '放宽系数', 'OK棒', 'N', 'M'}
+        self.assertEqual(set(formula.inputs()), inputs)
+        self.assertLess(formula.stats()['nodes'], formula.stats()['references'])
+
+    def test_series_and_array_backends_agree(self):
+        formula = load_formula('b1')
+        for code, df in list(_golden_frames(12).items()):
+            df = calculate_all_indicators(df)
+            inputs = {name: df[name] for name in formula.inputs() if name in df}
+            inputs.update({'振幅区间': 8, '放宽系数': 0.9, 'OK棒': True, 'N': 20, 'M': 50})
+            series = formula.evaluate(inputs)
+            arrays = {name: (value.to_numpy(dtype='float64').reshape(-1, 1) if isinstance(value, pd.Series) else value)
+                      for name, value in inputs.items()}
+            with np.errstate(divide='ignore', invalid='ignore'):
+                result = formula.evaluate(arrays, ARRAY_OPS)
+            for name in B1_OUTPUTS:
+                np.testing.assert_array_equal(result[name][:, 0], series[name].to_numpy(), err_msg=f"{code} {name}")
+
+    def test_lookback_plan(self):
+        x = Lookback()
+        inputs = {name: x for name in load_formula('b1').inputs()}
+        inputs.update({'振幅区间': 5, '放宽系数': 1, 'OK棒': True, 'N': 20, 'M': 50})
+        self.assertEqual(derive_plan(load_formula('b1').evaluate(inputs, LOOKBACK_OPS).values()), (50, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,283 @@
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import pandas as pd
+
+from common import data_fetcher
+from common.history_store import HistoryStore, adjust_bars, append_live_bar, expected_last_trade_date
+
+
+def _calendar_with_holiday():
+    """2026 国庆: 10-01 ~ 10-07 休市"""
+    days = pd.bdate_range("2026-09-01", "2026-10-30")
+    return days[(days < "2026-10-01") | (days > "2026-10-07")]
+
+
+class _HolidayClose(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2026, 10, 5, 16, 0)
+
+
+def _bars(start, periods, close=10.0):
+    dates = pd.bdate_range(start, periods=periods)
+    return pd.DataFrame(
+        {
+            "date": dates,
+            "open": close,
+            "high": close + 0.5,
+            "low": close - 0.5,
+            "close": [close + i * 0.01 for i in range(periods)],
+            "volume": 1000.0,
+        }
+    )
+
+
+class TestHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = HistoryStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_save_load_roundtrip_keeps_depth(self):
+        self.store.save("000001", _bars("2026-01-05", 5), depth=300)
+        loaded = self.store.load("000001")
+        self.assertEqual(len(loaded), 5)
+        self.assertEqual(self.store.depth("000001"), 300)
+
+    def test_append_dedupes_by_date_keeping_new_bar(self):
+        self.store.save("000001", _bars("2026-01-05", 3), depth=300)
+        update = _bars("2026-01-07", 2, close=20.0)
+        merged = self.store.append("000001", update)
+        self.assertEqual(len(merged), 4)
+        self.assertEqual(merged["close"].iloc[2], 20.0)
+        self.assertEqual(self.store.depth("000001"), 300)
+
+    def test_ingest_daily_bars_appends_only_contiguous_symbols(self):
+        self.store.save("000001", _bars("2026-01-05", 3), depth=300)
+        self.store.save("000002", _bars("2026-01-05", 3), depth=300)
+        last_close = self.store.load("000001")["close"].iloc[-1]
+        snapshot = pd.DataFrame(
+            {
+                "code": ["000001", "000002", "000003"],
+                "open": [10.0, 10.0, 10.0],
+                "high": [11.0, 11.0, 11.0],
+                "low": [9.0, 9.0, 9.0],
+                "close": [10.5, 10.5, 10.5],
+                "volume": [500.0, 500.0, 500.0],
+                "prev_close": [last_close, last_close - 1.0, 10.0],
+            }
+        )
+        stats = self.store.ingest_daily_bars(snapshot, "2026-01-09")
+        self.assertEqual(stats, {"appended": 1, "up_to_date": 0, "missing": 1, "mismatch": 1, "adjusted": 0})
+        self.assertEqual(self.store.last_date("000001"), pd.Timestamp("2026-01-09"))
+        self.assertEqual(self.store.last_date("000002"), pd.Timestamp("2026-01-07"))
+
+    def test_ingest_derives_factor_on_ex_rights_day(self):
+        self.store.save("000001", _bars("2026-01-05", 3, close=10.0), depth=300)
+        last_close = self.store.load("000001")["close"].iloc[-1]
+        # 10送10: the exchange reference price halves
+        snapshot = pd.DataFrame(
+            {
+                "code": ["000001"],
+                "open": [5.0],
+                "high": [5.2],
+                "low": [4.9],
+                "close": [5.1],
+                "volume": [800.0],
+                "prev_close": [last_close / 2],
+            }
+        )
+        stats = self.store.ingest_daily_bars(snapshot, "2026-01-08")
+        self.assertEqual(stats["adjusted"], 1)
+
+        raw = self.store.load("000001")
+        self.assertEqual(raw["close"].iloc[-2], last_close)
+        qfq = adjust_bars(raw, "qfq")
+        self.assertAlmostEqual(qfq["close"].iloc[-2], round(last_close / 2, 2))
+        self.assertEqual(qfq["close"].iloc[-1], 5.1)
+
+    def test_append_live_bar_in_memory(self):
+        raw = _bars("2026-01-05", 3)
+        raw["adj_factor"] = 1.0
+        last_close = raw["close"].iloc[-1]
+        bar = {"open": 5.0, "high": 5.2, "low": 4.9, "close": 5.1, "volume": 800.0, "prev_close": last_close / 2}
+
+        merged = append_live_bar(raw, bar, "2026-01-08")
+        self.assertEqual(len(merged), 4)
+        self.assertAlmostEqual(merged["adj_factor"].iloc[-1], 2.0)
+        # a gap between the stored bars and the live bar cannot be bridged
+        self.assertIsNone(append_live_bar(raw, bar, "2026-01-12"))
+
+    def test_expected_last_trade_date_skips_weekend_and_open_session(self):
+        # 2026-01-12 is a Monday
+        self.assertEqual(expected_last_trade_date(datetime(2026, 1, 12, 10, 0)), pd.Timestamp("2026-01-09"))
+        self.assertEqual(expected_last_trade_date(datetime(2026, 1, 12, 16, 0)), pd.Timestamp("2026-01-12"))
+
+    def test_expected_last_trade_date_skips_holidays_in_calendar(self):
+        calendar = _calendar_with_holiday()
+        self.assertEqual(expected_last_trade_date(datetime(2026, 10, 5, 16, 0), calendar), pd.Timestamp("2026-09-30"))
+        self.assertEqual(expected_last_trade_date(datetime(2026, 10, 8, 10, 0), calendar), pd.Timestamp("2026-09-30"))
+        self.assertTrue(HistoryStore.is_fresh(_bars("2026-09-01", 22), datetime(2026, 10, 6, 16, 0), calendar))
+
+
+class TestGetStockDataIncremental(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = HistoryStore(self.tmp.name)
+        self.patcher = patch.object(data_fetcher, "get_history_store", return_value=self.store)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def test_fetches_only_missing_tail(self):
+        history = _bars("2025-01-01", 300)
+        self.store.save("000001", history, depth=300)
+        last = history.iloc[-1]
+        tail = pd.concat([history.tail(1), _bars(last["date"] + pd.offsets.BDay(1), 1, close=99.0)])
+        tail["adj_factor"] = 1.0
+
+        with patch.object(data_fetcher, "_fetch_stock_history", return_value=tail) as fetch:
+            df = data_fetcher.get_stock_data("000001", 300)
+
+        fetch.assert_called_once()
+        self.assertEqual(fetch.call_args.kwargs["start_date"], last["date"].strftime("%Y%m%d"))
+        self.assertEqual(len(df), 300)
+        self.assertEqual(df["close"].iloc[-1], 99.0)
+
+    def test_tail_factors_are_rebased_onto_local_scale(self):
+        history = _bars("2025-01-01", 300)
+        history["adj_factor"] = 3.0
+        self.store.save("000001", history, depth=300)
+        last = history.iloc[-1]
+        # Another source with a different factor base; the new bar goes ex-rights (factor doubles)
+        new_bar = _bars(last["date"] + pd.offsets.BDay(1), 1, close=5.0)
+        tail = pd.concat([history.tail(1), new_bar], ignore_index=True)
+        tail["adj_factor"] = [10.0, 20.0]
+
+        with patch.object(data_fetcher, "_fetch_stock_history", return_value=tail):
+            df = data_fetcher.get_stock_data("000001", 300)
+
+        self.assertEqual(self.store.load("000001")["adj_factor"].iloc[-1], 6.0)
+        self.assertEqual(df["close"].iloc[-1], 5.0)
+        self.assertEqual(df["close"].iloc[-2], round(last["close"] / 2, 2))
+
+    def test_refetches_full_history_when_tail_does_not_line_up(self):
+        history = _bars("2025-01-01", 300)
+        self.store.save("000001", history, depth=300)
+        adjusted_tail = history.tail(1).assign(close=1.0)
+        full = _bars("2025-01-01", 301, close=5.0)
+
+        with patch.object(data_fetcher, "_fetch_stock_history", side_effect=[adjusted_tail, full]) as fetch:
+            df = data_fetcher.get_stock_data("000001", 300)
+
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(df["close"].iloc[0], full["close"].iloc[1])
+
+
+class _InlinePool:
+    def __init__(self, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def imap_unordered(self, func, items):
+        return ((item, func(item)) for item in items)
+
+
+class TestDeepenHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = HistoryStore(self.tmp.name)
+        self.patchers = [
+            patch.object(data_fetcher, "get_history_store", return_value=self.store),
+            patch.object(data_fetcher, "backfill_history_store", return_value=0),
+            patch("common.fetch_pool.FetchPool", _InlinePool),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        self.tmp.cleanup()
+
+    def test_refetches_only_shallow_stocks(self):
+        self.store.save("000001", _bars("2025-01-01", 300), depth=300)
+        self.store.save("000002", _bars("2023-01-02", 700), depth=300)  # 根数已够
+        self.store.save("000003", _bars("2025-06-02", 100), depth=800)  # 上市不久，首次拉取深度已够
+        full = _bars("2023-09-01", 600)
+        full["adj_factor"] = 1.0
+
+        with patch.object(data_fetcher, "_fetch_stock_history", return_value=full) as fetch:
+            short = data_fetcher.deepen_history_store(["000001", "000002", "000003"], 600)
+
+        self.assertEqual(short, 0)
+        fetch.assert_called_once_with("000001", 600)
+        self.assertEqual(self.store.depth("000001"), 600)
+        self.assertTrue(all(self.store.covers(code, 600) for code in ("000001", "000002", "000003")))
+
+    def test_reports_stocks_the_sources_could_not_deepen(self):
+        self.store.save("000001", _bars("2025-01-01", 300), depth=300)
+        with patch.object(data_fetcher, "_fetch_stock_history", return_value=None):
+            self.assertEqual(data_fetcher.deepen_history_store(["000001", "000009"], 600), 2)
+        self.assertEqual(len(self.store.load("000001")), 300)
+
+
+class TestIngestSpotSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = HistoryStore(self.tmp.name)
+        self.patchers = [
+            patch.object(data_fetcher, "get_history_store", return_value=self.store),
+            patch.object(data_fetcher, "datetime", _HolidayClose),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        self.tmp.cleanup()
+
+    def _snapshot(self, history):
+        last_close = history["close"].iloc[-1]
+        return pd.DataFrame([{"code": "000001", "open": last_close, "high": last_close, "low": last_close,
+                              "close": last_close, "volume": 1000.0, "prev_close": last_close}])
+
+    def test_skips_weekday_holiday(self):
+        history = _bars("2026-09-01", 22)
+        self.store.save("000001", history)
+        with patch.object(data_fetcher, "get_trade_calendar", return_value=_calendar_with_holiday()):
+            self.assertIsNone(data_fetcher.ingest_spot_snapshot(self._snapshot(history)))
+        self.assertEqual(self.store.last_date("000001"), pd.Timestamp("2026-09-30"))
+
+    def test_skips_when_calendar_unavailable(self):
+        history = _bars("2026-09-01", 22)
+        self.store.save("000001", history)
+        with patch.object(data_fetcher, "get_trade_calendar", return_value=None):
+            self.assertIsNone(data_fetcher.ingest_spot_snapshot(self._snapshot(history)))
+        self.assertEqual(len(self.store.load("000001")), 22)
+
+    def test_ingests_on_trade_day(self):
+        history = _bars("2026-09-01", 22)
+        self.store.save("000001", history)
+        calendar = pd.bdate_range("2026-09-01", "2026-10-30")
+        with patch.object(data_fetcher, "get_trade_calendar", return_value=calendar):
+            stats = data_fetcher.ingest_spot_snapshot(self._snapshot(history))
+        self.assertEqual(stats["appended"], 1)
+        self.assertEqual(self.store.last_date("000001"), pd.Timestamp("2026-10-05"))
+
+
+if __name__ == "__main__":
+    unittest.main()
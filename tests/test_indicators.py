@@ -0,0 +1,78 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from common import indicators
+
+
+def _reference_sma(series, n, m):
+    result = np.zeros(len(series))
+    result[0] = series.iloc[0] if not np.isnan(series.iloc[0]) else 0
+    for i in range(1, len(series)):
+        if np.isnan(series.iloc[i]):
+            result[i] = result[i - 1]
+        else:
+            result[i] = (m * series.iloc[i] + (n - m) * result[i - 1]) / n
+    return result
+
+
+def _reference_barslast(condition):
+    result = np.zeros(len(condition))
+    last_true = -1
+    for i in range(len(condition)):
+        if condition.iloc[i]:
+            last_true = i
+        result[i] = np.nan if last_true == -1 else i - last_true
+    return result
+
+
+def _reference_hhvbars(series, n):
+    def bars_since_max(x):
+        return len(x) - 1 - np.argmax(x.values)
+
+    return series.rolling(window=n, min_periods=1).apply(bars_since_max, raw=False).to_numpy()
+
+
+class TestIndicatorKernels(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(7)
+
+    def test_sma_matches_recurrence_bit_for_bit(self):
+        for _ in range(20):
+            values = pd.Series(self.rng.normal(50, 20, 300))
+            values[self.rng.random(300) < 0.1] = np.nan
+            for n, m in [(3, 1), (9, 1), (5, 2)]:
+                np.testing.assert_array_equal(indicators.sma(values, n, m).to_numpy(), _reference_sma(values, n, m))
+
+    def test_sma_leading_nan_starts_from_zero(self):
+        result = indicators.sma(pd.Series([np.nan, 3.0, np.nan]), 3, 1)
+        self.assertEqual(result.tolist(), [0.0, 1.0, 1.0])
+
+    def test_barslast_matches_loop(self):
+        condition = pd.Series(self.rng.random(300) < 0.05)
+        np.testing.assert_array_equal(indicators.barslast(condition).to_numpy(), _reference_barslast(condition))
+        self.assertEqual(indicators.barslast(pd.Series([False, True, False])).tolist()[1:], [0.0, 1.0])
+
+    def test_hhvbars_matches_rolling_apply_including_ties_and_nan(self):
+        for n in (1, 5, 40):
+            values = pd.Series(np.round(self.rng.normal(0, 2, 120)))
+            values[self.rng.random(120) < 0.05] = np.nan
+            np.testing.assert_array_equal(indicators.hhvbars(values, n).to_numpy(), _reference_hhvbars(values, n))
+
+    def test_hhvbars_2d_handles_ragged_listing(self):
+        values = np.round(self.rng.normal(0, 2, (80, 4)))
+        values[:30, 1] = np.nan
+        values[:, 3] = np.nan
+        result = indicators.hhvbars_2d(values, 20)
+
+        for col in range(3):
+            start = 30 if col == 1 else 0
+            expected = _reference_hhvbars(pd.Series(values[start:, col]), 20)
+            np.testing.assert_array_equal(result[start:, col], expected)
+        self.assertTrue(np.isnan(result[:30, 1]).all())
+        self.assertTrue(np.isnan(result[:, 3]).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
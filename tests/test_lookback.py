@@ -0,0 +1,68 @@
+import math
+import unittest
+
+import numpy as np
+
+from common.lookback import LOOKBACK_OPS, Lookback, NeedFullHistory, derive_plan, tail_ops
+from common.signals import StockSignals, big_gain_bars, last_bar_plan
+from tests.test_panel_signals import _golden_frames
+
+
+class TestLookback(unittest.TestCase):
+    def test_window_ops_accumulate_lookback(self):
+        ops = LOOKBACK_OPS
+        x = Lookback()
+        self.assertEqual(ops.ref(x, 3).bars, 3)
+        self.assertEqual(ops.hhv(ops.ref(x, 1), 20).bars, 20)
+        self.assertEqual((ops.count(x > 1, 8) + ops.llv(x, 50)).bars, 49)
+        self.assertEqual(ops.cross(x, ops.ref(x, 2)).bars, 3)
+        self.assertEqual(abs(x - 5).bars, 0)
+
+    def test_barslast_result_is_last_bar_only(self):
+        ops = LOOKBACK_OPS
+        x = Lookback()
+        bars = ops.barslast(ops.cross(x, ops.ref(x, 1)))
+        plan = derive_plan([bars > 12, ops.hhv(x, 10)])
+        self.assertEqual(plan, (10, 2))
+        self.assertEqual(ops.count(bars > 12, 5).bars, math.inf)
+
+    def test_b1_plan_is_derived_from_formula(self):
+        # 远期振幅 LLV/HHV(L/H, 50)；has_big_gain 为 EXIST(C/REF(C,1)>1.15, 200)
+        self.assertEqual(last_bar_plan(), (50, 1))
+        self.assertEqual(big_gain_bars(), 201)
+
+    def test_tail_barslast_requires_exact_hit(self):
+        barslast = tail_ops(scan_start=3).barslast
+        hit = np.zeros((10, 1), dtype=bool)
+        hit[5] = True
+        self.assertEqual(barslast(hit)[-1, 0], 4)
+        hit[:] = False
+        hit[1] = True
+        with self.assertRaises(NeedFullHistory):
+            barslast(hit)
+
+
+class TestLastBarOnlyMode(unittest.TestCase):
+    def test_latest_signal_matches_full_history(self):
+        fired = 0
+        for seed in (5, 6):
+            for code, df in _golden_frames(40, seed).items():
+                for bars in {len(df), max(1, len(df) - 9)}:
+                    part = df.iloc[:bars].reset_index(drop=True)
+                    full = StockSignals(part, code).get_latest_signal()
+                    last = StockSignals(part, code, last_bar_only=True).get_latest_signal()
+                    self.assertEqual(set(last), set(full))
+                    for key, value in full.items():
+                        np.testing.assert_array_equal(last[key], value, err_msg=f"{code} {bars} {key}")
+                    fired += bool(full['signal'])
+        self.assertGreater(fired, 0)
+
+    def test_signal_series_keep_only_last_bar(self):
+        df = _golden_frames(1)['000000']
+        signals = StockSignals(df, '000000', last_bar_only=True)
+        self.assertEqual(len(signals.XG), 1)
+        self.assertEqual(signals.XG.index[0], df.index[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
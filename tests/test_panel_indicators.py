@@ -0,0 +1,86 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from common.indicators import calculate_all_indicators, sma, sma_2d
+from common.panel_indicators import PANEL_INDICATORS, build_panel, calculate_panel_indicators
+
+
+def _random_stock(rng, n, end='2026-01-09', suspend=()):
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.03, n)))
+    high = close * (1 + rng.uniform(0, 0.03, n))
+    low = close * (1 - rng.uniform(0, 0.03, n))
+    # 偶尔出现一字板（最高=最低），覆盖 RSV 分母为 0 的 fillna 分支
+    flat = rng.random(n) < 0.05
+    high[flat] = low[flat] = close[flat]
+    df = pd.DataFrame({
+        'date': pd.bdate_range(end=end, periods=n),
+        'open': close * (1 + rng.normal(0, 0.01, n)),
+        'high': high,
+        'low': low,
+        'close': close,
+        'volume': rng.uniform(1e5, 1e6, n),
+    })
+    return df.drop(index=list(suspend)).reset_index(drop=True)
+
+
+class TestPanelIndicators(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(13)
+        # 长度不同（上市时间不同）的股票，其中一只有停牌缺口
+        self.frames = {
+            '000001': _random_stock(rng, 260),
+            '000002': _random_stock(rng, 150),
+            '300001': _random_stock(rng, 30),
+            '600001': _random_stock(rng, 5),
+            '688001': _random_stock(rng, 200, suspend=range(120, 126)),
+        }
+        self.expected = {code: calculate_all_indicators(df) for code, df in self.frames.items()}
+
+    def test_sma_2d_matches_sma_per_column(self):
+        rng = np.random.default_rng(3)
+        values = rng.normal(size=(50, 4))
+        values[rng.random(values.shape) < 0.1] = np.nan
+        values[:7, 1] = np.nan
+        start = np.array([0, 7, 0, 0])
+        result = sma_2d(values, 3, 1, start)
+
+        for j in range(values.shape[1]):
+            column = pd.Series(values[start[j]:, j])
+            np.testing.assert_array_equal(result[start[j]:, j], sma(column, 3, 1).to_numpy())
+            self.assertTrue(np.isnan(result[:start[j], j]).all())
+
+    def test_bars_alignment_matches_per_stock_exactly(self):
+        panel = build_panel(self.frames, align='bars')
+        result = calculate_panel_indicators(panel)
+        rows = len(panel['close'])
+
+        for code, expected in self.expected.items():
+            n = len(expected)
+            for name in PANEL_INDICATORS:
+                column = result[name][code].to_numpy()
+                np.testing.assert_array_equal(column[rows - n:], expected[name].to_numpy(), err_msg=f"{code} {name}")
+                self.assertTrue(np.isnan(column[:rows - n]).all())
+            np.testing.assert_array_equal(panel['date'][code].to_numpy()[rows - n:], expected['date'].to_numpy())
+
+    def test_date_alignment_matches_listed_stocks(self):
+        panel = build_panel(self.frames, align='date')
+        result = calculate_panel_indicators(panel)
+
+        # 没有停牌的股票按交易日对齐后，上市后的每一行都与逐只计算一致
+        for code in ('000001', '000002', '300001', '600001'):
+            expected = self.expected[code].set_index('date')
+            for name in PANEL_INDICATORS:
+                column = result[name][code]
+                np.testing.assert_array_equal(column.loc[expected.index].to_numpy(), expected[name].to_numpy(),
+                                              err_msg=f"{code} {name}")
+                self.assertTrue(column.loc[column.index < expected.index[0]].isna().all())
+
+    def test_build_panel_rejects_unknown_alignment(self):
+        with self.assertRaises(ValueError):
+            build_panel(self.frames, align='weeks')
+
+
+if __name__ == '__main__':
+    unittest.main()
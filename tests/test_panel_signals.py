@@ -0,0 +1,72 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from common.panel_signals import PanelSignals, screen_stocks
+from common.signals import SIGNAL_NAMES, StockSignals
+
+
+def _golden_frames(count=48, seed=5):
+    """随机游走K线：长度不一、含主板/创业板/科创板/北交所、部分股票出现 20% 跳涨和放量"""
+    rng = np.random.default_rng(seed)
+    prefixes = ['000', '300', '688', '600', '830', '002']
+    frames = {}
+    for k in range(count):
+        n = 300 if k % 3 == 0 else int(rng.integers(1, 300))
+        close = 10 * np.exp(np.cumsum(rng.normal(0.001, 0.025, n)))
+        if k % 5 == 0 and n > 10:
+            close[n // 2:] *= 1.2
+        open_ = close * (1 + rng.normal(0, 0.01, n))
+        high = np.maximum(close, open_) * (1 + rng.uniform(0, 0.02, n))
+        low = np.minimum(close, open_) * (1 - rng.uniform(0, 0.02, n))
+        volume = rng.uniform(1e5, 1e6, n) * np.where(rng.random(n) < 0.05, 4, 1) * np.linspace(1.5, 0.5, n)
+        frames[f"{prefixes[k % len(prefixes)]}{k:03d}"] = pd.DataFrame({
+            'date': pd.bdate_range(end='2026-01-09', periods=n),
+            'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume,
+        })
+    return frames
+
+
+class TestPanelSignals(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.frames = _golden_frames()
+        cls.panel = PanelSignals(cls.frames)
+        cls.expected = {code: StockSignals(df, code) for code, df in cls.frames.items()}
+
+    def test_every_bar_matches_stock_signals(self):
+        rows = len(self.panel.XG)
+        fired = 0
+        for code, expected in self.expected.items():
+            n = len(self.frames[code])
+            for name in SIGNAL_NAMES + ['XG', '近期振幅', '远期振幅']:
+                got = getattr(self.panel, name)[code].to_numpy()[rows - n:]
+                np.testing.assert_array_equal(got, getattr(expected, name).to_numpy(), err_msg=f"{code} {name}")
+            fired += int(expected.XG.sum())
+        # 样本里要真的出现过信号，比较才有意义
+        self.assertGreater(fired, 0)
+
+    def test_latest_signals_match_get_latest_signal(self):
+        latest = self.panel.get_latest_signals()
+        for code, expected in self.expected.items():
+            want = expected.get_latest_signal()
+            got = latest[code]
+            self.assertEqual(set(got), set(want))
+            self.assertEqual(got['signals'], want['signals'], code)
+            self.assertEqual(bool(got['signal']), bool(want['signal']), code)
+            for field in ('close', 'K', 'D', 'J', 'RSI', '近期振幅', '远期振幅'):
+                np.testing.assert_array_equal(got[field], want[field], err_msg=f"{code} {field}")
+
+    def test_screen_stocks_returns_matrix_and_fields(self):
+        matrix, fields = screen_stocks(self.frames)
+        self.assertEqual(list(matrix.index), list(self.frames))
+        self.assertEqual(list(matrix.columns), SIGNAL_NAMES + ['signal'])
+        self.assertTrue((matrix.dtypes == bool).all())
+        for code, expected in self.expected.items():
+            self.assertEqual(bool(matrix.loc[code, 'signal']), bool(expected.XG.iloc[-1]))
+            self.assertEqual(fields.loc[code, 'J'], expected.df['J'].iloc[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import time
+import unittest
+
+from common.rate_limiter import RateLimiter, TokenBucket, source_of
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_source_of_maps_hosts(self):
+        self.assertEqual(source_of("https://push2his.eastmoney.com/api/qt/stock/kline/get"), "eastmoney")
+        self.assertEqual(source_of("https://hq.sinajs.cn/list=sh600000"), "sina")
+        self.assertEqual(source_of("http://d.10jqka.com.cn/v4/line/bk_881121/01/last.js"), "ths")
+        self.assertEqual(source_of("http://api.tushare.pro"), "tushare")
+        self.assertIsNone(source_of("https://example.com/eastmoney.com"))
+
+    def test_bucket_allows_burst_then_paces(self):
+        bucket = TokenBucket(rate=20, burst=3)
+        start = time.monotonic()
+        waits = [bucket.acquire() for _ in range(5)]
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(waits[:3], [0.0, 0.0, 0.0])
+        # the two requests beyond the burst wait ~1/rate each
+        self.assertGreaterEqual(elapsed, 0.09)
+        self.assertLess(elapsed, 1.0)
+
+    def test_sources_are_independent_and_unknown_is_unlimited(self):
+        limiter = RateLimiter({"eastmoney": {"rate": 1, "burst": 1}, "sina": {"rate": 1, "burst": 1}})
+        self.assertEqual(limiter.acquire("eastmoney"), 0.0)
+        self.assertEqual(limiter.acquire("sina"), 0.0)
+        self.assertEqual(limiter.acquire("ths"), 0.0)
+        self.assertEqual(limiter.acquire_url("https://example.com"), 0.0)
+        self.assertEqual(set(limiter.shared_state()), {"eastmoney", "sina"})
+
+
+if __name__ == "__main__":
+    unittest.main()
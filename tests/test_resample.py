@@ -0,0 +1,79 @@
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from common.history_store import HistoryStore, adjust_bars
+from common.resample import check_timeframe, resample_bars, timeframe_suffix, update_resampled
+from common.signals import StockSignals
+from modules.fish_basin.fish_basin import fish_basin_status
+from tests.test_panel_signals import _golden_frames
+
+
+def _groupby_resample(daily, freq):
+    grouped = daily.groupby(pd.to_datetime(daily['date']).dt.to_period(freq))
+    return grouped.agg(date=('date', 'last'), open=('open', 'first'), high=('high', 'max'),
+                       low=('low', 'min'), close=('close', 'last'), volume=('volume', 'sum')).reset_index(drop=True)
+
+
+class TestResample(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.frames = _golden_frames(6, seed=11)
+
+    def test_matches_groupby(self):
+        for code, df in self.frames.items():
+            for timeframe, freq in (('W', 'W-SUN'), ('M', 'M')):
+                got = resample_bars(df, timeframe)
+                expected = _groupby_resample(df, freq)
+                pd.testing.assert_frame_equal(got[expected.columns], expected, check_dtype=False, obj=f"{code} {timeframe}")
+
+    def test_daily_passthrough_and_unknown_timeframe(self):
+        df = next(iter(self.frames.values()))
+        self.assertIs(resample_bars(df, 'd'), df)
+        self.assertEqual(timeframe_suffix('W'), '_周线')
+        self.assertEqual(timeframe_suffix('D'), '')
+        with self.assertRaises(ValueError):
+            check_timeframe('Q')
+
+    def test_update_only_recomputes_open_period(self):
+        for df in self.frames.values():
+            for timeframe in ('W', 'M'):
+                cut = len(df) * 2 // 3
+                resampled = resample_bars(df.iloc[:cut], timeframe)
+                for end in range(cut + 1, min(cut + 30, len(df)) + 1):
+                    resampled = update_resampled(resampled, df.iloc[:end], timeframe)
+                pd.testing.assert_frame_equal(resampled, resample_bars(df.iloc[:end], timeframe))
+
+    def test_stock_signals_on_weekly_bars(self):
+        for code, df in self.frames.items():
+            weekly = resample_bars(df, 'W')
+            got = StockSignals(df, code, timeframe='W').get_latest_signal()
+            expected = StockSignals(weekly, code).get_latest_signal()
+            self.assertEqual(got, expected, code)
+
+    def test_fish_basin_status_by_timeframe(self):
+        dates = pd.bdate_range('2020-01-01', periods=800)
+        close = 10 + np.sin(np.arange(800) / 40) + np.arange(800) * 0.01
+        df = pd.DataFrame({'date': dates, 'open': close, 'high': close + 0.1, 'low': close - 0.1,
+                           'close': close, 'volume': 1000.0})
+        daily = fish_basin_status(df, '测试', '000001')
+        weekly = fish_basin_status(df, '测试', '000001', timeframe='W')
+        self.assertEqual(daily['现价'], weekly['现价'])
+        self.assertNotEqual(daily['_deviation_raw'], weekly['_deviation_raw'])
+        self.assertIsNone(fish_basin_status(df, '测试', '000001', timeframe='M'))
+
+    def test_store_loads_adjusted_timeframe(self):
+        code, df = next(iter(self.frames.items()))
+        df = df.assign(adj_factor=np.where(np.arange(len(df)) < len(df) // 2, 1.0, 1.5))
+        with tempfile.TemporaryDirectory() as root:
+            store = HistoryStore(root)
+            store.save(code, df)
+            raw = store.load(code)
+            monthly = store.load_adjusted(code, 'qfq', timeframe='M')
+        pd.testing.assert_frame_equal(monthly, resample_bars(adjust_bars(raw, 'qfq'), 'M'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+from unittest.mock import Mock
+
+import pandas as pd
+
+from common.run_cache import RunCache
+
+
+class TestRunCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = RunCache()
+
+    def test_second_call_is_served_from_cache(self):
+        fetch = Mock(return_value=pd.DataFrame({"代码": ["000001"]}))
+        first = self.cache.call("stock_zt_pool_em", fetch, date="20260105")
+        second = self.cache.call("stock_zt_pool_em", fetch, date="20260105")
+        self.cache.call("stock_zt_pool_em", fetch, date="20260106")
+
+        self.assertEqual(fetch.call_count, 2)
+        self.assertTrue(first.equals(second))
+        self.assertEqual(self.cache.hits["stock_zt_pool_em"], 1)
+        self.assertEqual(self.cache.misses["stock_zt_pool_em"], 2)
+
+    def test_callers_get_independent_copies(self):
+        fetch = Mock(return_value=pd.DataFrame({"close": [1.0, 2.0]}))
+        df = self.cache.call("fetch_data", fetch, "上证指数", "sh000001")
+        df["close"] = 0.0
+        again = self.cache.call("fetch_data", fetch, "上证指数", "sh000001")
+        self.assertEqual(again["close"].tolist(), [1.0, 2.0])
+
+    def test_failures_are_not_cached(self):
+        fetch = Mock(side_effect=[None, pd.DataFrame(), {"today_volume": 0.0}, {"today_volume": 1.0}])
+        self.assertIsNone(self.cache.call("x", fetch))
+        self.assertTrue(self.cache.call("x", fetch).empty)
+        self.cache.call("x", fetch, cache_if=lambda data: data["today_volume"] > 0)
+        self.cache.call("x", fetch, cache_if=lambda data: data["today_volume"] > 0)
+        self.assertEqual(self.cache.call("x", fetch), {"today_volume": 1.0})
+        self.assertEqual(fetch.call_count, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from common.scan_archive import (
+    ARCHIVE_DIR, archive_records, archive_scan, archived_dates, backfill_archive, decode_signals,
+    encode_signals, load_archive, signal_days,
+)
+from common.signals import SIGNAL_NAMES
+
+
+def _record(code, day, signals=(), close=10.0):
+    return {
+        'code': code, 'name': f"股票{code}", 'market_cap': 123.456, 'industry': None if code.endswith('9') else '银行',
+        'signal': bool(signals), 'signals': list(signals), 'K': 12.5, 'D': 20.25, 'J': -3.125, 'RSI': 40.0,
+        'near_amplitude': 15.5, 'far_amplitude': 30.0,
+        'raw_data_mock': {'date': day, 'open': close, 'high': close + 0.5, 'low': close - 0.5, 'close': close, 'volume': 1000},
+    }
+
+
+def _write_scan(date_dir, stamp, records, done=True):
+    os.makedirs(date_dir, exist_ok=True)
+    path = os.path.join(date_dir, f"all_stocks_{stamp}.jsonl")
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    if done:
+        open(path + '.done', 'w').close()
+    return path
+
+
+class TestScanArchive(unittest.TestCase):
+    def test_signal_bitmask_roundtrip(self):
+        self.assertEqual(encode_signals([]), 0)
+        self.assertEqual(decode_signals(encode_signals(['回踩白线B', '原始B1'])), ['原始B1', '回踩白线B'])
+        self.assertEqual(encode_signals(SIGNAL_NAMES), (1 << len(SIGNAL_NAMES)) - 1)
+
+    def test_flattened_rows_match_records(self):
+        with tempfile.TemporaryDirectory() as root:
+            records = [_record('000002', '2026-01-05', ['原始B1'], 9.87), _record('000001', '2026-01-05')]
+            archive_records(records, '2026-01-05', '150000', root)
+            df = load_archive(root=root)
+        self.assertEqual(df['code'].tolist(), ['000001', '000002'])
+        row = df.iloc[1]
+        self.assertEqual(decode_signals(row['signals']), ['原始B1'])
+        self.assertEqual(row['raw_close'], 9.87)
+        self.assertEqual(row['raw_date'], pd.Timestamp('2026-01-05'))
+        self.assertAlmostEqual(row['J'], -3.125)
+        self.assertAlmostEqual(row['market_cap'], 123.456, places=4)
+
+    def test_rows_are_sorted_by_code_then_date_across_months(self):
+        with tempfile.TemporaryDirectory() as root:
+            for day in ('2026-01-30', '2026-02-02'):
+                archive_records([_record('000002', day), _record('000001', day)], day, '150000', root)
+            df = load_archive(root=root)
+        self.assertEqual(df['code'].tolist(), ['000001', '000001', '000002', '000002'])
+        self.assertEqual(df['date'].dt.strftime('%Y%m%d').tolist(), ['20260130', '20260202'] * 2)
+
+    def test_same_day_rerun_replaces_rows_and_query_by_code(self):
+        with tempfile.TemporaryDirectory() as root:
+            days = pd.bdate_range('2026-01-01', '2026-03-31')
+            for i, day in enumerate(days):
+                stamp = day.strftime('%Y-%m-%d')
+                fired = ['回踩白线B'] if i % 3 == 0 else []
+                archive_records([_record('000001', stamp, fired), _record('600519', stamp, ['原始B1'])], day, '', root)
+            # 停牌：同一根K线重复出现只算一天
+            archive_records([_record('000001', days[-2].strftime('%Y-%m-%d'), ['回踩白线B'])], days[-1], '', root)
+            # 同一天重跑覆盖
+            archive_records([_record('000001', '2026-01-01', [])], days[0], '', root)
+
+            expected = {day.strftime('%Y-%m-%d') for i, day in enumerate(days[1:-1], start=1) if i % 3 == 0}
+            if (len(days) - 2) % 3 != 0:
+                expected.add(days[-2].strftime('%Y-%m-%d'))
+            self.assertEqual(signal_days('000001', '回踩白线B', root=root), len(expected))
+            self.assertEqual(signal_days('000001', '回踩白线B', start='2026-02-01', end='2026-02-28', root=root),
+                             len([d for d in expected if d.startswith('2026-02')]))
+            self.assertEqual(signal_days('600519', '回踩白线B', root=root), 0)
+            self.assertEqual(sorted(os.listdir(root)), ['202601.parquet', '202602.parquet', '202603.parquet'])
+            self.assertEqual(len(archived_dates(root)), len(days))
+            # 首尾两天的重跑都没有 600519
+            self.assertEqual(len(load_archive(codes=['600519'], root=root)), len(days) - 2)
+            with self.assertRaises(ValueError):
+                signal_days('000001', '不存在', root=root)
+
+    def test_backfill_picks_finished_scan_and_skips_archived_days(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            results, root = os.path.join(tmp, 'results'), os.path.join(tmp, 'archive')
+            day_dir = os.path.join(results, '20260105')
+            finished = _write_scan(day_dir, '20260105_150000', [_record('000001', '2026-01-05', ['原始B1'])])
+            _write_scan(day_dir, '20260105_180000', [_record('000001', '2026-01-05')], done=False)
+            os.makedirs(os.path.join(results, 'cache'))
+            self.assertEqual(backfill_archive(results, root), [finished])
+            self.assertEqual(backfill_archive(results, root), [])
+            self.assertEqual(load_archive(root=root)['scan_time'].tolist(), ['150000'])
+            archive_scan(os.path.join(day_dir, 'all_stocks_20260105_180000.jsonl'), root)
+            self.assertEqual(load_archive(root=root)['signals'].tolist(), [0])
+        self.assertTrue(ARCHIVE_DIR.startswith('results/'))
+
+
+if __name__ == '__main__':
+    unittest.main()
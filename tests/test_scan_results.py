@@ -0,0 +1,65 @@
+import glob
+import json
+import os
+import unittest
+
+import numpy as np
+
+from common.scan_results import ScanResults
+
+
+def _record(code, signals=(), j=10.0, industry='银行', volume=1000):
+    return {
+        'code': code, 'name': f"股票{code}", 'market_cap': 123.456, 'industry': industry,
+        'signal': bool(signals), 'signals': list(signals), 'K': 12.5, 'D': 20.25, 'J': j, 'RSI': 40.0,
+        'near_amplitude': 15.5, 'far_amplitude': 30.0,
+        'raw_data_mock': {'date': '2026-02-05', 'open': 9.8, 'high': 10.5, 'low': 9.5, 'close': 10.0, 'volume': volume},
+    }
+
+
+class TestScanResults(unittest.TestCase):
+    def test_records_roundtrip(self):
+        records = [_record('000001', ['原始B1', '回踩白线B'], j=-3.125),
+                   _record('000002', industry=None, volume=1234.5)]
+        self.assertEqual(ScanResults.from_records(records).records(), records)
+
+    def test_add_skips_duplicates_and_unknown_codes(self):
+        results = ScanResults(['000001', '000002', '000003'])
+        self.assertTrue(results.add(_record('000002', j=1.0)))
+        self.assertFalse(results.add(_record('000002', j=2.0)))
+        self.assertFalse(results.add(_record('999999')))
+        self.assertIn('000002', results)
+        self.assertNotIn('000001', results)
+        self.assertNotIn('999999', results)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results.records()[0]['J'], 1.0)
+        self.assertTrue(results.add(_record('000002', j=2.0), overwrite=True))
+        self.assertEqual(results.records()[0]['J'], 2.0)
+        self.assertEqual(results.missing_codes(), ['000001', '000003'])
+
+    def test_selected_follow_stock_list_order(self):
+        results = ScanResults(['000003', '000001', '000002'])
+        results.extend([_record('000001', ['原始B1']), _record('000002'), _record('000003', ['回踩黄线B'])])
+        selected = results.records(results.selected())
+        self.assertEqual([record['code'] for record in selected], ['000003', '000001'])
+        self.assertEqual(selected[0]['signals'], ['回踩黄线B'])
+
+    def test_order_by_is_stable(self):
+        results = ScanResults(['a', 'b', 'c', 'd'])
+        results.extend([_record('a', j=5.0), _record('b', j=1.0), _record('c', j=5.0), _record('d', j=-2.0)])
+        order = results.order_by('J')
+        self.assertEqual([results.codes[i] for i in order], ['d', 'b', 'a', 'c'])
+        subset = results.order_by('J', np.array([0, 2, 1]))
+        self.assertEqual([results.codes[i] for i in subset], ['b', 'a', 'c'])
+
+    def test_real_scan_roundtrip(self):
+        raw_files = sorted(glob.glob(os.path.join("results", "[0-9]" * 8, "all_stocks_*.jsonl")))
+        if not raw_files:
+            self.skipTest("no local scan results")
+        with open(raw_files[-1], 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f][:200]
+        self.assertEqual(ScanResults.from_records(records).records(), records)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from common.sector_ranking import (
+    SCHEMA, build_sector_ranking, join_hot_sectors, load_sector_ranking, ranking_path, save_sector_ranking,
+    top_sectors,
+)
+from modules.fish_basin.fish_basin import fish_basin_status
+from modules.stock_selection import b1_selection
+
+
+def _sector_rows(names):
+    rows = []
+    dates = pd.bdate_range('2023-01-02', periods=300)
+    for i, name in enumerate(names):
+        close = 10 + np.sin(np.arange(300) / (20 + 7 * i)) + np.arange(300) * 0.002 * (i - 2)
+        df = pd.DataFrame({'date': dates, 'open': close, 'high': close + 0.1, 'low': close - 0.1,
+                           'close': close, 'volume': 1000.0})
+        rows.append(fish_basin_status(df, name, f"BK{i:04d}"))
+    rows.sort(key=lambda row: row['_deviation_raw'], reverse=True)
+    return rows
+
+
+class TestSectorRanking(unittest.TestCase):
+    def setUp(self):
+        self.rows = _sector_rows(['贵金属', '半导体', '电力', '旅游', '煤炭', '保险'])
+        self.ranking = build_sector_ranking(self.rows, ['+1', '-', '新', '-2', '-', '-'])
+
+    def test_roundtrip_keeps_types_and_order(self):
+        with tempfile.TemporaryDirectory() as root:
+            date_dir = os.path.join(root, '20260105')
+            path = save_sector_ranking(self.ranking, date_dir)
+            self.assertEqual(path, ranking_path(date_dir))
+            self.assertEqual(pq.read_schema(path).remove_metadata(), SCHEMA)
+            loaded = load_sector_ranking(date_dir)
+        pd.testing.assert_frame_equal(loaded, self.ranking, check_dtype=False)
+        self.assertEqual(loaded['rank'].tolist(), list(range(1, 7)))
+        self.assertTrue(loaded['deviation'].is_monotonic_decreasing)
+        self.assertEqual(loaded['deviation'].iloc[0], self.rows[0]['_deviation_raw'])
+
+    def test_falls_back_to_previous_dated_dir(self):
+        with tempfile.TemporaryDirectory() as root:
+            save_sector_ranking(self.ranking, os.path.join(root, '20260102'))
+            self.assertIsNotNone(load_sector_ranking(os.path.join(root, '20260105')))
+            self.assertIsNone(load_sector_ranking(os.path.join(root, '20260120')))
+            self.assertIsNone(load_sector_ranking(os.path.join(root, '20260101')))
+
+    def test_hot_sectors_and_join(self):
+        hot = top_sectors(self.ranking, 3)
+        self.assertEqual(hot, [row['名称'] for row in self.rows[:3]])
+        stocks = [{'industry': '黄金'}, {'industry': '银行'}, {'industry': '芯片 火电'}]
+        matched = join_hot_sectors(stocks, self.ranking, top_n=len(self.ranking))
+        self.assertEqual(len(matched), 3)
+        self.assertEqual(matched['name'].iloc[0], '贵金属')
+        self.assertTrue(np.isnan(matched['rank'].iloc[1]))
+        ranks = dict(zip(self.ranking['name'], self.ranking['rank']))
+        self.assertEqual(matched['rank'].iloc[2], min(ranks['半导体'], ranks['电力']))
+
+    def test_b1_reads_ranking_instead_of_prompt(self):
+        with tempfile.TemporaryDirectory() as root:
+            date_dir = os.path.join(root, '20260105')
+            self.assertEqual(b1_selection.get_hot_sectors_from_fish_basin(date_dir), [])
+            save_sector_ranking(self.ranking, date_dir)
+            self.assertEqual(b1_selection.get_hot_sectors_from_fish_basin(date_dir, top_n=2),
+                             self.ranking['name'].tolist()[:2])
+
+
+if __name__ == '__main__':
+    unittest.main()
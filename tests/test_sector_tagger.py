@@ -0,0 +1,59 @@
+import random
+import unittest
+
+from common.sector_tagger import SECTOR_ALIASES, KeywordMatcher, SectorTagger, get_sector_tagger
+from modules.stock_selection.b1_selection import match_stock_sector
+
+
+def _brute_force(keywords, text):
+    return {label for keyword, labels in keywords.items() if keyword in text for label in labels}
+
+
+class TestKeywordMatcher(unittest.TestCase):
+    def test_matches_brute_force_on_overlapping_keywords(self):
+        rng = random.Random(7)
+        alphabet = 'abc'
+        keywords = {}
+        for i in range(40):
+            keyword = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 4)))
+            keywords.setdefault(keyword, set()).add(f"L{i % 7}")
+        matcher = KeywordMatcher(keywords)
+        for _ in range(300):
+            text = ''.join(rng.choice(alphabet + 'x') for _ in range(rng.randint(0, 12)))
+            self.assertEqual(matcher.find(text), _brute_force(keywords, text), text)
+            self.assertEqual(matcher.search(text), bool(_brute_force(keywords, text)), text)
+
+    def test_case_sensitivity(self):
+        self.assertFalse(KeywordMatcher(['ST']).search('*st股份'))
+        self.assertTrue(KeywordMatcher(['ST'], ignore_case=True).search('*st股份'))
+        self.assertEqual(KeywordMatcher([]).find('任意'), set())
+
+
+class TestSectorTagger(unittest.TestCase):
+    def _legacy_match(self, stock_info, hot_sectors):
+        combined = f"{stock_info.get('industry', '')} {stock_info.get('sector', '')}".lower()
+        return any(
+            keyword.lower() in combined
+            for sector in hot_sectors
+            for keyword in [sector, *SECTOR_ALIASES.get(sector, [])]
+        )
+
+    def test_tags_return_matched_sectors(self):
+        tagger = SectorTagger(['贵金属', '人工智能', '半导体', '旅游'])
+        self.assertEqual(tagger.tag({'industry': '黄金'}), {'贵金属'})
+        self.assertEqual(tagger.tag({'industry': '芯片设计'}), {'人工智能', '半导体'})
+        self.assertEqual(tagger.tag({'industry': '软件', 'sector': 'ai应用'}), {'人工智能'})
+        self.assertEqual(tagger.tag_all([{'industry': '银行'}, {'industry': '酒店'}]), [set(), {'旅游'}])
+
+    def test_match_stock_sector_agrees_with_substring_loops(self):
+        hot_sectors = ['有色金属', '电力', '新能源', '机器人']
+        industries = ['铜加工', '电力设备', '锂电池', '机器人', '银行', '', None, '水电', 'IC设计']
+        for industry in industries:
+            stock = {'industry': industry}
+            self.assertEqual(match_stock_sector(stock, hot_sectors), self._legacy_match(stock, hot_sectors), industry)
+        self.assertFalse(match_stock_sector({'industry': '黄金'}, []))
+        self.assertIs(get_sector_tagger(hot_sectors), get_sector_tagger(list(hot_sectors)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from common.formula import ARRAY_OPS, compile_formula
+from common.panel_signals import PanelSignals
+from common.signal_profile import SignalProfile
+from common.signals import SIGNAL_NAMES, check_stock_signal
+from modules.stock_selection import b1_selection
+from tests.test_panel_signals import _golden_frames
+
+
+class TestSignalProfile(unittest.TestCase):
+    def test_counts_and_marginal_eliminations(self):
+        formula = compile_formula("A:=C>1; B:=C<4; S:A AND B AND OK;")
+        close = np.array([[0.0, 2.0, 5.0, 3.0]])
+        profile = SignalProfile()
+        formula.evaluate({'close': close, 'OK': np.array([True, True, True, False])}, ARRAY_OPS, profile=profile)
+
+        report = profile.to_dict()
+        self.assertEqual(report['stocks'], 4)
+        counts = {item['name']: item['true_count'] for item in report['conditions']}
+        self.assertEqual(counts, {'A': 3, 'B': 3, 'S': 1})
+        # 0: 只有 A 不成立；2: 只有 B 不成立；3: 只有 OK 不成立
+        self.assertEqual(report['signals']['S'], {'true_count': 1, 'eliminated': {'A': 1, 'B': 1, 'OK': 1}})
+
+    def test_panel_profile_matches_per_stock_profiles(self):
+        frames = {code: df for code, df in _golden_frames(30).items() if len(df) >= 120}
+        merged = SignalProfile()
+        for code, df in frames.items():
+            part = SignalProfile()
+            check_stock_signal(df, code, last_bar_only=True, profile=part)
+            merged.merge(json.loads(json.dumps(part.to_dict())))
+        panel = SignalProfile()
+        PanelSignals(frames, profile=panel)
+
+        expected, got = merged.to_dict(), panel.to_dict()
+        self.assertEqual(got['stocks'], len(frames))
+        self.assertEqual(got['signals'], expected['signals'])
+        self.assertEqual({item['name']: item['true_count'] for item in got['conditions']},
+                         {item['name']: item['true_count'] for item in expected['conditions']})
+        self.assertEqual(set(got['stages']), {'指标', '逐只常量', '公式'})
+        self.assertEqual(set(got['signals']), set(SIGNAL_NAMES) | {'XG'})
+
+    def test_worker_profile_is_merged_and_stripped(self):
+        df = _golden_frames(1)['000000']
+        profile = SignalProfile()
+        b1_selection.set_signal_profiling(True)
+        try:
+            with patch.object(b1_selection, 'get_stock_data', return_value=df):
+                record = b1_selection.process_single_stock(('000000', 'A', 100.0, '银行'))
+        finally:
+            b1_selection.set_signal_profiling(False)
+        self.assertIn(b1_selection.PROFILE_KEY, record)
+        b1_selection.take_profile(record, profile)
+        self.assertNotIn(b1_selection.PROFILE_KEY, record)
+        self.assertEqual(profile.stocks, 1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'signal_profile.json')
+            profile.save(path)
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(json.load(f)['stocks'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import threading
+import time
+import unittest
+
+from common.stage_pipeline import StagePipeline
+
+
+class TestStagePipeline(unittest.TestCase):
+    def test_all_items_flow_through_stages(self):
+        pipeline = StagePipeline(range(200), source_name='抓取', maxsize=4)
+        pipeline.add_stage('平方', lambda x: x * x, workers=3)
+        pipeline.add_stage('加一', lambda x: x + 1, workers=2, maxsize=2)
+        self.assertEqual(sorted(pipeline), sorted(x * x + 1 for x in range(200)))
+        stats = pipeline.stats()
+        self.assertEqual(stats['抓取']['count'], 200)
+        self.assertEqual(stats['平方']['count'], 200)
+        self.assertEqual(stats['加一']['count'], 200)
+
+    def test_none_and_failures_are_dropped(self):
+        def check(x):
+            if x == 3:
+                raise ValueError("bad")
+            return None if x % 2 else x
+
+        pipeline = StagePipeline(range(10)).add_stage('过滤', check)
+        self.assertEqual(sorted(pipeline), [0, 2, 4, 6, 8])
+
+    def test_bounded_queues_apply_backpressure(self):
+        produced = []
+        release = threading.Event()
+
+        def source():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        def slow(x):
+            release.wait()
+            return x
+
+        pipeline = StagePipeline(source(), maxsize=3).add_stage('慢', slow, maxsize=3)
+        results = iter(pipeline)
+        consumer = threading.Thread(target=lambda: self.assertEqual(len(list(results)), 100))
+        consumer.start()
+        time.sleep(0.5)
+        # 队列容量 3 + 阶段手上 1 + 源线程阻塞在 put 的 1
+        self.assertLessEqual(len(produced), 5)
+        self.assertIn('q=3/3', pipeline.status())
+        release.set()
+        consumer.join(timeout=10)
+        self.assertEqual(len(produced), 100)
+
+    def test_none_from_source_is_counted_not_forwarded(self):
+        seen = []
+        pipeline = StagePipeline([1, None, 2, None]).add_stage('记录', lambda x: seen.append(x) or x)
+        self.assertEqual(list(pipeline), [1, 2])
+        self.assertEqual(seen, [1, 2])
+        self.assertEqual(pipeline.source_count, 4)
+
+    def test_source_error_is_raised(self):
+        def source():
+            yield 1
+            raise RuntimeError("network down")
+
+        pipeline = StagePipeline(source()).add_stage('透传', lambda x: x)
+        with self.assertRaises(RuntimeError):
+            list(pipeline)
+
+    def test_early_stop_shuts_down_threads(self):
+        pipeline = StagePipeline(iter(range(10 ** 6)), maxsize=2).add_stage('透传', lambda x: x, workers=2)
+        for item in pipeline:
+            break
+        self.assertFalse(any(thread.is_alive() for thread in pipeline._threads))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from common import trade_calendar
+from common.disk_cache import DiskCache
+
+
+class TestTradeCalendar(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patchers = [
+            patch.object(trade_calendar, "get_disk_cache", return_value=DiskCache(self.tmp.name)),
+            patch.object(trade_calendar, "_calendar", None),
+            patch.object(trade_calendar, "_failed_at", None),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        self.tmp.cleanup()
+
+    def test_holiday_and_out_of_range_fallback(self):
+        calendar = ["20260930", "20261008", "20261009"]
+        self.assertTrue(trade_calendar.is_trade_day("2026-09-30", calendar))
+        self.assertFalse(trade_calendar.is_trade_day("2026-10-05", calendar))
+        # outside the calendar: weekends only
+        self.assertTrue(trade_calendar.is_trade_day("2026-11-02", calendar))
+        self.assertFalse(trade_calendar.is_trade_day("2026-11-01", calendar))
+
+    def test_calendar_is_cached_on_disk_and_failure_is_not_retried(self):
+        dates = ["2026-09-30", "2026-10-08"]
+        with patch.object(trade_calendar, "_fetch_tushare", return_value=None), \
+                patch.object(trade_calendar, "_fetch_sina", return_value=dates) as sina:
+            calendar = trade_calendar.get_trade_calendar()
+        self.assertEqual(pd.to_datetime(calendar).strftime("%Y%m%d").tolist(), ["20260930", "20261008"])
+        sina.assert_called_once()
+
+        trade_calendar._calendar = None
+        with patch.object(trade_calendar, "_fetch_sina") as sina:
+            self.assertEqual(len(trade_calendar.get_trade_calendar()), 2)
+        sina.assert_not_called()
+
+    def test_unavailable_calendar_falls_back_to_weekdays(self):
+        with patch.object(trade_calendar, "_fetch_tushare", return_value=None), \
+                patch.object(trade_calendar, "_fetch_sina", side_effect=ConnectionError("offline")) as sina:
+            self.assertIsNone(trade_calendar.get_trade_calendar())
+            self.assertIsNone(trade_calendar.get_trade_calendar())
+            self.assertTrue(trade_calendar.is_trade_day("2026-10-05"))
+        sina.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
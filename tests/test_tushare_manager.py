@@ -0,0 +1,70 @@
+import unittest
+from unittest.mock import Mock, patch
+
+import pandas as pd
+
+from common.tushare_manager import TushareManager
+
+
+def _fake_api():
+    daily = {
+        "20260105": pd.DataFrame(
+            {
+                "ts_code": ["000001.SZ", "600000.SH"],
+                "trade_date": ["20260105", "20260105"],
+                "open": [10.0, 20.0],
+                "high": [10.5, 20.5],
+                "low": [9.5, 19.5],
+                "close": [10.0, 20.0],
+                "vol": [100.0, 200.0],
+                "pre_close": [9.9, 19.9],
+            }
+        ),
+        "20260106": pd.DataFrame(
+            {
+                "ts_code": ["000001.SZ", "600000.SH"],
+                "trade_date": ["20260106", "20260106"],
+                "open": [5.0, 21.0],
+                "high": [5.5, 21.5],
+                "low": [4.5, 20.5],
+                "close": [5.0, 21.0],
+                "vol": [300.0, 400.0],
+                "pre_close": [5.0, 20.0],
+            }
+        ),
+    }
+    factors = {
+        "20260105": pd.DataFrame(
+            {"ts_code": ["000001.SZ", "600000.SH"], "trade_date": ["20260105", "20260105"], "adj_factor": [1.0, 3.0]}
+        ),
+        "20260106": pd.DataFrame(
+            {"ts_code": ["000001.SZ", "600000.SH"], "trade_date": ["20260106", "20260106"], "adj_factor": [2.0, 3.0]}
+        ),
+    }
+    api = Mock()
+    api.trade_cal.return_value = pd.DataFrame({"cal_date": ["20260105", "20260106"]})
+    api.daily.side_effect = lambda trade_date: daily[trade_date]
+    api.adj_factor.side_effect = lambda trade_date: factors[trade_date]
+    return api
+
+
+class TestTushareBulkMode(unittest.TestCase):
+    def test_bulk_daily_data_computes_qfq_locally(self):
+        manager = TushareManager()
+        api = _fake_api()
+        with patch.object(manager, "is_ready", True), patch.object(manager, "api", api):
+            frames = manager.get_bulk_daily_data(days=2, end_date="20260106")
+
+        self.assertEqual(api.daily.call_count, 2)
+        self.assertEqual(api.adj_factor.call_count, 2)
+        self.assertEqual(sorted(frames), ["000001", "600000"])
+
+        split = frames["000001"]
+        self.assertEqual(list(split.columns), ["date", "open", "high", "low", "close", "volume"])
+        # 10.0 * 1.0 / 2.0: the pre-split bar is scaled to the latest factor
+        self.assertEqual(split["close"].tolist(), [5.0, 5.0])
+        self.assertEqual(frames["600000"]["close"].tolist(), [20.0, 21.0])
+
+
+if __name__ == "__main__":
+    unittest.main()